@@ -9,30 +9,74 @@ import logging
 import os
 import json
 import sqlite3
+import time
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Callable
 from pathlib import Path
 import base64
 import hashlib
 import hmac
+from contextvars import ContextVar
 
 # 导入二维码安全模块
 from core.qrcode_security import display_donation_info, verify_qrcode
+from core.http_client_pool import get_http_client_pool
+from core.llm_response_cache import LLMResponseCache, next_market_session_boundary
+from core.spot_snapshot import get_spot_snapshot_service
+from tradingagents.dataflows.akshare_executor import get_akshare_executor
+from core.stock_data_store import StockDataStore
+from core.ohlcv_store import OHLCVColumnStore
+from core.technical_indicators import TechnicalIndicatorEngine
+from core.indicator_state import IncrementalIndicators
+from core.batch_indicators import BatchIndicatorScanner
+from core.batch_scheduler import BatchAnalysisScheduler, ProviderConcurrencyBudget, make_batch_id
+from core.rate_limiter import get_llm_rate_limiter, estimate_tokens, parse_retry_after
+from core.stage_checkpoint import StageCheckpointStore, ANALYSIS_STAGES, make_input_hash, today_input
+from core.prompt_budget import PromptBudgetManager, start_usage_tracking
+from core.usage_tracker import LLMUsageTracker, extract_usage, start_analysis_usage, usage_stage
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# A股开盘/收盘时间，收盘后当日K线视为已完成
+MARKET_OPEN_TIME = (9, 30)
+MARKET_CLOSE_TIME = (15, 0)
+
+# 当前LLM请求的提供商/模型，供 _post_llm 识别429并记录Retry-After，提供商方法在其中写入token用量
+_llm_call_state: ContextVar[Optional[Dict[str, Any]]] = ContextVar("llm_call_state", default=None)
+
+# 当前分析的进度（当前步骤、失败的智能体），批量分析时每只股票各有一份，互不覆盖
+_analysis_progress: ContextVar[Optional[Dict[str, Any]]] = ContextVar("analysis_progress", default=None)
+
+# 当前分析的流式输出监听器 listener(agent_id, 累计文本)，由发起分析的界面会话设置，各会话互不影响
+_stream_listener: ContextVar[Optional[Callable[[str, str], None]]] = ContextVar("stream_listener", default=None)
+
+# 流式请求支持 stream_options.include_usage 的提供商（其余提供商流式时估算用量）
+STREAM_USAGE_PROVIDERS = ("deepseek", "openai", "阿里百炼", "dashscope")
+
 class RealDataCollector:
     """真实数据收集器"""
 
     def __init__(self, db_path: str = "data/trading_data.db"):
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(exist_ok=True)
+        # 长连接数据存储（WAL + 批量写入）
+        self.store = StockDataStore(db_path)
+        # 列式历史行情（memmap读取，供技术指标计算）
+        self.ohlcv_store = OHLCVColumnStore(str(self.db_path.parent / "ohlcv"))
+        self.indicator_engine = TechnicalIndicatorEngine()
+        # 增量指标状态（持久化在indicator_state表，按代码缓存在内存）
+        self._indicator_states: Dict[str, IncrementalIndicators] = {}
+        # 横截面批量指标（全市场扫描、选股）
+        self.batch_scanner = BatchIndicatorScanner(self.ohlcv_store, self.indicator_engine.params)
         self.init_database()
 
+        # 全市场实时行情快照（按间隔刷新，多次分析共享；刷新经AkShare执行器，受接口并发和超时限制）
+        self.spot_snapshot = get_spot_snapshot_service(executor=get_akshare_executor())
+
         # 常用股票代码到名称的映射（回退机制）
         self.stock_name_mapping = {
             "600519": "贵州茅台",
@@ -85,56 +129,7 @@ class RealDataCollector:
     def init_database(self):
         """初始化数据库"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            # 创建股票数据表
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS stock_data (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    symbol TEXT NOT NULL,
-                    date TEXT NOT NULL,
-                    open_price REAL,
-                    high_price REAL,
-                    low_price REAL,
-                    close_price REAL,
-                    volume INTEGER,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(symbol, date)
-                )
-            ''')
-
-            # 创建技术指标表
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS technical_indicators (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    symbol TEXT NOT NULL,
-                    date TEXT NOT NULL,
-                    rsi REAL,
-                    macd REAL,
-                    ma5 REAL,
-                    ma20 REAL,
-                    bollinger_upper REAL,
-                    bollinger_lower REAL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(symbol, date)
-                )
-            ''')
-
-            # 创建新闻数据表
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS news_data (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    symbol TEXT NOT NULL,
-                    date TEXT NOT NULL,
-                    news_content TEXT,
-                    sentiment_score REAL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-
-            conn.commit()
-            conn.close()
+            self.store.init_schema()
             logger.info("数据库初始化完成")
 
         except Exception as e:
@@ -163,16 +158,13 @@ class RealDataCollector:
 
             # 获取股票实时数据
             try:
-                # 获取实时价格数据
-                real_time_data = ak.stock_zh_a_spot_em()
-                stock_info = real_time_data[real_time_data['代码'] == symbol]
+                # 获取实时价格数据（共享快照，O(1)查询）
+                stock_row = await self.spot_snapshot.alookup(symbol)
 
-                if stock_info.empty:
+                if stock_row is None:
                     logger.error(f"未找到股票代码 {symbol} 的数据")
                     return {"error": f"未找到股票代码 {symbol}"}
 
-                stock_row = stock_info.iloc[0]
-
                 # 智能获取历史数据（增量更新）
                 hist_data = await self.get_historical_data_smart(symbol, ak)
 
@@ -180,8 +172,15 @@ class RealDataCollector:
                     logger.error(f"无法获取股票 {symbol} 的历史数据")
                     return {"error": f"无法获取股票 {symbol} 的历史数据"}
 
-                # 计算技术指标
-                technical_indicators = self.calculate_technical_indicators(hist_data)
+                # 计算技术指标（已收盘交易日增量提交，当日用实时行情预览）
+                live_bar = {
+                    "open": float(stock_row['今开']),
+                    "high": float(stock_row['最高']),
+                    "low": float(stock_row['最低']),
+                    "close": float(stock_row['最新价']),
+                    "volume": float(stock_row['成交量'])
+                }
+                technical_indicators = self.calculate_technical_indicators(hist_data, symbol, live_bar)
 
                 # 构建返回数据
                 current_price = float(stock_row['最新价'])
@@ -232,35 +231,34 @@ class RealDataCollector:
             logger.error(f"获取真实股票数据失败: {e}")
             return {"error": f"数据获取失败: {str(e)}"}
 
-    def calculate_technical_indicators(self, hist_data: pd.DataFrame) -> Dict[str, float]:
-        """计算技术指标"""
+    def calculate_technical_indicators(self, hist_data: pd.DataFrame, symbol: str = None,
+                                       live_bar: Dict[str, float] = None) -> Dict[str, float]:
+        """计算技术指标（优先使用增量状态，否则向量化引擎一次计算全部指标，返回最新值）"""
         try:
             # 确保数据按日期排序
             hist_data = hist_data.sort_values('日期')
-            close_prices = hist_data['收盘'].astype(float)
-            high_prices = hist_data['最高'].astype(float)
-            low_prices = hist_data['最低'].astype(float)
-
-            # 计算移动平均线
-            ma5 = close_prices.rolling(window=5).mean().iloc[-1]
-            ma20 = close_prices.rolling(window=20).mean().iloc[-1]
+            last_price = float(hist_data['收盘'].iloc[-1])
 
-            # 计算RSI
-            rsi = self.calculate_rsi(close_prices)
-
-            # 计算MACD
-            macd = self.calculate_macd(close_prices)
+            latest = None
+            if symbol:
+                try:
+                    latest = self.update_indicator_state(symbol, live_bar)
+                except Exception as e:
+                    logger.warning(f"增量指标更新失败，改为完整计算: {e}")
+            if latest is None:
+                latest = self.indicator_engine.latest_values(self.indicator_engine.compute_frame(hist_data))
 
-            # 计算布林带
-            bollinger_upper, bollinger_lower = self.calculate_bollinger_bands(close_prices)
+            def value_or(name, default):
+                return latest.get(name) if latest.get(name) is not None else default
 
             return {
-                "rsi": float(rsi) if not pd.isna(rsi) else 50.0,
-                "macd": float(macd) if not pd.isna(macd) else 0.0,
-                "ma5": float(ma5) if not pd.isna(ma5) else close_prices.iloc[-1],
-                "ma20": float(ma20) if not pd.isna(ma20) else close_prices.iloc[-1],
-                "bollinger_upper": float(bollinger_upper) if not pd.isna(bollinger_upper) else close_prices.iloc[-1] * 1.02,
-                "bollinger_lower": float(bollinger_lower) if not pd.isna(bollinger_lower) else close_prices.iloc[-1] * 0.98
+                **latest,
+                "rsi": value_or("rsi", 50.0),
+                "macd": value_or("macd_dif", 0.0),
+                "ma5": value_or("ma5", last_price),
+                "ma20": value_or("ma20", last_price),
+                "bollinger_upper": value_or("bollinger_upper", last_price * 1.02),
+                "bollinger_lower": value_or("bollinger_lower", last_price * 0.98)
             }
 
         except Exception as e:
@@ -276,66 +274,111 @@ class RealDataCollector:
                 "bollinger_lower": last_price * 0.98
             }
 
-    def calculate_rsi(self, prices: pd.Series, period: int = 14) -> float:
-        """计算RSI指标"""
-        try:
-            delta = prices.diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-            rs = gain / loss
-            rsi = 100 - (100 / (1 + rs))
-            return rsi.iloc[-1]
-        except:
-            return 50.0
-
-    def calculate_macd(self, prices: pd.Series, fast: int = 12, slow: int = 26) -> float:
-        """计算MACD指标"""
-        try:
-            ema_fast = prices.ewm(span=fast).mean()
-            ema_slow = prices.ewm(span=slow).mean()
-            macd = ema_fast - ema_slow
-            return macd.iloc[-1]
-        except:
-            return 0.0
-
-    def calculate_bollinger_bands(self, prices: pd.Series, period: int = 20, std_dev: int = 2) -> tuple:
-        """计算布林带"""
+    def scan_market_indicators(self, symbols: List[str] = None, screen: List[str] = None,
+                               use_processes: bool = False) -> Dict[str, Any]:
+        """
+        横截面扫描本地已有行情的股票
+
+        Args:
+            symbols: 股票代码列表，None表示全部
+            screen: 选股条件（见 core.batch_indicators.SCREEN_RULES）
+            use_processes: 是否使用进程池
+
+        Returns:
+            {"status", "results", "matched", "stats"}
+        """
         try:
-            ma = prices.rolling(window=period).mean()
-            std = prices.rolling(window=period).std()
-            upper = ma + (std * std_dev)
-            lower = ma - (std * std_dev)
-            return upper.iloc[-1], lower.iloc[-1]
-        except:
-            last_price = prices.iloc[-1]
-            return last_price * 1.02, last_price * 0.98
+            results = self.batch_scanner.scan(symbols, use_processes=use_processes)
+            matched = self.batch_scanner.screen(results, screen) if screen else list(results)
+            return {
+                "status": "success",
+                "results": results,
+                "matched": matched,
+                "stats": self.batch_scanner.get_stats()
+            }
+        except Exception as e:
+            logger.error(f"横截面指标扫描失败: {e}")
+            return {"status": "error", "message": str(e), "results": {}, "matched": []}
 
-    def get_cached_data(self, symbol: str) -> Optional[Dict[str, Any]]:
-        """获取缓存的股票数据"""
+    def _load_indicator_state(self, symbol: str) -> Optional[IncrementalIndicators]:
+        """从内存或数据库取出增量指标状态"""
+        state = self._indicator_states.get(symbol)
+        if state is not None:
+            return state
+
+        saved = self.store.load_indicator_state(symbol)
+        if not saved:
+            return None
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            return IncrementalIndicators.from_dict(saved)
+        except Exception as e:
+            logger.warning(f"指标状态无法恢复，将重新计算: {e}")
+            return None
 
-            today = datetime.now().strftime('%Y-%m-%d')
+    def update_indicator_state(self, symbol: str, live_bar: Dict[str, float] = None) -> Optional[Dict[str, float]]:
+        """
+        增量更新日线指标
 
-            # 检查今天是否已有数据
-            cursor.execute('''
-                SELECT * FROM stock_data WHERE symbol = ? AND date = ?
-            ''', (symbol, today))
+        只把已收盘的交易日提交到状态并持久化，每个新交易日O(1)；
+        当日未收盘时用实时行情（或列式存储中的当日K线）预览，不改变已保存的状态。
 
-            stock_row = cursor.fetchone()
-            if not stock_row:
-                conn.close()
-                return None
+        Args:
+            symbol: 股票代码
+            live_bar: 当日实时K线 {"open", "high", "low", "close", "volume"}
 
-            # 获取技术指标
-            cursor.execute('''
-                SELECT * FROM technical_indicators WHERE symbol = ? AND date = ?
-            ''', (symbol, today))
+        Returns:
+            最新指标值，列式存储中没有历史时返回None
+        """
+        columns = self.ohlcv_store.read(symbol)
+        dates = columns["date"]
+        if not len(dates):
+            return None
 
-            tech_row = cursor.fetchone()
-            if not tech_row:
-                conn.close()
+        now = datetime.now()
+        today = np.datetime64(now.date(), "D")
+        market_closed = (now.hour, now.minute) >= MARKET_CLOSE_TIME
+        completed = int(np.searchsorted(dates, today, side="right" if market_closed else "left"))
+
+        state = self._load_indicator_state(symbol)
+        start = 0
+        if state is not None and state.last_date:
+            position = int(np.searchsorted(dates, np.datetime64(state.last_date, "D")))
+            # 状态与存储不一致（历史被补齐或重写）时重新建立
+            if position < len(dates) and str(dates[position]) == state.last_date and state.bars == position + 1:
+                start = position + 1
+            else:
+                state = None
+
+        if state is None:
+            state = IncrementalIndicators(self.indicator_engine.params)
+            start = 0
+
+        if start < completed:
+            for i in range(start, completed):
+                state.update(columns["high"][i], columns["low"][i], columns["close"][i],
+                             columns["volume"][i], date=str(dates[i]))
+            self.store.save_indicator_state(symbol, state.to_dict())
+            logger.info(f"增量更新 {symbol} 指标状态: {completed - start} 个交易日")
+        self._indicator_states[symbol] = state
+
+        if not market_closed:
+            # 非交易时段的实时行情仍是上一交易日数据，不能再预览一次
+            in_session = now.weekday() < 5 and (now.hour, now.minute) >= MARKET_OPEN_TIME
+            if in_session and live_bar and all(np.isfinite(v) and v > 0 for v in live_bar.values()):
+                return state.preview(live_bar["high"], live_bar["low"], live_bar["close"], live_bar["volume"])
+            if completed < len(dates):
+                return state.preview(columns["high"][-1], columns["low"][-1],
+                                     columns["close"][-1], columns["volume"][-1])
+        return state.values() if state.bars else None
+
+    def get_cached_data(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """获取缓存的股票数据"""
+        try:
+            today = datetime.now().strftime('%Y-%m-%d')
+
+            # 检查今天是否已有数据及技术指标
+            stock_row, tech_row = self.store.get_daily_snapshot(symbol, today)
+            if not stock_row or not tech_row:
                 return None
 
             # 构建缓存数据
@@ -368,7 +411,6 @@ class RealDataCollector:
                 "update_time": today
             }
 
-            conn.close()
             return cached_data
 
         except Exception as e:
@@ -387,16 +429,8 @@ class RealDataCollector:
     async def get_historical_data_smart(self, symbol: str, ak) -> pd.DataFrame:
         """智能获取历史数据（增量更新）"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
             # 检查数据库中最新的数据日期
-            cursor.execute('''
-                SELECT MAX(date) FROM stock_data WHERE symbol = ?
-            ''', (symbol,))
-
-            result = cursor.fetchone()
-            last_date = result[0] if result and result[0] else None
+            last_date = self.store.get_last_date(symbol)
 
             if last_date:
                 # 有历史数据，只获取增量
@@ -413,44 +447,32 @@ class RealDataCollector:
             hist_data = ak.stock_zh_a_hist(symbol=symbol, period="daily",
                                          start_date=start_date, end_date=end_date, adjust="")
 
-            # 保存新的历史数据到数据库
+            # 批量保存新的历史数据到数据库
             if not hist_data.empty:
-                for _, row in hist_data.iterrows():
-                    date_str = row['日期'].strftime('%Y-%m-%d')
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO stock_data
-                        (symbol, date, open_price, high_price, low_price, close_price, volume)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    ''', (symbol, date_str, float(row['开盘']), float(row['最高']),
-                          float(row['最低']), float(row['收盘']), int(row['成交量'])))
-
-                conn.commit()
-                logger.info(f"保存了 {len(hist_data)} 条历史数据")
-
-            # 获取完整的历史数据用于计算技术指标
-            cursor.execute('''
-                SELECT date, open_price, high_price, low_price, close_price, volume
-                FROM stock_data WHERE symbol = ?
-                ORDER BY date DESC LIMIT 100
-            ''', (symbol,))
-
-            db_data = cursor.fetchall()
-            conn.close()
-
-            if db_data:
-                # 转换为DataFrame格式
-                df_data = []
-                for row in db_data:
-                    df_data.append({
-                        '日期': datetime.strptime(row[0], '%Y-%m-%d'),
-                        '开盘': row[1],
-                        '最高': row[2],
-                        '最低': row[3],
-                        '收盘': row[4],
-                        '成交量': row[5]
-                    })
-
-                return pd.DataFrame(df_data).sort_values('日期')
+                saved_count = self.store.upsert_ohlcv_frame(symbol, hist_data)
+                logger.info(f"保存了 {saved_count} 条历史数据")
+
+            # 列式存储为空时，用数据库中已有的历史初始化
+            if self.ohlcv_store.row_count(symbol) == 0 and last_date:
+                db_data = self.store.load_ohlcv(symbol, limit=100000)
+                self.ohlcv_store.append(symbol, db_data["date"], db_data["open_price"],
+                                        db_data["high_price"], db_data["low_price"],
+                                        db_data["close_price"], db_data["volume"])
+            self.ohlcv_store.append_frame(symbol, hist_data)
+
+            # 通过memmap读取最近的历史数据用于计算技术指标
+            columns = self.ohlcv_store.read(symbol, last_n=100)
+
+            if len(columns["date"]):
+                # 按列构建DataFrame
+                return pd.DataFrame({
+                    '日期': pd.to_datetime(columns["date"]),
+                    '开盘': columns["open"],
+                    '最高': columns["high"],
+                    '最低': columns["low"],
+                    '收盘': columns["close"],
+                    '成交量': columns["volume"]
+                })
             else:
                 return hist_data
 
@@ -465,32 +487,10 @@ class RealDataCollector:
     def save_stock_data(self, symbol: str, data: Dict[str, Any]):
         """保存股票数据到数据库"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
             today = datetime.now().strftime('%Y-%m-%d')
-            price_data = data['price_data']
-            tech_data = data['technical_indicators']
-
-            # 保存基础数据
-            cursor.execute('''
-                INSERT OR REPLACE INTO stock_data
-                (symbol, date, open_price, high_price, low_price, close_price, volume)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (symbol, today, price_data['open'], price_data['high'],
-                  price_data['low'], price_data['current_price'], price_data['volume']))
-
-            # 保存技术指标
-            cursor.execute('''
-                INSERT OR REPLACE INTO technical_indicators
-                (symbol, date, rsi, macd, ma5, ma20, bollinger_upper, bollinger_lower)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (symbol, today, tech_data['rsi'], tech_data['macd'],
-                  tech_data['ma5'], tech_data['ma20'],
-                  tech_data['bollinger_upper'], tech_data['bollinger_lower']))
-
-            conn.commit()
-            conn.close()
+
+            # 在同一事务中保存基础数据和技术指标
+            self.store.save_daily_snapshot(symbol, today, data['price_data'], data['technical_indicators'])
             logger.info(f"股票 {symbol} 数据已保存到数据库")
 
         except Exception as e:
@@ -555,6 +555,25 @@ class EnhancedTradingAgentsApp:
         # 检查ChromaDB可用性
         self.chromadb_available = self.check_chromadb()
 
+        # LLM调用共享的HTTP连接池（按base URL复用长连接）
+        self.http_pool_config = {
+            "max_connections": 20,
+            "max_keepalive_connections": 10,
+            "keepalive_expiry": 60.0,
+            "http2": True
+        }
+        self.http_pool = get_http_client_pool(self.http_pool_config)
+
+        # LLM响应缓存（默认关闭，可按智能体绕过）
+        self.llm_cache_config = {
+            "enabled": False,
+            "bypass_agents": []
+        }
+        self.llm_response_cache = LLMResponseCache()
+
+        # 流式输出：分析时传入监听器 listener(agent_id, 累计文本) 后逐段推送（见 _stream_listener）
+        self.streaming_config = {"enabled": True}
+
         # 智能体模型配置
         self.agent_model_config = {}
         self.agent_model_config = self.load_agent_model_config()
@@ -577,9 +596,36 @@ class EnhancedTradingAgentsApp:
             "max_agent_retries": 2,     # 单个智能体最大重试次数
             "retry_delay": 1.0,         # 重试延迟（秒）
             "timeout_seconds": 30,      # 单次操作超时时间
+            "agent_concurrency": 4,     # 同一阶段内并发运行的智能体上限
+            "agent_timeout_seconds": 90,  # 单个智能体单次尝试的超时时间
+            "max_rate_limit_retries": 3,  # 收到429后排队重试的次数
         }
 
-        # 分析状态跟踪
+        # 批量分析：同时分析的股票数、各提供商同时进行的LLM请求上限
+        self.batch_config = {
+            "max_workers": 3,
+            "provider_budgets": {"default": 4}
+        }
+        self.provider_budget = ProviderConcurrencyBudget(self.batch_config["provider_budgets"])
+        self.batch_scheduler = BatchAnalysisScheduler(self.batch_config["max_workers"])
+
+        # 按提供商/模型的速率额度（每分钟请求数和token数），超出时排队
+        self.rate_limiter = get_llm_rate_limiter()
+
+        # 辩论提示词token预算（按提供商/模型），超出时压缩较旧的轮次和分析师观点
+        self.prompt_budget = PromptBudgetManager()
+
+        # 研究团队辩论模式："sequential" 多空交替发言，"parallel" 双方同时回应对方上一轮观点
+        self.debate_config = {"mode": "sequential"}
+
+        # 分析阶段检查点：每个阶段完成后保存输出，重跑时跳过已完成的阶段
+        self.checkpoint_config = {"enabled": True, "resume": True}
+        self.stage_checkpoints = StageCheckpointStore()
+
+        # LLM用量记账：每次调用的token、耗时和估算费用，按智能体/阶段/分析汇总
+        self.usage_tracker = LLMUsageTracker()
+
+        # 分析状态跟踪：运行/中断标志全局共享，单次分析的进度见 _analysis_progress
         self.analysis_state = {
             "is_running": False,
             "current_step": "",
@@ -587,16 +633,26 @@ class EnhancedTradingAgentsApp:
             "failed_agents": [],
             "should_interrupt": False
         }
+        # 正在进行的分析进度，供界面显示状态
+        self.active_analyses: Dict[int, Dict[str, Any]] = {}
 
     def reset_analysis_state(self):
-        """重置分析状态"""
-        self.analysis_state = {
+        """重置分析状态（只在单次分析或批量分析开始时调用，原地修改以免丢失其他任务的引用）"""
+        self.analysis_state.update({
             "is_running": False,
             "current_step": "",
             "retry_counts": {},
             "failed_agents": [],
             "should_interrupt": False
-        }
+        })
+
+    def _progress(self) -> Dict[str, Any]:
+        """当前分析的进度字典（不在分析上下文中时为共享状态）"""
+        return _analysis_progress.get() or self.analysis_state
+
+    def get_analysis_progress(self) -> List[Dict[str, Any]]:
+        """正在进行的各分析的进度"""
+        return list(self.active_analyses.values())
 
     def check_should_interrupt(self) -> bool:
         """检查是否应该中断分析"""
@@ -969,7 +1025,7 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
         """获取指定提供商的可用模型列表"""
         try:
             from core.enhanced_llm_manager import EnhancedLLMManager
-            llm_manager = EnhancedLLMManager()
+            llm_manager = EnhancedLLMManager(http_pool=self.http_pool)
             models = llm_manager.get_provider_models(provider)
             return [model["id"] for model in models]
         except ImportError:
@@ -984,7 +1040,7 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
             from core.enhanced_llm_manager import EnhancedLLMManager
 
             agent_manager = AgentModelManager()
-            llm_manager = EnhancedLLMManager()
+            llm_manager = EnhancedLLMManager(http_pool=self.http_pool)
 
             # 获取所有可用模型的详细信息
             available_models = {}
@@ -1117,8 +1173,9 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
             }
 
     def log_communication(self, agent_id: str, provider: str, model: str,
-                         prompt: str, response: str, status: str = "success"):
-        """记录LLM通信日志"""
+                         prompt: str, response: str, status: str = "success",
+                         duration: float = None, usage: Dict[str, Any] = None):
+        """记录LLM通信日志（duration为响应耗时秒数，usage为用量记录）"""
         try:
             # 生成唯一的日志序列号
             log_id = len(self.communication_logs) + 1
@@ -1136,8 +1193,17 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
                 "status": status,
                 "prompt_length": len(prompt),
                 "response_length": len(response),
-                "duration": "N/A"  # 可以后续添加响应时间
+                "duration": round(duration, 3) if duration is not None else "N/A"
             }
+            if usage:
+                log_entry.update({
+                    "prompt_tokens": usage["prompt_tokens"],
+                    "completion_tokens": usage["completion_tokens"],
+                    "usage_source": usage["usage_source"],
+                    "cost": usage["cost"],
+                    "stage": usage["stage"],
+                    "analysis_id": usage["analysis_id"]
+                })
 
             self.communication_logs.append(log_entry)
 
@@ -1345,14 +1411,36 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
             logger.error(f"保存智能体模型配置失败: {e}")
 
     async def analyze_stock_enhanced(self, symbol: str, depth: str, analysts: List[str],
-                                   use_real_llm: bool = False) -> Dict[str, Any]:
-        """增强的股票分析 - 真正的15个智能体协作"""
+                                   use_real_llm: bool = False, resume: bool = None,
+                                   stream_listener: Callable[[str, str], None] = None) -> Dict[str, Any]:
+        """增强的股票分析 - 真正的15个智能体协作
+
+        resume为None时按 checkpoint_config["resume"]，为True时跳过检查点中已完成的阶段；
+        stream_listener(agent_id, 累计文本) 只接收本次分析的流式输出
+        """
+        self.reset_analysis_state()
+        self.analysis_state["is_running"] = True
+        listener_token = _stream_listener.set(stream_listener)
+        try:
+            return await self._analyze_symbol(symbol, depth, analysts, use_real_llm, resume)
+        finally:
+            _stream_listener.reset(listener_token)
+            self.analysis_state["is_running"] = False
+
+    async def _analyze_symbol(self, symbol: str, depth: str, analysts: List[str],
+                              use_real_llm: bool, resume: bool = None) -> Dict[str, Any]:
+        """分析单只股票（不重置中断标志，单次分析和批量分析共用），进度记录在独立的进度字典中"""
+        progress = {"symbol": symbol, "current_step": "", "retry_counts": {}, "failed_agents": []}
+        token = _analysis_progress.set(progress)
+        self.active_analyses[id(progress)] = progress
         try:
             logger.info(f"开始分析股票: {symbol}, 深度: {depth}, 使用真实LLM: {use_real_llm}")
 
             if use_real_llm:
                 # 真实的智能体分析
-                return await self._real_agent_analysis(symbol, depth, analysts)
+                if resume is None:
+                    resume = self.checkpoint_config.get("resume", True)
+                return await self._real_agent_analysis(symbol, depth, analysts, resume=resume)
             else:
                 # 模拟分析（保持向后兼容）
                 return await self._mock_analysis(symbol, depth, analysts)
@@ -1364,6 +1452,105 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
                 "error": str(e),
                 "timestamp": datetime.now().isoformat()
             }
+        finally:
+            self.active_analyses.pop(id(progress), None)
+            _analysis_progress.reset(token)
+
+    async def analyze_watchlist(self, symbols: List[str], depth: str, analysts: List[str],
+                                use_real_llm: bool = False, batch_id: str = None,
+                                resume: bool = True, max_workers: int = None):
+        """
+        批量分析自选股（异步生成器，按完成顺序产出每只股票的结果）
+
+        多只股票在有界工作池中并发分析，共享同一份实时行情快照，
+        LLM请求受各提供商并发额度限制；已完成的股票写入检查点，中断后可续跑。
+
+        Args:
+            symbols: 股票代码列表
+            depth: 分析深度
+            analysts: 分析师列表
+            use_real_llm: 是否使用真实LLM
+            batch_id: 批次ID，默认由股票列表和分析参数生成
+            resume: 是否跳过检查点中已完成的股票
+            max_workers: 同时分析的股票数
+        """
+        symbols = list(dict.fromkeys(s.strip() for s in symbols if s and s.strip()))
+        batch_id = batch_id or make_batch_id(symbols, depth, sorted(analysts), use_real_llm)
+        cancel_event = asyncio.Event()
+
+        # 中断标志只在批次开始时清除一次，批次内各股票不再重置，停止操作对所有工作协程可见
+        self.reset_analysis_state()
+        self.analysis_state["is_running"] = True
+        try:
+            # 预先刷新全市场行情快照，之后每只股票都是O(1)查询
+            await self.data_collector.spot_snapshot.arefresh()
+
+            async def analyze(symbol: str) -> Dict[str, Any]:
+                if self.check_should_interrupt():
+                    return {"status": "interrupted", "message": "分析被用户中断"}
+                return await self._analyze_symbol(symbol, depth, analysts, use_real_llm, resume=resume)
+
+            async for event in self.batch_scheduler.run(symbols, analyze, batch_id=batch_id, resume=resume,
+                                                        max_workers=max_workers, cancel_event=cancel_event):
+                if self.check_should_interrupt():
+                    cancel_event.set()
+                yield event
+        finally:
+            self.analysis_state["is_running"] = False
+
+    def _stage_output_failed(self, output: Any) -> bool:
+        """阶段输出中是否有失败的智能体（含错误字段或LLM错误说明），有则不保存检查点"""
+        if isinstance(output, dict):
+            if "error" in output:
+                return True
+            analysis = output.get("analysis")
+            if isinstance(analysis, str) and self._is_llm_error_response(analysis):
+                return True
+            return any(self._stage_output_failed(value) for value in output.values()
+                       if isinstance(value, (dict, list)))
+        if isinstance(output, list):
+            return any(self._stage_output_failed(item) for item in output)
+        return False
+
+    def clear_stage_checkpoints(self, symbol: str = None) -> Dict[str, Any]:
+        """清除分析阶段检查点（指定股票或全部）"""
+        removed = self.stage_checkpoints.clear(symbol)
+        return {"status": "success", "message": f"已清除{removed}条阶段检查点", "removed": removed}
+
+    def get_llm_usage_report(self, since_hours: float = None, analyses_limit: int = 20) -> Dict[str, Any]:
+        """
+        LLM用量报表：按智能体、阶段、模型汇总，以及最近的分析
+
+        Args:
+            since_hours: 只统计最近若干小时，None表示全部
+            analyses_limit: 返回的最近分析条数
+        """
+        try:
+            by_agent = self.usage_tracker.summarize("agent", since_hours=since_hours)
+            analyses = self.usage_tracker.summarize("analysis", since_hours=since_hours)
+            analyses = sorted((item for item in analyses if item["analysis"]),
+                              key=lambda item: item["started_at"], reverse=True)[:analyses_limit]
+            return {
+                "status": "success",
+                "totals": {
+                    "calls": sum(item["calls"] for item in by_agent),
+                    "total_tokens": sum(item["total_tokens"] for item in by_agent),
+                    "cost": round(sum(item["cost"] for item in by_agent), 4),
+                    "total_latency": round(sum(item["total_latency"] for item in by_agent), 2)
+                },
+                "by_agent": by_agent,
+                "by_stage": self.usage_tracker.summarize("stage", since_hours=since_hours),
+                "by_model": self.usage_tracker.summarize("model", since_hours=since_hours),
+                "analyses": analyses
+            }
+        except Exception as e:
+            logger.error(f"获取LLM用量报表失败: {e}")
+            return {"status": "error", "message": f"获取用量失败: {str(e)}"}
+
+    def clear_llm_usage(self) -> Dict[str, Any]:
+        """清空LLM用量记录"""
+        removed = self.usage_tracker.clear()
+        return {"status": "success", "message": f"已清除{removed}条用量记录", "removed": removed}
 
     def _get_debate_rounds(self, depth: str) -> int:
         """根据分析深度获取辩论轮数"""
@@ -1375,21 +1562,45 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
         }
         return depth_rounds.get(depth, 2)
 
-    async def _real_agent_analysis(self, symbol: str, depth: str, analysts: List[str]) -> Dict[str, Any]:
-        """真实的智能体分析流程（带中断机制和多轮辩论）"""
+    async def _real_agent_analysis(self, symbol: str, depth: str, analysts: List[str],
+                                   resume: bool = True) -> Dict[str, Any]:
+        """真实的智能体分析流程（带中断机制、多轮辩论和阶段检查点）"""
         try:
             start_time = datetime.now()
-            self.analysis_state["is_running"] = True
-            self.reset_analysis_state()
-            self.analysis_state["is_running"] = True
 
             # 获取辩论轮数
             debate_rounds = self._get_debate_rounds(depth)
             logger.info(f"📊 开始{depth}，将进行{debate_rounds}轮辩论")
 
+            # 本次分析的提示词压缩统计和LLM用量记账
+            prompt_usage = start_usage_tracking()
+            analysis_id = start_analysis_usage(symbol)
+
+            # 阶段检查点：同一交易日、相同分析师和模型配置的分析共用一组检查点
+            checkpoint_enabled = self.checkpoint_config.get("enabled", True)
+            input_hash = make_input_hash(symbol, depth, sorted(analysts), self.agent_model_config,
+                                         self.debate_config, today_input())
+            completed = self.stage_checkpoints.load(symbol, depth, input_hash) if checkpoint_enabled and resume else {}
+            resumed_stages = []
+
+            async def run_stage(stage: str, func, *args):
+                # 只复用从第一阶段起连续完成的阶段，前面有阶段重跑时后续阶段的输入已经变化
+                if stage in completed and len(resumed_stages) == ANALYSIS_STAGES.index(stage):
+                    resumed_stages.append(stage)
+                    self.stage_checkpoints.stats["resumed_stages"] += 1
+                    self._progress()["current_step"] = f"从检查点恢复: {stage}"
+                    logger.info(f"♻️ 阶段 {stage} 已完成，从检查点恢复")
+                    return completed[stage]
+
+                with usage_stage(stage):
+                    output = await func(*args)
+                if checkpoint_enabled and not self.check_should_interrupt() and not self._stage_output_failed(output):
+                    self.stage_checkpoints.save(symbol, depth, input_hash, stage, output)
+                return output
+
             # 1. 数据收集阶段
             logger.info("📊 阶段1: 数据收集")
-            stock_data = await self._collect_stock_data(symbol)
+            stock_data = await run_stage("data_collection", self._collect_stock_data, symbol)
 
             if "error" in stock_data:
                 if stock_data.get("interrupted"):
@@ -1402,7 +1613,7 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
 
             # 2. 分析师团队分析
             logger.info("👥 阶段2: 分析师团队分析")
-            analyst_results = await self._run_analyst_team(symbol, stock_data)
+            analyst_results = await run_stage("analyst_team", self._run_analyst_team, symbol, stock_data)
 
             if "error" in analyst_results:
                 if analyst_results.get("interrupted"):
@@ -1413,35 +1624,45 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
 
             # 3. 多轮研究团队辩论
             logger.info(f"🔬 阶段3: 研究团队多轮辩论（{debate_rounds}轮）")
-            research_results = await self._run_multi_round_research_team(symbol, analyst_results, debate_rounds)
+            research_results = await run_stage("research_team", self._run_multi_round_research_team,
+                                               symbol, analyst_results, debate_rounds)
 
             if self.check_should_interrupt():
                 return {"status": "interrupted", "message": "分析被用户中断"}
 
             # 4. 交易策略制定
             logger.info("💼 阶段4: 交易策略制定")
-            trading_strategy = await self._run_trader_analysis(symbol, research_results)
+            trading_strategy = await run_stage("trading_strategy", self._run_trader_analysis, symbol, research_results)
 
             if self.check_should_interrupt():
                 return {"status": "interrupted", "message": "分析被用户中断"}
 
             # 5. 风险管理评估
             logger.info("⚠️ 阶段5: 风险管理评估")
-            risk_assessment = await self._run_risk_management(symbol, trading_strategy)
+            risk_assessment = await run_stage("risk_assessment", self._run_risk_management, symbol, trading_strategy)
 
             if self.check_should_interrupt():
                 return {"status": "interrupted", "message": "分析被用户中断"}
 
             # 6. 最终决策
             logger.info("🎯 阶段6: 最终决策制定")
-            final_decision = await self._make_final_decision(symbol, risk_assessment)
+            final_decision = await run_stage("final_decision", self._make_final_decision, symbol, risk_assessment)
 
             if self.check_should_interrupt():
                 return {"status": "interrupted", "message": "分析被用户中断"}
 
             # 7. 反思和学习
             logger.info("🔄 阶段7: 反思和学习")
-            reflection = await self._run_reflection(symbol, final_decision)
+            reflection = await run_stage("reflection", self._run_reflection, symbol, final_decision)
+
+            if resumed_stages:
+                logger.info(f"♻️ 从检查点恢复了{len(resumed_stages)}个阶段: {', '.join(resumed_stages)}")
+            if prompt_usage["saved_tokens"]:
+                logger.info(f"✂️ 提示词压缩节省 {prompt_usage['saved_tokens']} tokens"
+                            f"（{prompt_usage['compacted_prompts']}/{prompt_usage['prompts']} 个提示词被压缩）")
+            llm_usage = self.usage_tracker.get_analysis_usage(analysis_id)
+            logger.info(f"💰 LLM用量: {llm_usage['totals']['calls']} 次调用，"
+                        f"{llm_usage['totals']['total_tokens']} tokens，约 ¥{llm_usage['totals']['cost']:.4f}")
 
             # 构建完整结果
             result = {
@@ -1452,6 +1673,9 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
                 "end_time": datetime.now().isoformat(),
                 "llm_used": "real",
                 "chromadb_status": "available" if self.chromadb_available else "unavailable",
+                "checkpoint": {"input_hash": input_hash, "resumed_stages": resumed_stages},
+                "prompt_budget": prompt_usage,
+                "llm_usage": llm_usage,
                 "analysis_stages": {
                     "data_collection": stock_data,
                     "analyst_team": analyst_results,
@@ -1805,7 +2029,7 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
         """数据收集阶段 - 使用真实数据（带重试机制）"""
         try:
             logger.info(f"开始收集股票 {symbol} 的真实数据...")
-            self.analysis_state["current_step"] = f"获取股票数据: {symbol}"
+            self._progress()["current_step"] = f"获取股票数据: {symbol}"
 
             # 使用重试机制获取股票数据
             async def get_data():
@@ -1858,12 +2082,82 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
             logger.error(f"检查LLM联网能力失败: {e}")
             return False
 
+    async def _run_agents_concurrently(self, agents: List[tuple], *args) -> tuple:
+        """
+        并发运行一组互不依赖的智能体
+
+        Args:
+            agents: (agent_id, agent_name, agent_func) 列表
+            *args: 传给每个智能体函数的参数
+
+        Returns:
+            (results, failed_agents)，results按agents顺序排列
+        """
+        semaphore = asyncio.Semaphore(max(1, int(self.retry_config.get("agent_concurrency", 4))))
+        timeout = self.retry_config.get("agent_timeout_seconds", 90)
+
+        async def run_agent(agent_id: str, agent_name: str, agent_func):
+            async with semaphore:
+                if self.check_should_interrupt():
+                    raise InterruptedError("分析被用户中断")
+
+                logger.info(f"开始运行{agent_name}...")
+
+                # 每次尝试单独计时，超时后交给重试机制处理
+                async def attempt():
+                    return await asyncio.wait_for(agent_func(*args), timeout=timeout)
+
+                return await self.retry_with_backoff(
+                    attempt,
+                    max_retries=self.retry_config["max_agent_retries"],
+                    delay=self.retry_config["retry_delay"]
+                )
+
+        tasks = {
+            asyncio.ensure_future(run_agent(agent_id, agent_name, agent_func)): (agent_id, agent_name)
+            for agent_id, agent_name, agent_func in agents
+        }
+
+        # 轮询中断标志，收到中断后取消仍在运行的智能体
+        pending = set(tasks)
+        while pending:
+            _, pending = await asyncio.wait(pending, timeout=0.2, return_when=asyncio.FIRST_COMPLETED)
+            if pending and self.check_should_interrupt():
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                raise InterruptedError("分析被用户中断")
+
+        results = {}
+        failed_agents = []
+        for task, (agent_id, agent_name) in tasks.items():
+            try:
+                result = task.result()
+
+                # 验证结果
+                if not result or "error" in str(result):
+                    raise ValueError(f"{agent_name}返回无效结果")
+
+                results[agent_id] = result
+                logger.info(f"{agent_name}运行成功")
+
+            except InterruptedError:
+                raise
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    e = TimeoutError(f"超过{timeout}秒未完成")
+                logger.error(f"{agent_name}运行失败: {e}")
+                failed_agents.append(agent_name)
+                results[agent_id] = {
+                    "error": f"{agent_name}运行失败: {str(e)}",
+                    "analysis": f"❌ {agent_name}暂时无法提供分析，请稍后重试"
+                }
+
+        return results, failed_agents
+
     async def _run_analyst_team(self, symbol: str, stock_data: Dict[str, Any]) -> Dict[str, Any]:
-        """运行分析师团队（带重试机制）"""
+        """运行分析师团队（并发执行，带超时、重试和中断机制）"""
         try:
-            results = {}
-            failed_agents = []
-
             # 分析师配置
             analysts = [
                 ("market_analyst", "市场分析师", self._call_market_analyst),
@@ -1872,41 +2166,12 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
                 ("fundamentals_analyst", "基本面分析师", self._call_fundamentals_analyst)
             ]
 
-            for agent_id, agent_name, agent_func in analysts:
-                if self.check_should_interrupt():
-                    logger.warning("分析师团队运行被中断")
-                    break
-
-                self.analysis_state["current_step"] = f"运行{agent_name}"
-                logger.info(f"开始运行{agent_name}...")
-
-                try:
-                    # 使用重试机制调用分析师
-                    result = await self.retry_with_backoff(
-                        agent_func,
-                        symbol,
-                        stock_data,
-                        max_retries=self.retry_config["max_agent_retries"],
-                        delay=self.retry_config["retry_delay"]
-                    )
-
-                    # 验证结果
-                    if not result or "error" in str(result):
-                        raise ValueError(f"{agent_name}返回无效结果")
-
-                    results[agent_id] = result
-                    logger.info(f"{agent_name}运行成功")
-
-                except Exception as e:
-                    logger.error(f"{agent_name}运行失败: {e}")
-                    failed_agents.append(agent_name)
-                    results[agent_id] = {
-                        "error": f"{agent_name}运行失败: {str(e)}",
-                        "analysis": f"❌ {agent_name}暂时无法提供分析，请稍后重试"
-                    }
+            # 各分析师只读取stock_data，可以并发运行
+            self._progress()["current_step"] = "并行运行分析师团队"
+            results, failed_agents = await self._run_agents_concurrently(analysts, symbol, stock_data)
 
             # 记录失败的智能体
-            self.analysis_state["failed_agents"] = failed_agents
+            self._progress()["failed_agents"] = failed_agents
 
             if failed_agents:
                 logger.warning(f"以下智能体运行失败: {failed_agents}")
@@ -2178,21 +2443,35 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
             # 初始观点
             bull_view = ""
             bear_view = ""
+            parallel = self.debate_config.get("mode") == "parallel"
+            logger.info(f"辩论模式: {'同时发言' if parallel else '交替发言'}")
 
             for round_num in range(1, rounds + 1):
                 logger.info(f"🥊 第{round_num}轮辩论")
+                round_start = time.time()
+
+                if parallel:
+                    # 双方同时回应对方上一轮的观点
+                    bull_result, bear_result = await asyncio.gather(
+                        self._call_bull_researcher_with_context(symbol, analyst_results, bear_view, round_num, rounds,
+                                                                debate_history[:-1]),
+                        self._call_bear_researcher_with_context(symbol, analyst_results, bull_view, round_num, rounds,
+                                                                debate_history[:-1])
+                    )
+                    bull_view = bull_result.get("analysis", "")
+                    bear_view = bear_result.get("analysis", "")
+                else:
+                    # 多头研究员
+                    bull_result = await self._call_bull_researcher_with_context(
+                        symbol, analyst_results, bear_view, round_num, rounds, debate_history[:-1]
+                    )
+                    bull_view = bull_result.get("analysis", "")
 
-                # 多头研究员
-                bull_result = await self._call_bull_researcher_with_context(
-                    symbol, analyst_results, bear_view, round_num, rounds
-                )
-                bull_view = bull_result.get("analysis", "")
-
-                # 空头研究员
-                bear_result = await self._call_bear_researcher_with_context(
-                    symbol, analyst_results, bull_view, round_num, rounds
-                )
-                bear_view = bear_result.get("analysis", "")
+                    # 空头研究员（回应多头本轮的观点）
+                    bear_result = await self._call_bear_researcher_with_context(
+                        symbol, analyst_results, bull_view, round_num, rounds, list(debate_history)
+                    )
+                    bear_view = bear_result.get("analysis", "")
 
                 # 记录本轮辩论
                 debate_round = {
@@ -2200,17 +2479,21 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
                     "bull_view": bull_view,
                     "bear_view": bear_view,
                     "bull_strength": len(bull_view.split("。")) if bull_view else 0,
-                    "bear_strength": len(bear_view.split("。")) if bear_view else 0
+                    "bear_strength": len(bear_view.split("。")) if bear_view else 0,
+                    "elapsed": round(time.time() - round_start, 2)
                 }
                 debate_history.append(debate_round)
 
-                logger.info(f"第{round_num}轮完成 - 多头论据: {debate_round['bull_strength']}条, 空头论据: {debate_round['bear_strength']}条")
+                logger.info(f"第{round_num}轮完成（{debate_round['elapsed']}s） - "
+                            f"多头论据: {debate_round['bull_strength']}条, 空头论据: {debate_round['bear_strength']}条")
 
             # 最终结果
             results["bull_researcher"] = {"analysis": bull_view, "agent_id": "bull_researcher"}
             results["bear_researcher"] = {"analysis": bear_view, "agent_id": "bear_researcher"}
             results["debate_history"] = debate_history
             results["total_rounds"] = rounds
+            results["debate_mode"] = "parallel" if parallel else "sequential"
+            results["round_latencies"] = [r["elapsed"] for r in debate_history]
 
             # 研究经理综合评估
             results["research_manager"] = await self._call_research_manager_with_debate_history(
@@ -2230,8 +2513,12 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
         return await self._run_multi_round_research_team(symbol, analyst_results, 2)
 
     async def _call_bull_researcher_with_context(self, symbol: str, analyst_results: Dict[str, Any],
-                                                bear_view: str, round_num: int, total_rounds: int) -> Dict[str, Any]:
-        """调用多头研究员（带上下文辩论）"""
+                                                bear_view: str, round_num: int, total_rounds: int,
+                                                earlier_rounds: List[Dict] = None) -> Dict[str, Any]:
+        """调用多头研究员（带上下文辩论）
+
+        提示词受token预算限制：超出时按权重压缩分析师观点、对方观点和更早轮次的辩论回顾
+        """
         try:
             model_config = self.agent_model_config.get("bull_researcher", "deepseek:deepseek-chat")
             provider, model = self._parse_model_config(model_config)
@@ -2245,22 +2532,26 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
             # 使用数据收集器的股票名称获取方法
             stock_name = self.data_collector.get_stock_name(symbol)
 
-            # 根据轮次调整提示词
-            if round_num == 1:
-                context_prompt = "这是第一轮辩论，请提出你的初始多头观点。"
-                min_points = 3
-            else:
-                context_prompt = f"""
-这是第{round_num}轮辩论（共{total_rounds}轮）。
+            min_points = 3 if round_num == 1 else round_num + 2
+            recap_sections = self._debate_recap_sections(earlier_rounds or [])
 
+            def render(v):
+                # 根据轮次调整提示词
+                if round_num == 1:
+                    context_prompt = "这是第一轮辩论，请提出你的初始多头观点。"
+                else:
+                    recap = "\n".join(v[name] for name, _, _ in recap_sections if v[name])
+                    recap = f"\n此前辩论回顾:\n{recap}\n" if recap else ""
+                    context_prompt = f"""
+这是第{round_num}轮辩论（共{total_rounds}轮）。
+{recap}
 空头研究员在前一轮的观点:
-{bear_view[:400]}
+{v['opponent_view']}
 
 请针对空头观点进行有力反驳，并提供更多支撑看涨的论据。
 """
-                min_points = round_num + 2
 
-            prompt = f"""
+                return f"""
 你是专业的多头研究员。基于分析师团队的报告，请为股票{symbol}（{stock_name}）提供看涨论据。
 
 **重要提醒**: 请在分析中始终使用正确的股票代码{symbol}和股票名称{stock_name}。
@@ -2268,10 +2559,10 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
 {context_prompt}
 
 分析师观点摘要:
-- 技术分析: {market_view[:150]}...
-- 情感分析: {sentiment_view[:150]}...
-- 新闻分析: {news_view[:150]}...
-- 基本面分析: {fundamentals_view[:150]}...
+- 技术分析: {v['market_view']}
+- 情感分析: {v['sentiment_view']}
+- 新闻分析: {v['news_view']}
+- 基本面分析: {v['fundamentals_view']}
 
 请基于以上分析提供:
 1. 主要看涨理由（至少{min_points}条具体论据）
@@ -2283,6 +2574,15 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
 要求：论据要比前一轮更加充分详实，每条理由都要有具体支撑。务必在回答中使用正确的股票代码{symbol}和名称{stock_name}。
 """
 
+            prompt = self.prompt_budget.fit_prompt(render, [
+                ("opponent_view", bear_view if round_num > 1 else "", 3.0),
+                ("market_view", market_view, 1.0),
+                ("sentiment_view", sentiment_view, 1.0),
+                ("news_view", news_view, 1.0),
+                ("fundamentals_view", fundamentals_view, 1.0),
+                *recap_sections
+            ], provider, model, context=symbol)
+
             response = await self._call_llm(provider, model, prompt, "bull_researcher")
 
             return {
@@ -2299,8 +2599,12 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
             return {"error": str(e), "agent_id": "bull_researcher"}
 
     async def _call_bear_researcher_with_context(self, symbol: str, analyst_results: Dict[str, Any],
-                                                bull_view: str, round_num: int, total_rounds: int) -> Dict[str, Any]:
-        """调用空头研究员（带上下文辩论）"""
+                                                bull_view: str, round_num: int, total_rounds: int,
+                                                earlier_rounds: List[Dict] = None) -> Dict[str, Any]:
+        """调用空头研究员（带上下文辩论）
+
+        提示词受token预算限制：超出时按权重压缩分析师观点、对方观点和更早轮次的辩论回顾
+        """
         try:
             model_config = self.agent_model_config.get("bear_researcher", "deepseek:deepseek-chat")
             provider, model = self._parse_model_config(model_config)
@@ -2314,22 +2618,26 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
             # 使用数据收集器的股票名称获取方法
             stock_name = self.data_collector.get_stock_name(symbol)
 
-            # 根据轮次调整提示词
-            if round_num == 1:
-                context_prompt = "这是第一轮辩论，请提出你的初始空头观点。"
-                min_points = 3
-            else:
-                context_prompt = f"""
-这是第{round_num}轮辩论（共{total_rounds}轮）。
+            min_points = 3 if round_num == 1 else round_num + 2
+            recap_sections = self._debate_recap_sections(earlier_rounds or [])
 
-多头研究员在本轮的观点:
-{bull_view[:400]}
+            def render(v):
+                # 根据轮次调整提示词
+                if round_num == 1:
+                    context_prompt = "这是第一轮辩论，请提出你的初始空头观点。"
+                else:
+                    recap = "\n".join(v[name] for name, _, _ in recap_sections if v[name])
+                    recap = f"\n此前辩论回顾:\n{recap}\n" if recap else ""
+                    context_prompt = f"""
+这是第{round_num}轮辩论（共{total_rounds}轮）。
+{recap}
+多头研究员的最新观点:
+{v['opponent_view']}
 
 请针对多头观点进行有力反驳，并提供更多支撑看跌的论据。
 """
-                min_points = round_num + 2
 
-            prompt = f"""
+                return f"""
 你是专业的空头研究员。基于分析师团队的报告，请为股票{symbol}（{stock_name}）提供看跌论据。
 
 **重要提醒**: 请在分析中始终使用正确的股票代码{symbol}和股票名称{stock_name}。
@@ -2337,10 +2645,10 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
 {context_prompt}
 
 分析师观点摘要:
-- 技术分析: {market_view[:150]}...
-- 情感分析: {sentiment_view[:150]}...
-- 新闻分析: {news_view[:150]}...
-- 基本面分析: {fundamentals_view[:150]}...
+- 技术分析: {v['market_view']}
+- 情感分析: {v['sentiment_view']}
+- 新闻分析: {v['news_view']}
+- 基本面分析: {v['fundamentals_view']}
 
 请基于以上分析提供:
 1. 主要看跌理由（至少{min_points}条具体论据）
@@ -2352,6 +2660,15 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
 要求：论据要比前一轮更加充分详实，每条理由都要有具体支撑。务必在回答中使用正确的股票代码{symbol}和名称{stock_name}。
 """
 
+            prompt = self.prompt_budget.fit_prompt(render, [
+                ("opponent_view", bull_view if round_num > 1 else "", 3.0),
+                ("market_view", market_view, 1.0),
+                ("sentiment_view", sentiment_view, 1.0),
+                ("news_view", news_view, 1.0),
+                ("fundamentals_view", fundamentals_view, 1.0),
+                *recap_sections
+            ], provider, model, context=symbol)
+
             response = await self._call_llm(provider, model, prompt, "bear_researcher")
 
             return {
@@ -2367,6 +2684,16 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
             logger.error(f"空头研究员调用失败: {e}")
             return {"error": str(e), "agent_id": "bear_researcher"}
 
+    def _debate_recap_sections(self, rounds: List[Dict]) -> List[tuple]:
+        """更早轮次的辩论回顾片段，越早的轮次权重越低、越先被压缩"""
+        sections = []
+        for age, round_data in enumerate(reversed(rounds), 1):
+            text = (f"第{round_data['round']}轮 - 多头: {round_data.get('bull_view', '')}\n"
+                    f"第{round_data['round']}轮 - 空头: {round_data.get('bear_view', '')}")
+            sections.append((f"round_{round_data['round']}", text, 0.8 / age))
+        sections.reverse()
+        return sections
+
     async def _call_research_manager_with_debate_history(self, symbol: str, results: Dict[str, Any],
                                                         debate_history: List[Dict]) -> Dict[str, Any]:
         """调用研究经理（带辩论历史）"""
@@ -2396,8 +2723,12 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
 
             final_bull_view = results.get("bull_researcher", {}).get("analysis", "")
             final_bear_view = results.get("bear_researcher", {}).get("analysis", "")
+            recap_sections = self._debate_recap_sections(debate_history[:-1])
 
-            prompt = f"""
+            def render(v):
+                recap = "\n".join(v[name] for name, _, _ in recap_sections if v[name])
+                recap = f"\n此前轮次观点回顾:\n{recap}\n" if recap else ""
+                return f"""
 你是研究经理。基于{len(debate_history)}轮多空辩论，请对股票{symbol}（{stock_name}）做出综合投资建议。
 
 **重要提醒**: 请在分析中始终使用正确的股票代码{symbol}和股票名称{stock_name}。
@@ -2408,10 +2739,10 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
 总计论据统计:
 - 多头总论据: {total_bull_points}条
 - 空头总论据: {total_bear_points}条
-
+{recap}
 最终观点:
-多头观点: {final_bull_view[:200]}...
-空头观点: {final_bear_view[:200]}...
+多头观点: {v['final_bull_view']}
+空头观点: {v['final_bear_view']}
 
 请基于多轮辩论的充分论证，提供:
 1. 综合投资建议（买入/持有/卖出）
@@ -2423,6 +2754,12 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
 要求客观公正，基于辩论的充分性和论据强度做出判断。
 """
 
+            prompt = self.prompt_budget.fit_prompt(render, [
+                ("final_bull_view", final_bull_view, 2.0),
+                ("final_bear_view", final_bear_view, 2.0),
+                *recap_sections
+            ], provider, model, context=symbol)
+
             response = await self._call_llm(provider, model, prompt, "research_manager")
 
             return {
@@ -2488,8 +2825,53 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
             logger.error(f"多头研究员调用失败: {e}")
             return {"error": str(e), "agent_id": "bull_researcher"}
 
+    def _get_generation_params(self, provider: str) -> Dict[str, Any]:
+        """获取提供商请求使用的生成参数"""
+        return {
+            "temperature": 0.7,
+            "max_tokens": 2000 if provider in ["阿里百炼", "dashscope"] else 1000
+        }
+
+    def _is_llm_error_response(self, response: str) -> bool:
+        """判断提供商方法返回的是否为错误说明（提供商方法出错时返回文字而不抛异常）"""
+        if not response or not response.strip():
+            return True
+        head = response[:80]
+        return (head.startswith("❌") or head.startswith("分析暂时不可用")
+                or "分析不可用:" in head or "响应解析失败" in head)
+
+    def _get_llm_cache_key(self, provider: str, model: str, prompt: str, agent_id: str) -> Optional[str]:
+        """获取响应缓存键，未启用缓存或该智能体绕过缓存时返回None"""
+        if not self.llm_cache_config.get("enabled"):
+            return None
+        if agent_id in self.llm_cache_config.get("bypass_agents", []):
+            return None
+
+        params = self._get_generation_params(provider)
+        return LLMResponseCache.make_key(provider, model, params["temperature"], params["max_tokens"], prompt)
+
+    def set_llm_cache_enabled(self, enabled: bool, bypass_agents: List[str] = None) -> Dict[str, Any]:
+        """开启或关闭LLM响应缓存"""
+        self.llm_cache_config["enabled"] = bool(enabled)
+        if bypass_agents is not None:
+            self.llm_cache_config["bypass_agents"] = list(bypass_agents)
+        return {
+            "status": "success",
+            "message": f"LLM响应缓存已{'启用' if enabled else '关闭'}",
+            "config": dict(self.llm_cache_config)
+        }
+
     async def _call_llm(self, provider: str, model: str, prompt: str, agent_id: str) -> str:
         """核心LLM调用方法"""
+        # 界面订阅了流式输出时，边生成边推送给界面
+        if _stream_listener.get() is not None and self.streaming_config.get("enabled"):
+            return await self._call_llm_streaming(provider, model, prompt, agent_id)
+
+        return await self._call_llm_once(provider, model, prompt, agent_id)
+
+    async def _call_llm_once(self, provider: str, model: str, prompt: str, agent_id: str) -> str:
+        """非流式LLM调用（等待完整响应）"""
+        start_time = time.monotonic()
         try:
             # 检查提供商是否配置
             if provider not in self.llm_config:
@@ -2497,34 +2879,76 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
 
             api_key = self.llm_config[provider]
 
-            # 记录通信开始
-            start_time = datetime.now()
-
-            # 根据提供商调用相应的LLM
-            if provider == "deepseek":
-                response = await self._call_deepseek(api_key, model, prompt)
-            elif provider == "openai":
-                response = await self._call_openai(api_key, model, prompt)
-            elif provider == "google":
-                response = await self._call_google(api_key, model, prompt)
-            elif provider == "moonshot":
-                response = await self._call_moonshot(api_key, model, prompt)
-            elif provider in ["阿里百炼", "dashscope"]:
-                response = await self._call_dashscope(api_key, model, prompt, agent_id)
-            else:
-                # 自定义提供商
-                custom_config = self.custom_llm_providers.get(provider, {})
-                base_url = custom_config.get("base_url", "")
-                response = await self._call_custom_llm(api_key, base_url, model, prompt)
+            # 相同提示在同一交易时段内直接复用缓存响应
+            cache_key = self._get_llm_cache_key(provider, model, prompt, agent_id)
+            if cache_key:
+                cached_response = self.llm_response_cache.get(cache_key)
+                if cached_response is not None:
+                    logger.info(f"命中LLM响应缓存: {agent_id} -> {provider}:{model}")
+                    usage = self._record_llm_usage(agent_id, provider, model, prompt, cached_response,
+                                                   "cached", latency=0.0)
+                    self.log_communication(
+                        agent_id=agent_id,
+                        provider=provider,
+                        model=model,
+                        prompt=prompt,
+                        response=cached_response,
+                        status="cached",
+                        duration=0.0,
+                        usage=usage
+                    )
+                    return cached_response
+
+            # 排队时间单独统计，不计入响应耗时
+            queue_seconds = 0.0
+
+            # 按速率额度排队（预约提示和最大输出的token数），收到429时等待Retry-After后重试
+            prompt_tokens = estimate_tokens(prompt)
+            max_tokens = self._get_generation_params(provider).get("max_tokens", 0)
+            for attempt in range(self.retry_config.get("max_rate_limit_retries", 3) + 1):
+                queue_start = time.monotonic()
+                reservation = await self.rate_limiter.acquire(provider, model, prompt_tokens + max_tokens)
+                call_state = {"provider": provider, "model": model, "rate_limited": False, "usage": None}
+                state_token = _llm_call_state.set(call_state)
+                try:
+                    # 根据提供商调用相应的LLM（受提供商并发额度限制）
+                    async with self.provider_budget.limit(provider):
+                        queue_seconds += time.monotonic() - queue_start
+                        dispatch_start = time.monotonic()
+                        response = await self._dispatch_provider_call(provider, api_key, model, prompt, agent_id)
+                finally:
+                    _llm_call_state.reset(state_token)
+
+                if not call_state["rate_limited"]:
+                    usage = call_state["usage"]
+                    reservation.settle(usage["prompt_tokens"] + usage["completion_tokens"] if usage
+                                       else prompt_tokens + estimate_tokens(response))
+                    break
+                reservation.settle(0)
+                logger.warning(f"{provider}:{model} 请求被限流，排队后重试 ({attempt + 1})")
+
+            if cache_key and not self._is_llm_error_response(response):
+                self.llm_response_cache.set(
+                    cache_key, response,
+                    expire_at=next_market_session_boundary(),
+                    provider=provider, model=model
+                )
 
-            # 记录通信日志
+            # 记录用量和通信日志（提供商方法出错时返回错误文本而不是抛出异常）
+            status = "failed" if self._is_llm_error_response(response) else "success"
+            latency = time.monotonic() - dispatch_start
+            usage = self._record_llm_usage(agent_id, provider, model, prompt, response, status,
+                                           latency=latency, usage=call_state["usage"],
+                                           queue_seconds=queue_seconds)
             self.log_communication(
                 agent_id=agent_id,
                 provider=provider,
                 model=model,
                 prompt=prompt,
                 response=response,
-                status="success"
+                status=status,
+                duration=latency,
+                usage=usage
             )
 
             return response
@@ -2537,17 +2961,252 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
                 model=model,
                 prompt=prompt,
                 response=f"错误: {str(e)}",
-                status="failed"
+                status="failed",
+                duration=time.monotonic() - start_time
             )
 
             logger.error(f"LLM调用失败 ({provider}:{model}): {e}")
             return f"分析暂时不可用，请稍后重试。错误: {str(e)}"
 
+    async def _post_llm(self, url: str, **kwargs):
+        """发送LLM请求；收到429时记录Retry-After，由 _call_llm_once 排队后重试"""
+        response = await self.http_pool.post(url, **kwargs)
+        call_state = _llm_call_state.get()
+        if response.status_code == 429 and call_state is not None:
+            call_state["rate_limited"] = True
+            self.rate_limiter.penalize(call_state["provider"], call_state["model"],
+                                       parse_retry_after(response.headers.get("Retry-After")))
+        return response
+
+    def _capture_usage(self, result: Dict[str, Any]):
+        """把提供商响应中的token用量记到当前调用状态，由 _call_llm_once 统一记账"""
+        call_state = _llm_call_state.get()
+        if call_state is not None:
+            call_state["usage"] = extract_usage(result)
+
+    def _record_llm_usage(self, agent_id: str, provider: str, model: str, prompt: str, response: str,
+                          status: str, latency: float, usage: Dict[str, int] = None,
+                          queue_seconds: float = 0.0) -> Dict[str, Any]:
+        """记录一次调用的token、耗时和费用，提供商未返回usage时按提示和响应估算"""
+        if status == "cached":
+            # 命中缓存没有实际请求，不计token和费用
+            usage_source, usage = "cache", {"prompt_tokens": 0, "completion_tokens": 0}
+        elif usage:
+            usage_source = "provider"
+        else:
+            usage_source = "estimate"
+            usage = {"prompt_tokens": self.prompt_budget.count_tokens(prompt, provider, model),
+                     "completion_tokens": self.prompt_budget.count_tokens(response, provider, model)}
+        return self.usage_tracker.record(
+            agent_id, provider, model, usage["prompt_tokens"], usage["completion_tokens"],
+            latency, status=status, usage_source=usage_source, queue_seconds=queue_seconds
+        )
+
+    async def _dispatch_provider_call(self, provider: str, api_key: str, model: str,
+                                      prompt: str, agent_id: str) -> str:
+        """根据提供商调用相应的LLM"""
+        if provider == "deepseek":
+            return await self._call_deepseek(api_key, model, prompt)
+        elif provider == "openai":
+            return await self._call_openai(api_key, model, prompt)
+        elif provider == "google":
+            return await self._call_google(api_key, model, prompt)
+        elif provider == "moonshot":
+            return await self._call_moonshot(api_key, model, prompt)
+        elif provider in ["阿里百炼", "dashscope"]:
+            return await self._call_dashscope(api_key, model, prompt, agent_id)
+        else:
+            # 自定义提供商
+            custom_config = self.custom_llm_providers.get(provider, {})
+            base_url = custom_config.get("base_url", "")
+            return await self._call_custom_llm(api_key, base_url, model, prompt)
+
+    def _get_chat_endpoint(self, provider: str) -> Optional[str]:
+        """获取OpenAI兼容的chat/completions地址，不支持流式的提供商返回None"""
+        endpoints = {
+            "deepseek": "https://api.deepseek.com/v1/chat/completions",
+            "openai": "https://api.openai.com/v1/chat/completions",
+            "moonshot": "https://api.moonshot.cn/v1/chat/completions",
+            "阿里百炼": "https://dashscope.aliyuncs.com/compatible-mode/v1/chat/completions",
+            "dashscope": "https://dashscope.aliyuncs.com/compatible-mode/v1/chat/completions"
+        }
+        if provider in endpoints:
+            return endpoints[provider]
+        if provider == "google":
+            return None
+
+        base_url = self.custom_llm_providers.get(provider, {}).get("base_url")
+        return f"{base_url}/chat/completions" if base_url else None
+
+    async def _stream_provider(self, provider: str, api_key: str, model: str, prompt: str, agent_id: str,
+                               usage: Dict[str, int] = None):
+        """以SSE方式请求OpenAI兼容接口，逐段产出增量文本；响应带用量时写入usage字典"""
+        url = self._get_chat_endpoint(provider)
+        is_dashscope = provider in ["阿里百炼", "dashscope"]
+
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+            "Accept": "text/event-stream"
+        }
+        data = {
+            "model": model,
+            "messages": [
+                {"role": "user", "content": prompt}
+            ],
+            **self._get_generation_params("dashscope" if is_dashscope else provider),
+            "stream": True
+        }
+        if provider in STREAM_USAGE_PROVIDERS:
+            # 请求在最后一个数据块中返回token用量
+            data["stream_options"] = {"include_usage": True}
+        need_internet = is_dashscope and agent_id in ["social_media_analyst", "news_analyst", "fundamentals_analyst"]
+        if need_internet:
+            data["enable_search"] = True
+        search_info = None
+        received = False
+
+        timeout = 60.0 if is_dashscope else 30.0
+        async with self.http_pool.stream("POST", url, headers=headers, json=data, timeout=timeout) as response:
+            if response.status_code == 429:
+                self.rate_limiter.penalize(provider, model, parse_retry_after(response.headers.get("Retry-After")))
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                line = line.strip()
+                if not line.startswith("data:"):
+                    continue
+                payload = line[5:].strip()
+                if payload == "[DONE]":
+                    break
+                try:
+                    chunk = json.loads(payload)
+                except json.JSONDecodeError:
+                    continue
+
+                chunk_usage = extract_usage(chunk)
+                if chunk_usage and usage is not None:
+                    usage.update(chunk_usage)
+                if need_internet and chunk.get("search_info"):
+                    search_info = chunk["search_info"]
+
+                choices = chunk.get("choices") or []
+                if not choices:
+                    continue
+                delta = (choices[0].get("delta") or {}).get("content")
+                if delta:
+                    received = True
+                    yield delta
+
+        # 与非流式调用一致，在结尾附上联网搜索来源
+        if received and search_info:
+            sources = self._format_search_sources(search_info)
+            if sources:
+                yield sources
+
+    async def stream_llm(self, provider: str, model: str, prompt: str, agent_id: str):
+        """
+        流式LLM调用，逐段产出响应文本
+
+        不支持流式的提供商（如Google）或流式请求失败时，回退为一次性产出完整响应。
+        """
+        if provider not in self.llm_config or self._get_chat_endpoint(provider) is None:
+            yield await self._call_llm_once(provider, model, prompt, agent_id)
+            return
+
+        cache_key = self._get_llm_cache_key(provider, model, prompt, agent_id)
+        if cache_key:
+            cached_response = self.llm_response_cache.get(cache_key)
+            if cached_response is not None:
+                logger.info(f"命中LLM响应缓存: {agent_id} -> {provider}:{model}")
+                usage = self._record_llm_usage(agent_id, provider, model, prompt, cached_response,
+                                               "cached", latency=0.0)
+                self.log_communication(
+                    agent_id=agent_id,
+                    provider=provider,
+                    model=model,
+                    prompt=prompt,
+                    response=cached_response,
+                    status="cached",
+                    duration=0.0,
+                    usage=usage
+                )
+                yield cached_response
+                return
+
+        pieces = []
+        stream_error = None
+        prompt_tokens = estimate_tokens(prompt)
+        max_tokens = self._get_generation_params(provider).get("max_tokens", 0)
+        reservation = None
+        stream_usage: Dict[str, int] = {}
+        queue_start = time.monotonic()
+        stream_start = None
+        try:
+            reservation = await self.rate_limiter.acquire(provider, model, prompt_tokens + max_tokens)
+            async with self.provider_budget.limit(provider):
+                stream_start = time.monotonic()
+                async for delta in self._stream_provider(provider, self.llm_config[provider], model, prompt,
+                                                         agent_id, usage=stream_usage):
+                    pieces.append(delta)
+                    yield delta
+        except Exception as e:
+            stream_error = e
+        finally:
+            if reservation is not None:
+                if stream_usage:
+                    reservation.settle(stream_usage["prompt_tokens"] + stream_usage["completion_tokens"])
+                else:
+                    reservation.settle(prompt_tokens + estimate_tokens("".join(pieces)) if pieces else 0)
+
+        if not pieces:
+            # 未收到任何增量（流式失败或接口不支持），回退到普通请求
+            if stream_error:
+                logger.warning(f"流式调用失败，回退到普通请求 ({provider}:{model}): {stream_error}")
+            yield await self._call_llm_once(provider, model, prompt, agent_id)
+            return
+
+        response = "".join(pieces)
+        if stream_error:
+            logger.error(f"流式输出中断 ({provider}:{model}): {stream_error}")
+        elif cache_key:
+            self.llm_response_cache.set(
+                cache_key, response,
+                expire_at=next_market_session_boundary(),
+                provider=provider, model=model
+            )
+
+        status = "partial" if stream_error else "success"
+        latency = time.monotonic() - stream_start
+        usage = self._record_llm_usage(agent_id, provider, model, prompt, response, status,
+                                       latency=latency, usage=stream_usage or None,
+                                       queue_seconds=stream_start - queue_start)
+        self.log_communication(
+            agent_id=agent_id,
+            provider=provider,
+            model=model,
+            prompt=prompt,
+            response=response,
+            status=status,
+            duration=latency,
+            usage=usage
+        )
+
+    async def _call_llm_streaming(self, provider: str, model: str, prompt: str, agent_id: str) -> str:
+        """流式调用LLM，并把累计文本推送给界面监听器"""
+        text = ""
+        async for delta in self.stream_llm(provider, model, prompt, agent_id):
+            text += delta
+            listener = _stream_listener.get()
+            if listener is not None:
+                try:
+                    listener(agent_id, text)
+                except Exception as e:
+                    logger.debug(f"流式输出回调失败（可忽略）: {e}")
+        return text
+
     async def _call_deepseek(self, api_key: str, model: str, prompt: str) -> str:
         """调用DeepSeek API"""
         try:
-            import httpx
-
             headers = {
                 "Authorization": f"Bearer {api_key}",
                 "Content-Type": "application/json"
@@ -2558,19 +3217,19 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
                 "messages": [
                     {"role": "user", "content": prompt}
                 ],
-                "max_tokens": 1000,
-                "temperature": 0.7
+                **self._get_generation_params("deepseek")
             }
 
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    "https://api.deepseek.com/v1/chat/completions",
-                    headers=headers,
-                    json=data
-                )
-                response.raise_for_status()
-                result = response.json()
-                return result["choices"][0]["message"]["content"]
+            response = await self._post_llm(
+                "https://api.deepseek.com/v1/chat/completions",
+                headers=headers,
+                json=data,
+                timeout=30.0
+            )
+            response.raise_for_status()
+            result = response.json()
+            self._capture_usage(result)
+            return result["choices"][0]["message"]["content"]
 
         except Exception as e:
             logger.error(f"DeepSeek API调用失败: {e}")
@@ -2579,8 +3238,6 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
     async def _call_openai(self, api_key: str, model: str, prompt: str) -> str:
         """调用OpenAI API"""
         try:
-            import httpx
-
             headers = {
                 "Authorization": f"Bearer {api_key}",
                 "Content-Type": "application/json"
@@ -2591,19 +3248,19 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
                 "messages": [
                     {"role": "user", "content": prompt}
                 ],
-                "max_tokens": 1000,
-                "temperature": 0.7
+                **self._get_generation_params("openai")
             }
 
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    "https://api.openai.com/v1/chat/completions",
-                    headers=headers,
-                    json=data
-                )
-                response.raise_for_status()
-                result = response.json()
-                return result["choices"][0]["message"]["content"]
+            response = await self._post_llm(
+                "https://api.openai.com/v1/chat/completions",
+                headers=headers,
+                json=data,
+                timeout=30.0
+            )
+            response.raise_for_status()
+            result = response.json()
+            self._capture_usage(result)
+            return result["choices"][0]["message"]["content"]
 
         except Exception as e:
             logger.error(f"OpenAI API调用失败: {e}")
@@ -2618,6 +3275,7 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
             headers = {
                 "Content-Type": "application/json"
             }
+            generation_params = self._get_generation_params("google")
 
             # 构建请求数据
             data = {
@@ -2629,10 +3287,10 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
                     }
                 ],
                 "generationConfig": {
-                    "temperature": 0.7,
+                    "temperature": generation_params["temperature"],
                     "topK": 40,
                     "topP": 0.95,
-                    "maxOutputTokens": 1000
+                    "maxOutputTokens": generation_params["max_tokens"]
                 }
             }
 
@@ -2645,23 +3303,23 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
             # Google Gemini API URL
             url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={api_key}"
 
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(url, headers=headers, json=data)
-                response.raise_for_status()
+            response = await self._post_llm(url, headers=headers, json=data, timeout=30.0)
+            response.raise_for_status()
 
-                result = response.json()
+            result = response.json()
+            self._capture_usage(result)
 
-                # 解析响应
-                if "candidates" in result and len(result["candidates"]) > 0:
-                    candidate = result["candidates"][0]
-                    if "content" in candidate and "parts" in candidate["content"]:
-                        parts = candidate["content"]["parts"]
-                        if len(parts) > 0 and "text" in parts[0]:
-                            return parts[0]["text"]
+            # 解析响应
+            if "candidates" in result and len(result["candidates"]) > 0:
+                candidate = result["candidates"][0]
+                if "content" in candidate and "parts" in candidate["content"]:
+                    parts = candidate["content"]["parts"]
+                    if len(parts) > 0 and "text" in parts[0]:
+                        return parts[0]["text"]
 
-                # 如果解析失败，返回原始响应
-                logger.warning(f"Google API响应格式异常: {result}")
-                return f"Google API响应解析失败: {str(result)}"
+            # 如果解析失败，返回原始响应
+            logger.warning(f"Google API响应格式异常: {result}")
+            return f"Google API响应解析失败: {str(result)}"
 
         except httpx.HTTPStatusError as e:
             logger.error(f"Google API HTTP错误: {e.response.status_code} - {e.response.text}")
@@ -2680,8 +3338,6 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
     async def _call_moonshot(self, api_key: str, model: str, prompt: str) -> str:
         """调用Moonshot API"""
         try:
-            import httpx
-
             headers = {
                 "Authorization": f"Bearer {api_key}",
                 "Content-Type": "application/json"
@@ -2692,24 +3348,37 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
                 "messages": [
                     {"role": "user", "content": prompt}
                 ],
-                "max_tokens": 1000,
-                "temperature": 0.7
+                **self._get_generation_params("moonshot")
             }
 
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    "https://api.moonshot.cn/v1/chat/completions",
-                    headers=headers,
-                    json=data
-                )
-                response.raise_for_status()
-                result = response.json()
-                return result["choices"][0]["message"]["content"]
+            response = await self._post_llm(
+                "https://api.moonshot.cn/v1/chat/completions",
+                headers=headers,
+                json=data,
+                timeout=30.0
+            )
+            response.raise_for_status()
+            result = response.json()
+            self._capture_usage(result)
+            return result["choices"][0]["message"]["content"]
 
         except Exception as e:
             logger.error(f"Moonshot API调用失败: {e}")
             return f"Moonshot分析不可用: {str(e)}"
 
+    def _format_search_sources(self, search_info: Dict[str, Any]) -> str:
+        """把阿里百炼联网搜索返回的search_info格式化为搜索来源段落（无结果时为空字符串）"""
+        if not isinstance(search_info, dict) or "search_results" not in search_info:
+            return ""
+
+        search_sources = []
+        for result_item in search_info["search_results"][:3]:
+            title = result_item.get("title", "搜索结果")
+            url_link = result_item.get("url", "#")
+            search_sources.append(f"[{title}]({url_link})")
+
+        return f"\n\n📡 **搜索来源**:\n" + "\n".join(search_sources)
+
     async def _call_dashscope(self, api_key: str, model: str, prompt: str, agent_id: str) -> str:
         """调用阿里百炼DashScope API（使用OpenAI兼容接口，支持联网搜索）"""
         try:
@@ -2734,8 +3403,7 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
                 "messages": [
                     {"role": "user", "content": prompt}
                 ],
-                "temperature": 0.7,
-                "max_tokens": 2000
+                **self._get_generation_params("dashscope")
             }
 
             # 如果需要联网搜索，添加搜索参数
@@ -2744,33 +3412,25 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
                 data["enable_search"] = True
                 logger.info(f"为智能体 {agent_id} 启用联网搜索")
 
-            # 发送HTTP请求
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(url, headers=headers, json=data)
-                response.raise_for_status()
-
-                result = response.json()
+            # 发送HTTP请求（复用共享连接池）
+            response = await self._post_llm(url, headers=headers, json=data, timeout=60.0)
+            response.raise_for_status()
 
-                # 解析响应
-                if "choices" in result and len(result["choices"]) > 0:
-                    content = result["choices"][0]["message"]["content"]
+            result = response.json()
+            self._capture_usage(result)
 
-                    # 检查是否有搜索信息（如果API返回的话）
-                    if need_internet and "search_info" in result:
-                        search_info = result["search_info"]
-                        if "search_results" in search_info:
-                            search_sources = []
-                            for result_item in search_info["search_results"][:3]:
-                                title = result_item.get("title", "搜索结果")
-                                url_link = result_item.get("url", "#")
-                                search_sources.append(f"[{title}]({url_link})")
+            # 解析响应
+            if "choices" in result and len(result["choices"]) > 0:
+                content = result["choices"][0]["message"]["content"]
 
-                            content += f"\n\n📡 **搜索来源**:\n" + "\n".join(search_sources)
+                # 检查是否有搜索信息（如果API返回的话）
+                if need_internet and "search_info" in result:
+                    content += self._format_search_sources(result["search_info"])
 
-                    return content
-                else:
-                    logger.error(f"阿里百炼API响应格式异常: {result}")
-                    return "❌ 阿里百炼API响应格式异常"
+                return content
+            else:
+                logger.error(f"阿里百炼API响应格式异常: {result}")
+                return "❌ 阿里百炼API响应格式异常"
 
         except httpx.HTTPStatusError as e:
             error_text = ""
@@ -2804,8 +3464,6 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
     async def _call_custom_llm(self, api_key: str, base_url: str, model: str, prompt: str) -> str:
         """调用自定义LLM API"""
         try:
-            import httpx
-
             headers = {
                 "Authorization": f"Bearer {api_key}",
                 "Content-Type": "application/json"
@@ -2816,19 +3474,19 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
                 "messages": [
                     {"role": "user", "content": prompt}
                 ],
-                "max_tokens": 1000,
-                "temperature": 0.7
+                **self._get_generation_params("custom")
             }
 
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{base_url}/chat/completions",
-                    headers=headers,
-                    json=data
-                )
-                response.raise_for_status()
-                result = response.json()
-                return result["choices"][0]["message"]["content"]
+            response = await self._post_llm(
+                f"{base_url}/chat/completions",
+                headers=headers,
+                json=data,
+                timeout=30.0
+            )
+            response.raise_for_status()
+            result = response.json()
+            self._capture_usage(result)
+            return result["choices"][0]["message"]["content"]
 
         except Exception as e:
             logger.error(f"自定义LLM API调用失败: {e}")
@@ -3353,7 +4011,26 @@ https://gitee.com/laochendeai/Multi-AI-Cooperative-Stock-Analysis
             "configured_providers": list(self.llm_config.keys()),
             "chromadb_available": getattr(self, 'chromadb_available', False),
             "total_analyses": len(getattr(self, 'analysis_sessions', [])),
-            "system_ready": len(self.llm_config) > 0
+            "system_ready": len(self.llm_config) > 0,
+            "http_pool": self.http_pool.get_stats(),
+            "spot_snapshot": self.data_collector.spot_snapshot.get_stats(),
+            "batch_indicators": self.data_collector.batch_scanner.get_stats(),
+            "rate_limits": self.rate_limiter.get_stats(),
+            "debate": dict(self.debate_config),
+            "prompt_budget": self.prompt_budget.get_stats(),
+            "llm_usage": self.usage_tracker.get_stats(),
+            "stage_checkpoints": {
+                **self.checkpoint_config,
+                **self.stage_checkpoints.get_stats()
+            },
+            "batch_analysis": {
+                **self.batch_scheduler.get_stats(),
+                "provider_budgets": self.provider_budget.get_stats()
+            },
+            "llm_cache": {
+                **self.llm_cache_config,
+                **self.llm_response_cache.get_stats()
+            }
         }
 
 # 创建应用实例
@@ -3374,6 +4051,57 @@ def _get_model_choices():
 
     return choices if choices else ["deepseek:deepseek-chat"]
 
+# 流式输出刷新间隔（秒）
+STREAM_REFRESH_INTERVAL = 0.3
+
+# 智能体 -> 分析界面输出框位置（0为状态栏，1为综合报告）
+STREAM_OUTPUT_SLOTS = {
+    "market_analyst": 2,
+    "social_media_analyst": 3,
+    "news_analyst": 4,
+    "fundamentals_analyst": 5,
+    "bull_researcher": 6,
+    "bear_researcher": 7,
+    "research_manager": 8,
+    "trader": 9,
+    "aggressive_debator": 10,
+    "conservative_debator": 10,
+    "neutral_debator": 10,
+    "risk_manager": 10,
+    "final_decision": 10
+}
+
+STREAM_AGENT_NAMES = {
+    "aggressive_debator": "激进分析师",
+    "conservative_debator": "保守分析师",
+    "neutral_debator": "中性分析师",
+    "risk_manager": "风险经理",
+    "final_decision": "最终决策"
+}
+
+def _build_stream_updates(stream_buffer: Dict[str, str], rendered: Dict[str, str]) -> Optional[List[Any]]:
+    """根据智能体增量输出构建界面更新，没有新内容时返回None"""
+    snapshot = dict(stream_buffer)
+    changed = [agent_id for agent_id, text in snapshot.items()
+               if agent_id in STREAM_OUTPUT_SLOTS and rendered.get(agent_id) != text]
+    if not changed:
+        return None
+
+    updates = [gr.update() for _ in range(11)]
+    for slot in {STREAM_OUTPUT_SLOTS[agent_id] for agent_id in changed}:
+        agents = [agent_id for agent_id, agent_slot in STREAM_OUTPUT_SLOTS.items()
+                  if agent_slot == slot and agent_id in snapshot]
+        if slot == 10:
+            # 风险辩论各方与最终决策共用一个输出框
+            updates[slot] = "\n\n".join(
+                f"**{STREAM_AGENT_NAMES[agent_id]}**:\n{snapshot[agent_id]}" for agent_id in agents
+            )
+        else:
+            updates[slot] = snapshot[agents[0]]
+
+    rendered.update({agent_id: snapshot[agent_id] for agent_id in changed})
+    return updates
+
 def create_enhanced_interface():
     """创建增强版Gradio界面"""
 
@@ -3794,6 +4522,25 @@ def create_enhanced_interface():
                                     info="重试之间的等待时间"
                                 )
 
+                                use_llm_cache = gr.Checkbox(
+                                    label="启用LLM响应缓存",
+                                    value=False,
+                                    info="同一交易时段内相同提示直接复用已有响应"
+                                )
+
+                                debate_mode = gr.Radio(
+                                    choices=["交替发言", "同时发言"],
+                                    value="交替发言",
+                                    label="研究团队辩论模式",
+                                    info="交替：空头回应多头本轮观点；同时：双方并发回应对方上一轮观点，每轮耗时约减半"
+                                )
+
+                                resume_from_checkpoint = gr.Checkbox(
+                                    label="从阶段检查点续跑",
+                                    value=True,
+                                    info="同一交易日相同参数的分析跳过已完成的阶段，失败重试只执行缺失的阶段"
+                                )
+
                     # 右侧多功能区域 - 重新设计为标签切换
                     with gr.Column(scale=2, elem_classes=["card"]):
                         # 顶部标签切换区域
@@ -3894,6 +4641,32 @@ def create_enhanced_interface():
                                     show_copy_button=True
                                 )
 
+                            # 批量分析
+                            with gr.TabItem("📋 批量分析"):
+                                gr.Markdown("## 📋 自选股批量分析")
+                                gr.Markdown("多只股票并发分析，使用左侧的研究深度、分析师和AI引擎设置；已完成的股票会保存检查点，重复提交同一列表时跳过。")
+
+                                watchlist_input = gr.Textbox(
+                                    label="自选股列表",
+                                    placeholder="每行或用逗号分隔一个股票代码，如: 600519, 000001, 300750",
+                                    lines=4
+                                )
+
+                                with gr.Row():
+                                    batch_workers = gr.Slider(
+                                        minimum=1, maximum=10, value=3, step=1,
+                                        label="同时分析的股票数"
+                                    )
+                                    resume_batch = gr.Checkbox(
+                                        label="跳过已完成的股票",
+                                        value=True,
+                                        info="同一天提交相同列表和参数时从检查点继续"
+                                    )
+
+                                batch_analyze_btn = gr.Button("🚀 开始批量分析", variant="primary")
+                                batch_status = gr.Textbox(label="批量分析状态", value="", interactive=False)
+                                batch_results = gr.Markdown(value="暂无数据")
+
                             # 分析历史
                             with gr.TabItem("📚 分析历史"):
                                 gr.Markdown("## 📋 历史分析报告")
@@ -4420,6 +5193,43 @@ def create_enhanced_interface():
                                 max_lines=15
                             )
 
+            # 用量统计
+            with gr.TabItem("💰 用量统计"):
+                gr.Markdown("## 💰 LLM用量与费用")
+                gr.Markdown("按智能体、分析阶段和单次分析汇总token、耗时和估算费用（元，按公开单价估算）")
+
+                with gr.Row():
+                    usage_range = gr.Dropdown(
+                        choices=["最近24小时", "最近7天", "全部"],
+                        value="最近24小时",
+                        label="统计范围"
+                    )
+                    refresh_usage_btn = gr.Button("🔄 刷新用量", size="sm")
+                    clear_usage_btn = gr.Button("🗑️ 清空用量记录", size="sm")
+
+                usage_totals = gr.Markdown("暂无用量记录")
+
+                usage_headers = ["调用次数", "缓存命中", "失败", "提示tokens", "输出tokens",
+                                 "费用(元)", "总耗时(s)", "平均耗时(s)", "最长耗时(s)", "排队(s)"]
+                with gr.Row():
+                    with gr.Column():
+                        gr.Markdown("### 🤖 按智能体")
+                        usage_by_agent = gr.Dataframe(headers=["智能体"] + usage_headers, value=[])
+                    with gr.Column():
+                        gr.Markdown("### 🧭 按分析阶段")
+                        usage_by_stage = gr.Dataframe(headers=["阶段"] + usage_headers, value=[])
+
+                with gr.Row():
+                    with gr.Column():
+                        gr.Markdown("### 🧩 按模型")
+                        usage_by_model = gr.Dataframe(headers=["模型"] + usage_headers, value=[])
+                    with gr.Column():
+                        gr.Markdown("### 📈 最近的分析")
+                        usage_by_analysis = gr.Dataframe(
+                            headers=["开始时间", "股票", "调用次数", "总tokens", "费用(元)", "总耗时(s)"],
+                            value=[]
+                        )
+
             # 分析历史
             with gr.TabItem("📚 分析历史"):
                 gr.Markdown("## 📚 分析历史记录")
@@ -4457,11 +5267,13 @@ def create_enhanced_interface():
         # 事件处理函数
         def run_enhanced_analysis(symbol, depth, market_checked, sentiment_checked,
                                 news_checked, fundamentals_checked, use_real_llm,
-                                max_data_retries, max_llm_retries, retry_delay):
-            """运行增强分析（带重试配置）"""
+                                max_data_retries, max_llm_retries, retry_delay, use_llm_cache,
+                                resume_from_checkpoint, debate_mode):
+            """运行增强分析（带重试配置），分析过程中流式刷新各智能体输出"""
             if not symbol:
-                return ("❌ 请输入股票代码", "暂无数据", "暂无数据", "暂无数据",
+                yield ("❌ 请输入股票代码", "暂无数据", "暂无数据", "暂无数据",
                        "暂无数据", "暂无数据", "暂无数据", "暂无数据", "暂无数据", "暂无数据", "暂无数据")
+                return
 
             # 更新重试配置
             app.retry_config.update({
@@ -4469,10 +5281,13 @@ def create_enhanced_interface():
                 "max_llm_retries": int(max_llm_retries),
                 "retry_delay": float(retry_delay)
             })
+            app.llm_cache_config["enabled"] = bool(use_llm_cache)
+            app.checkpoint_config["resume"] = bool(resume_from_checkpoint)
+            app.debate_config["mode"] = "parallel" if debate_mode == "同时发言" else "sequential"
 
             # 调用核心分析逻辑
-            return run_analysis_with_retry(symbol, depth, market_checked, sentiment_checked,
-                                         news_checked, fundamentals_checked, use_real_llm)
+            yield from run_analysis_with_retry(symbol, depth, market_checked, sentiment_checked,
+                                               news_checked, fundamentals_checked, use_real_llm)
 
         def interrupt_analysis():
             """中断分析"""
@@ -4482,20 +5297,22 @@ def create_enhanced_interface():
         def update_analysis_status():
             """更新分析状态"""
             if app.analysis_state["is_running"]:
-                current_step = app.analysis_state.get("current_step", "运行中...")
-                failed_agents = app.analysis_state.get("failed_agents", [])
-
-                status = f"🔄 {current_step}"
-                if failed_agents:
-                    status += f" (失败: {', '.join(failed_agents)})"
-
-                return status
+                lines = []
+                for progress in app.get_analysis_progress() or [app.analysis_state]:
+                    status = f"🔄 {progress.get('current_step') or '运行中...'}"
+                    if progress.get("symbol"):
+                        status = f"{progress['symbol']}: {status}"
+                    if progress.get("failed_agents"):
+                        status += f" (失败: {', '.join(progress['failed_agents'])})"
+                    lines.append(status)
+
+                return "\n".join(lines)
             else:
                 return "🟢 系统就绪"
 
         def run_analysis_with_retry(symbol, depth, market_checked, sentiment_checked,
                                   news_checked, fundamentals_checked, use_real_llm):
-            """运行分析的核心逻辑"""
+            """运行分析的核心逻辑（生成器，逐段产出界面更新）"""
             try:
                 # 准备分析师列表
                 selected_analysts = []
@@ -4509,8 +5326,9 @@ def create_enhanced_interface():
                     selected_analysts.append("fundamentals_analyst")
 
                 if not selected_analysts:
-                    return ("❌ 请至少选择一个分析师", "暂无数据", "暂无数据", "暂无数据",
+                    yield ("❌ 请至少选择一个分析师", "暂无数据", "暂无数据", "暂无数据",
                            "暂无数据", "暂无数据", "暂无数据", "暂无数据", "暂无数据", "暂无数据", "暂无数据")
+                    return
 
                 # 执行分析
                 import asyncio
@@ -4520,14 +5338,29 @@ def create_enhanced_interface():
                     loop = asyncio.new_event_loop()
                     asyncio.set_event_loop(loop)
 
-                result = loop.run_until_complete(
-                    app.analyze_stock_enhanced(symbol, depth, selected_analysts, use_real_llm)
-                )
+                # 智能体增量输出，按 agent_id 保存最新的累计文本
+                stream_buffer = {}
+                task = loop.create_task(app.analyze_stock_enhanced(
+                    symbol, depth, selected_analysts, use_real_llm,
+                    stream_listener=lambda agent_id, text: stream_buffer.__setitem__(agent_id, text)
+                ))
+                rendered = {}
+                while not task.done():
+                    loop.run_until_complete(asyncio.wait([task], timeout=STREAM_REFRESH_INTERVAL))
+
+                    updates = _build_stream_updates(stream_buffer, rendered)
+                    if updates is not None:
+                        progress = next((item for item in app.get_analysis_progress()
+                                         if item["symbol"] == symbol), {})
+                        updates[0] = f"🔄 {progress.get('current_step') or '分析中...'}"
+                        yield tuple(updates)
+                result = task.result()
 
                 if result.get("status") == "failed":
-                    return (f"❌ 分析失败: {result.get('error', '未知错误')}",
+                    yield (f"❌ 分析失败: {result.get('error', '未知错误')}",
                            "暂无数据", "暂无数据", "暂无数据", "暂无数据",
                            "暂无数据", "暂无数据", "暂无数据", "暂无数据", "暂无数据", "暂无数据")
+                    return
 
                 # 解析结果
                 results = result.get("results", {})
@@ -4610,8 +5443,16 @@ def create_enhanced_interface():
                     "final_decision": final_decision
                 }
 
-                return (
-                    "✅ 分析完成",
+                # 研究团队辩论每轮耗时（便于比较交替/同时发言模式）
+                status_message = "✅ 分析完成"
+                research = result.get("analysis_stages", {}).get("research_team", {})
+                if research.get("round_latencies"):
+                    mode_name = "同时发言" if research.get("debate_mode") == "parallel" else "交替发言"
+                    latencies = ", ".join(f"{seconds}s" for seconds in research["round_latencies"])
+                    status_message += f"（辩论{mode_name}，每轮耗时: {latencies}）"
+
+                yield (
+                    status_message,
                     comprehensive_report,
                     market_analysis,
                     sentiment_analysis,
@@ -4628,7 +5469,7 @@ def create_enhanced_interface():
                 logger.error(f"分析执行失败: {e}")
                 import traceback
                 traceback.print_exc()
-                return (f"❌ 系统错误: {str(e)}", "暂无数据", "暂无数据", "暂无数据",
+                yield (f"❌ 系统错误: {str(e)}", "暂无数据", "暂无数据", "暂无数据",
                        "暂无数据", "暂无数据", "暂无数据", "暂无数据", "暂无数据", "暂无数据", "暂无数据")
 
         def test_deepseek_connection(api_key):
@@ -4842,8 +5683,8 @@ def create_enhanced_interface():
 
         def clear_system_cache():
             """清空系统缓存"""
-            # 这里可以添加清空缓存的逻辑
-            return "缓存已清空"
+            removed = app.llm_response_cache.clear()
+            return f"缓存已清空（LLM响应缓存 {removed} 条）"
 
         def export_system_config():
             """导出系统配置"""
@@ -4918,7 +5759,7 @@ def create_enhanced_interface():
                     log["agent_id"],  # 智能体
                     log["provider"],  # 提供商
                     log["model"],  # 模型
-                    "✅ 成功" if log["status"] == "success" else "❌ 失败",  # 状态
+                    {"success": "✅ 成功", "cached": "♻️ 缓存", "partial": "⚠️ 中断"}.get(log["status"], "❌ 失败"),  # 状态
                     log.get("prompt_preview", log.get("prompt", "")[:100] + "..."),  # 提示预览
                     log.get("response_preview", log.get("response", "")[:100] + "..."),  # 响应预览
                     str(log["prompt_length"]),  # 提示长度
@@ -4939,18 +5780,53 @@ def create_enhanced_interface():
 
             most_active_agent = max(agent_counts.items(), key=lambda x: x[1])[0] if agent_counts else "无"
             most_used_provider = max(provider_counts.items(), key=lambda x: x[1])[0] if provider_counts else "无"
+            durations = [log["duration"] for log in app.communication_logs
+                         if isinstance(log.get("duration"), (int, float)) and log["status"] != "cached"]
 
             stats = {
                 "total_communications": total_logs,
                 "successful_communications": successful_logs,
                 "failed_communications": failed_logs,
                 "success_rate": f"{(successful_logs/total_logs*100):.1f}%" if total_logs > 0 else "0%",
+                "average_response_time": f"{sum(durations) / len(durations) * 1000:.0f}ms" if durations else "0ms",
                 "most_active_agent": most_active_agent,
                 "most_used_provider": most_used_provider
             }
 
             return table_data, stats
 
+        def refresh_llm_usage(range_label):
+            """刷新LLM用量统计"""
+            since_hours = {"最近24小时": 24, "最近7天": 24 * 7}.get(range_label)
+            report = app.get_llm_usage_report(since_hours=since_hours)
+            if report.get("status") != "success":
+                return report.get("message", "获取用量失败"), [], [], [], []
+
+            def rows(items, key):
+                return [[item[key], item["calls"], item["cached"], item["failed"],
+                         item["prompt_tokens"], item["completion_tokens"], f"{item['cost']:.4f}",
+                         item["total_latency"], item["avg_latency"], item["max_latency"],
+                         item["queue_seconds"]] for item in items]
+
+            totals = report["totals"]
+            summary = (f"**{range_label}**: {totals['calls']} 次调用 | {totals['total_tokens']:,} tokens | "
+                       f"约 ¥{totals['cost']:.4f} | 累计耗时 {totals['total_latency']}s")
+            if report["by_agent"]:
+                top = report["by_agent"][0]
+                summary += f"\n\n花费最多: **{top['agent']}**（¥{top['cost']:.4f}）"
+                slowest = max(report["by_agent"], key=lambda item: item["total_latency"])
+                summary += f" | 耗时最多: **{slowest['agent']}**（{slowest['total_latency']}s）"
+
+            analyses = [[item["started_at"], item["symbol"], item["calls"], item["total_tokens"],
+                         f"{item['cost']:.4f}", item["total_latency"]] for item in report["analyses"]]
+            return (summary, rows(report["by_agent"], "agent"), rows(report["by_stage"], "stage"),
+                    rows(report["by_model"], "model"), analyses)
+
+        def clear_llm_usage(range_label):
+            """清空LLM用量记录"""
+            app.clear_llm_usage()
+            return refresh_llm_usage(range_label)
+
         def clear_communication_logs():
             """清空通信日志"""
             result = app.clear_communication_logs()
@@ -5169,13 +6045,87 @@ def create_enhanced_interface():
             except Exception as e:
                 return f"❌ 清空失败: {str(e)}", gr.Dropdown.update(), ""
 
+        def run_watchlist_analysis(watchlist_text, depth, market_checked, sentiment_checked,
+                                   news_checked, fundamentals_checked, use_real_llm,
+                                   workers, resume):
+            """批量分析自选股（生成器，每完成一只股票刷新一次结果表）"""
+            import re
+
+            symbols = [s for s in re.split(r"[\s,，;；]+", watchlist_text or "") if s]
+            if not symbols:
+                yield "❌ 请输入至少一个股票代码", "暂无数据"
+                return
+
+            selected_analysts = [
+                analyst_id for analyst_id, checked in (
+                    ("market_analyst", market_checked), ("sentiment_analyst", sentiment_checked),
+                    ("news_analyst", news_checked), ("fundamentals_analyst", fundamentals_checked)
+                ) if checked
+            ]
+            if not selected_analysts:
+                yield "❌ 请至少选择一个分析师", "暂无数据"
+                return
+
+            status_names = {"completed": "✅ 完成", "failed": "❌ 失败", "interrupted": "⏹️ 中断"}
+            rows = []
+
+            def render_table():
+                header = "| 股票 | 状态 | 决策 | 耗时(秒) | 来源 |\n|---|---|---|---|---|\n"
+                return header + "\n".join(rows) if rows else "暂无数据"
+
+            try:
+                loop = asyncio.get_event_loop()
+            except RuntimeError:
+                loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(loop)
+
+            batch = app.analyze_watchlist(symbols, depth, selected_analysts, use_real_llm,
+                                          resume=resume, max_workers=workers)
+            start_time = datetime.now()
+            try:
+                yield f"🔄 批量分析 {len(symbols)} 只股票...", render_table()
+                while True:
+                    try:
+                        event = loop.run_until_complete(batch.__anext__())
+                    except StopAsyncIteration:
+                        break
+
+                    result = event["result"] if isinstance(event["result"], dict) else {}
+                    final_decision = result.get("results", {}).get("final_decision", "")
+                    decision = app._extract_trading_signal(str(final_decision)) if final_decision else "-"
+                    source = "检查点" if event["from_checkpoint"] else "本次分析"
+                    rows.append(f"| {event['symbol']} | {status_names.get(event['status'], event['status'])} "
+                                f"| {decision} | {event['elapsed']} | {source} |")
+
+                    yield (f"🔄 已完成 {event['finished']}/{event['total']}"
+                           f"（{(datetime.now() - start_time).total_seconds():.0f}s）", render_table())
+
+                elapsed = (datetime.now() - start_time).total_seconds()
+                yield f"✅ 批量分析完成: {len(rows)} 只股票，耗时 {elapsed:.1f}s", render_table()
+
+            except Exception as e:
+                logger.error(f"批量分析失败: {e}")
+                yield f"❌ 批量分析失败: {str(e)}", render_table()
+            finally:
+                loop.run_until_complete(batch.aclose())
+
         # 绑定事件
+        batch_analyze_btn.click(
+            fn=run_watchlist_analysis,
+            inputs=[
+                watchlist_input, analysis_depth, analyst_market, analyst_sentiment,
+                analyst_news, analyst_fundamentals, use_real_llm, batch_workers, resume_batch
+            ],
+            outputs=[batch_status, batch_results]
+        )
+
         analyze_btn.click(
             fn=run_enhanced_analysis,
             inputs=[
                 stock_input, analysis_depth, analyst_market, analyst_sentiment,
                 analyst_news, analyst_fundamentals, use_real_llm,
-                max_data_retries, max_llm_retries, retry_delay
+                max_data_retries, max_llm_retries, retry_delay, use_llm_cache,
+                resume_from_checkpoint, debate_mode
             ],
             outputs=[
                 status_display, comprehensive_report, market_analysis_output,
@@ -5487,6 +6437,12 @@ def create_enhanced_interface():
             outputs=[communication_logs_display, communication_stats, agent_config_status]
         )
 
+        # 用量统计事件
+        usage_outputs = [usage_totals, usage_by_agent, usage_by_stage, usage_by_model, usage_by_analysis]
+        refresh_usage_btn.click(fn=refresh_llm_usage, inputs=[usage_range], outputs=usage_outputs)
+        usage_range.change(fn=refresh_llm_usage, inputs=[usage_range], outputs=usage_outputs)
+        clear_usage_btn.click(fn=clear_llm_usage, inputs=[usage_range], outputs=usage_outputs)
+
         # 绑定表格选择事件
         communication_logs_display.select(
             fn=handle_table_select,
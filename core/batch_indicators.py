@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+横截面批量技术指标 - 多只股票的行情对齐为 (股票数, 交易日数) 二维数组，
+按列一次算出全部指标，可选按股票分块交给进程池并行
+"""
+
+import logging
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from .technical_indicators import TechnicalIndicatorEngine
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCAN_DAYS = 250     # 约一年，足够MA60和各类平滑指标收敛
+DEFAULT_CHUNK_SIZE = 500    # 每块股票数，进程池按块分发
+
+PRICE_FIELDS = ("high", "low", "close", "volume")
+
+# 选股条件：指标名 -> 对最新值/前一期值的判断
+SCREEN_RULES = {
+    "oversold": lambda cur, prev: cur["rsi"] < 30,
+    "overbought": lambda cur, prev: cur["rsi"] > 70,
+    "macd_golden_cross": lambda cur, prev: (cur["macd_dif"] > cur["macd_dea"]) & (prev["macd_dif"] <= prev["macd_dea"]),
+    "macd_death_cross": lambda cur, prev: (cur["macd_dif"] < cur["macd_dea"]) & (prev["macd_dif"] >= prev["macd_dea"]),
+    "above_ma20": lambda cur, prev: cur["close"] > cur["ma20"],
+    "break_bollinger_upper": lambda cur, prev: cur["close"] > cur["bollinger_upper"],
+    "break_bollinger_lower": lambda cur, prev: cur["close"] < cur["bollinger_lower"],
+    "volume_surge": lambda cur, prev: cur["volume"] > 2 * cur["volume_ma5"]
+}
+
+
+def align_ohlcv(histories: Dict[str, Dict[str, np.ndarray]],
+                days: int = DEFAULT_SCAN_DAYS) -> Tuple[List[str], Dict[str, np.ndarray], List[Optional[str]]]:
+    """
+    把多只股票的行情右对齐为二维数组
+
+    每行取该股票最近days个交易日，历史不足的在左侧补NaN，
+    这样每只股票的指标与单独计算完全一致，最后一列即最新值。
+
+    Args:
+        histories: 股票代码 -> {"date", "high", "low", "close", "volume"} 列数组
+        days: 保留的交易日数
+
+    Returns:
+        (股票代码列表, {"high"/"low"/"close"/"volume": (股票数, days)数组}, 各股票最新交易日)
+    """
+    symbols = [symbol for symbol, columns in histories.items() if len(columns["close"])]
+    arrays = {field: np.full((len(symbols), days), np.nan) for field in PRICE_FIELDS}
+    last_dates: List[Optional[str]] = []
+
+    for row, symbol in enumerate(symbols):
+        columns = histories[symbol]
+        length = min(len(columns["close"]), days)
+        for field in PRICE_FIELDS:
+            arrays[field][row, days - length:] = np.asarray(columns[field][-length:], dtype=np.float64)
+        dates = columns.get("date")
+        last_dates.append(str(dates[-1]) if dates is not None and len(dates) else None)
+
+    return symbols, arrays, last_dates
+
+
+def _compute_chunk(high: np.ndarray, low: np.ndarray, close: np.ndarray, volume: np.ndarray,
+                   params: Dict[str, Any]) -> Tuple[List[str], np.ndarray, Dict[str, np.ndarray]]:
+    """
+    计算一块股票的指标（模块级函数，可被进程池序列化调用）
+
+    Returns:
+        (指标名列表, (股票数, 指标数)最新值矩阵, 选股条件 -> 布尔数组)
+    """
+    series = TechnicalIndicatorEngine(params).compute_series(high, low, close, volume)
+    series["close"] = close
+    series["volume"] = volume
+
+    current = {name: values[:, -1] for name, values in series.items()}
+    previous = {name: values[:, -2] if values.shape[1] > 1 else np.full(values.shape[0], np.nan)
+                for name, values in series.items()}
+
+    signals = {}
+    with np.errstate(invalid="ignore"):
+        for rule, condition in SCREEN_RULES.items():
+            signals[rule] = np.asarray(condition(current, previous), dtype=bool)
+
+    names = [name for name in series if name not in ("close", "volume")]
+    latest = np.column_stack([current[name] for name in names])
+    return names, latest, signals
+
+
+class BatchIndicatorScanner:
+    """全市场横截面指标扫描
+
+    从列式行情存储读取各股票最近N个交易日，拼成二维数组后整体计算，
+    每只股票只需一次内存映射切片，不再逐只调用 calculate_technical_indicators。
+    """
+
+    def __init__(self, ohlcv_store=None, params: Dict[str, Any] = None, days: int = DEFAULT_SCAN_DAYS,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, max_workers: int = None):
+        """
+        Args:
+            ohlcv_store: OHLCVColumnStore 实例（只扫描已加载行情时可为None）
+            days: 参与计算的交易日数
+            chunk_size: 每块股票数
+            max_workers: 进程数，None表示CPU核数
+        """
+        self.ohlcv_store = ohlcv_store
+        self.engine = TechnicalIndicatorEngine(params)
+        self.days = days
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+        self.stats = {"scans": 0, "symbols": 0, "last_scan_seconds": None, "last_scan_at": None}
+
+    def list_symbols(self) -> List[str]:
+        """列式存储中已有行情的股票"""
+        return sorted(p.name for p in self.ohlcv_store.root.iterdir() if p.is_dir())
+
+    def compute(self, arrays: Dict[str, np.ndarray], use_processes: bool = False):
+        """
+        对已对齐的二维数组计算指标
+
+        Returns:
+            (指标名列表, (股票数, 指标数)最新值矩阵, 选股条件 -> 布尔数组)
+        """
+        rows = arrays["close"].shape[0]
+        bounds = [(start, min(start + self.chunk_size, rows)) for start in range(0, rows, self.chunk_size)]
+        chunks = [tuple(arrays[field][start:end] for field in PRICE_FIELDS) for start, end in bounds]
+
+        if use_processes and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as pool:
+                futures = [pool.submit(_compute_chunk, *chunk, self.engine.params) for chunk in chunks]
+                results = [future.result() for future in futures]
+        else:
+            results = [_compute_chunk(*chunk, self.engine.params) for chunk in chunks]
+
+        if not results:
+            return [], np.empty((0, 0)), {rule: np.empty(0, dtype=bool) for rule in SCREEN_RULES}
+
+        names = results[0][0]
+        latest = np.vstack([result[1] for result in results])
+        signals = {rule: np.concatenate([result[2][rule] for result in results]) for rule in SCREEN_RULES}
+        return names, latest, signals
+
+    def scan(self, symbols: List[str] = None, use_processes: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        扫描列式存储中多只股票的最新指标和选股信号
+
+        Args:
+            symbols: 股票代码列表，None表示存储中的全部股票
+            use_processes: 是否使用进程池
+
+        Returns:
+            股票代码 -> {指标名: 最新值, "last_date": ..., "signals": [命中的选股条件]}
+        """
+        if self.ohlcv_store is None:
+            raise ValueError("未配置列式行情存储，请使用 scan_histories")
+
+        symbols = symbols if symbols is not None else self.list_symbols()
+        histories = {symbol: self.ohlcv_store.read(symbol, last_n=self.days) for symbol in symbols}
+        return self.scan_histories(histories, use_processes=use_processes)
+
+    def scan_histories(self, histories: Dict[str, Dict[str, Any]],
+                       use_processes: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        扫描已加载的行情（如从akshare批量获取的日线）
+
+        Args:
+            histories: 股票代码 -> {"date", "high", "low", "close", "volume"} 列数组
+            use_processes: 是否使用进程池
+        """
+        start_time = time.time()
+        symbols, arrays, last_dates = align_ohlcv(histories, self.days)
+        names, latest, signals = self.compute(arrays, use_processes=use_processes)
+
+        results = {}
+        for row, symbol in enumerate(symbols):
+            values = {name: (None if math.isnan(value) else round(float(value), 4))
+                      for name, value in zip(names, latest[row].tolist())}
+            values["last_date"] = last_dates[row]
+            values["signals"] = [rule for rule in SCREEN_RULES if signals[rule][row]]
+            results[symbol] = values
+
+        elapsed = time.time() - start_time
+        self.stats.update({
+            "scans": self.stats["scans"] + 1,
+            "symbols": len(symbols),
+            "last_scan_seconds": round(elapsed, 3),
+            "last_scan_at": time.strftime("%Y-%m-%d %H:%M:%S")
+        })
+        logger.info(f"横截面指标扫描完成: {len(symbols)} 只股票，耗时 {elapsed:.2f}s")
+        return results
+
+    @staticmethod
+    def screen(results: Dict[str, Dict[str, Any]], rules: List[str]) -> List[str]:
+        """返回同时满足所有选股条件的股票"""
+        unknown = set(rules) - set(SCREEN_RULES)
+        if unknown:
+            raise ValueError(f"未知的选股条件: {', '.join(sorted(unknown))}")
+        return [symbol for symbol, values in results.items() if set(rules) <= set(values["signals"])]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取扫描统计"""
+        return {**self.stats, "days": self.days, "chunk_size": self.chunk_size, "max_workers": self.max_workers}
+
+
+def run_benchmark(symbols: int = 5000, days: int = DEFAULT_SCAN_DAYS):
+    """基准：逐只计算 vs 横截面计算（含部分历史较短的次新股）"""
+    rng = np.random.default_rng(0)
+    close = 50 + np.cumsum(rng.normal(0, 0.5, (symbols, days)), axis=1)
+    arrays = {
+        "high": close + np.abs(rng.normal(0, 0.5, (symbols, days))),
+        "low": close - np.abs(rng.normal(0, 0.5, (symbols, days))),
+        "close": close,
+        "volume": rng.integers(1_000_000, 10_000_000, (symbols, days)).astype(float)
+    }
+    arrays_short = {field: values.copy() for field, values in arrays.items()}
+    for field in PRICE_FIELDS:
+        arrays_short[field][::10, :days // 2] = np.nan
+
+    engine = TechnicalIndicatorEngine()
+    sample = min(200, symbols)
+    start = time.perf_counter()
+    for row in range(sample):
+        engine.compute_latest(*(arrays[field][row] for field in PRICE_FIELDS))
+    per_symbol_seconds = (time.perf_counter() - start) / sample * symbols
+
+    scanner = BatchIndicatorScanner()
+    for label, data in (("完整历史", arrays), ("含次新股", arrays_short)):
+        start = time.perf_counter()
+        scanner.compute(data)
+        batch_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        scanner.compute(data, use_processes=True)
+        process_seconds = time.perf_counter() - start
+
+        print(f"{label} {symbols}只 x {days}日: 逐只(估算) {per_symbol_seconds:.2f}s, "
+              f"横截面 {batch_seconds:.2f}s, 进程池({scanner.max_workers}) {process_seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    import argparse
+    from .ohlcv_store import OHLCVColumnStore
+
+    parser = argparse.ArgumentParser(description="全市场横截面技术指标扫描")
+    parser.add_argument("--root", default="data/ohlcv", help="列式行情存储目录")
+    parser.add_argument("--processes", action="store_true", help="使用进程池")
+    parser.add_argument("--screen", nargs="*", default=[], help=f"选股条件: {', '.join(SCREEN_RULES)}")
+    parser.add_argument("--benchmark", action="store_true", help="运行合成数据基准测试")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        run_benchmark()
+    else:
+        scanner = BatchIndicatorScanner(OHLCVColumnStore(args.root))
+        results = scanner.scan(use_processes=args.processes)
+        print(f"扫描 {len(results)} 只股票，耗时 {scanner.stats['last_scan_seconds']}s")
+        for rule in SCREEN_RULES:
+            print(f"  {rule}: {len(scanner.screen(results, [rule]))}")
+        if args.screen:
+            matched = scanner.screen(results, args.screen)
+            print(f"同时满足 {', '.join(args.screen)}: {len(matched)} 只")
+            print("\n".join(matched[:50]))
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量分析调度 - 自选股列表在有界工作池中并发分析，按提供商限制LLM并发，
+完成一只保存一次检查点，结果按完成顺序产出
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import weakref
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Callable, Awaitable, AsyncIterator
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_WORKERS = 3
+DEFAULT_PROVIDER_CONCURRENCY = 4
+
+
+def make_batch_id(symbols: List[str], *parts: Any) -> str:
+    """由股票列表、分析参数和当天日期生成批次ID（同一天重复提交可断点续跑）"""
+    key = "|".join([",".join(symbols), *(str(part) for part in parts), datetime.now().strftime("%Y-%m-%d")])
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+class ProviderConcurrencyBudget:
+    """按LLM提供商限制同时进行的请求数
+
+    批量分析时多只股票、多个智能体同时调用LLM，用每个提供商一个信号量
+    把并发限制在各自的额度内。信号量按事件循环区分（界面每次分析可能使用新的事件循环），
+    以事件循环对象为弱引用键，事件循环被回收时对应的信号量随之释放。
+    """
+
+    def __init__(self, budgets: Dict[str, int] = None):
+        """
+        Args:
+            budgets: 提供商 -> 最大并发数，"default" 为未列出提供商的额度
+        """
+        self.budgets = dict(budgets or {})
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = \
+            weakref.WeakKeyDictionary()
+        self.stats: Dict[str, Dict[str, float]] = {}
+
+    def get_limit(self, provider: str) -> int:
+        return max(1, int(self.budgets.get(provider, self.budgets.get("default", DEFAULT_PROVIDER_CONCURRENCY))))
+
+    def _get_semaphore(self, provider: str) -> asyncio.Semaphore:
+        loop_semaphores = self._semaphores.setdefault(asyncio.get_running_loop(), {})
+        semaphore = loop_semaphores.get(provider)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.get_limit(provider))
+            loop_semaphores[provider] = semaphore
+        return semaphore
+
+    @asynccontextmanager
+    async def limit(self, provider: str):
+        """在提供商额度内执行一次调用"""
+        stats = self.stats.setdefault(provider, {"requests": 0, "in_flight": 0, "waited": 0,
+                                                 "total_wait_seconds": 0.0, "max_wait_seconds": 0.0})
+        semaphore = self._get_semaphore(provider)
+        start_time = time.time()
+        if semaphore.locked():
+            stats["waited"] += 1
+
+        async with semaphore:
+            wait = time.time() - start_time
+            stats["requests"] += 1
+            stats["in_flight"] += 1
+            stats["total_wait_seconds"] += wait
+            stats["max_wait_seconds"] = max(stats["max_wait_seconds"], wait)
+            try:
+                yield
+            finally:
+                stats["in_flight"] -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取各提供商的并发统计"""
+        return {
+            provider: {
+                **{k: (round(v, 3) if isinstance(v, float) else v) for k, v in stats.items()},
+                "limit": self.get_limit(provider)
+            }
+            for provider, stats in self.stats.items()
+        }
+
+
+class BatchAnalysisScheduler:
+    """自选股批量分析调度器
+
+    一个调度器实例可被多个批次同时使用：并发数和取消信号都按每次 run() 传入，
+    实例上只保存检查点目录和累计统计。
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_BATCH_WORKERS,
+                 checkpoint_dir: str = "data/batch_checkpoints"):
+        """
+        Args:
+            max_workers: 默认同时分析的股票数（run() 未指定时使用）
+            checkpoint_dir: 检查点目录，每个批次一个JSON文件
+        """
+        self.max_workers = max_workers
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+
+        self.stats = {
+            "batches": 0,
+            "completed": 0,
+            "failed": 0,
+            "from_checkpoint": 0,
+            "in_flight": 0,
+            "last_batch_seconds": None,
+            "last_batch_symbols": 0
+        }
+
+    def _checkpoint_path(self, batch_id: str) -> Path:
+        return self.checkpoint_dir / f"{batch_id}.json"
+
+    def load_checkpoint(self, batch_id: str) -> Dict[str, Any]:
+        """读取批次检查点，不存在时返回空字典"""
+        path = self._checkpoint_path(batch_id)
+        if not path.exists():
+            return {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"读取批量分析检查点失败: {e}")
+            return {}
+
+    def _save_checkpoint(self, batch_id: str, checkpoint: Dict[str, Any]):
+        """原子写入检查点（先写临时文件再替换）"""
+        path = self._checkpoint_path(batch_id)
+        tmp_path = path.with_suffix(".tmp")
+        try:
+            checkpoint["updated_at"] = datetime.now().isoformat()
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(checkpoint, f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"保存批量分析检查点失败: {e}")
+
+    def clear_checkpoint(self, batch_id: str) -> bool:
+        """删除批次检查点"""
+        path = self._checkpoint_path(batch_id)
+        if path.exists():
+            path.unlink()
+            return True
+        return False
+
+    async def run(self, symbols: List[str], analyze_func: Callable[[str], Awaitable[Dict[str, Any]]],
+                  batch_id: str = None, resume: bool = True, max_workers: int = None,
+                  cancel_event: asyncio.Event = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        批量分析，按完成顺序产出每只股票的结果
+
+        Args:
+            symbols: 股票代码列表
+            analyze_func: 单只股票的分析协程函数
+            batch_id: 批次ID，默认由股票列表生成
+            resume: 是否跳过检查点中已完成的股票
+            max_workers: 本批次同时分析的股票数，默认使用实例的max_workers
+            cancel_event: 本批次的取消信号，set() 后停止调度新的股票（已开始的分析继续完成），
+                          只影响本批次
+
+        Yields:
+            {"batch_id", "symbol", "status", "result", "elapsed", "finished", "total", "from_checkpoint"}
+        """
+        symbols = list(dict.fromkeys(s.strip() for s in symbols if s and s.strip()))
+        batch_id = batch_id or make_batch_id(symbols)
+        max_workers = int(max_workers or self.max_workers)
+        cancel_event = cancel_event or asyncio.Event()
+        start_time = time.time()
+
+        checkpoint = self.load_checkpoint(batch_id) if resume else {}
+        checkpoint.setdefault("batch_id", batch_id)
+        checkpoint.setdefault("created_at", datetime.now().isoformat())
+        checkpoint["symbols"] = symbols
+        completed = checkpoint.setdefault("completed", {})
+        for symbol in list(completed):
+            if symbol not in symbols:
+                del completed[symbol]
+
+        total = len(symbols)
+        finished = 0
+        self.stats["batches"] += 1
+        self.stats["last_batch_symbols"] = total
+
+        # 检查点中已完成的股票直接产出
+        for symbol in symbols:
+            if symbol in completed:
+                finished += 1
+                self.stats["from_checkpoint"] += 1
+                yield {"batch_id": batch_id, "symbol": symbol, "status": "completed",
+                       "result": completed[symbol], "elapsed": 0.0,
+                       "finished": finished, "total": total, "from_checkpoint": True}
+
+        pending: asyncio.Queue = asyncio.Queue()
+        for symbol in symbols:
+            if symbol not in completed:
+                pending.put_nowait(symbol)
+        if pending.empty():
+            return
+
+        outcomes: asyncio.Queue = asyncio.Queue()
+
+        async def worker():
+            try:
+                while not cancel_event.is_set():
+                    try:
+                        symbol = pending.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+
+                    symbol_start = time.time()
+                    self.stats["in_flight"] += 1
+                    try:
+                        result = await analyze_func(symbol)
+                        status = result.get("status", "completed") if isinstance(result, dict) else "completed"
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        logger.error(f"批量分析 {symbol} 失败: {e}")
+                        result = {"status": "failed", "error": str(e)}
+                        status = "failed"
+                    finally:
+                        self.stats["in_flight"] -= 1
+                    await outcomes.put((symbol, status, result, time.time() - symbol_start))
+            finally:
+                # 工作协程结束标记
+                outcomes.put_nowait(None)
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(max_workers, pending.qsize()))]
+        logger.info(f"批量分析开始: {total} 只股票，待分析 {pending.qsize()} 只，并发 {len(workers)}")
+
+        try:
+            active = len(workers)
+            while active:
+                outcome = await outcomes.get()
+                if outcome is None:
+                    active -= 1
+                    continue
+
+                symbol, status, result, elapsed = outcome
+                finished += 1
+                if status == "completed":
+                    self.stats["completed"] += 1
+                    completed[symbol] = result
+                    self._save_checkpoint(batch_id, checkpoint)
+                else:
+                    self.stats["failed"] += 1
+
+                yield {"batch_id": batch_id, "symbol": symbol, "status": status, "result": result,
+                       "elapsed": round(elapsed, 2), "finished": finished, "total": total,
+                       "from_checkpoint": False}
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self.stats["last_batch_seconds"] = round(time.time() - start_time, 2)
+            logger.info(f"批量分析结束: 完成 {len(completed)}/{total}，耗时 {self.stats['last_batch_seconds']}s")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取调度统计"""
+        return {**self.stats, "max_workers": self.max_workers, "checkpoint_dir": str(self.checkpoint_dir)}
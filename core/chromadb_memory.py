@@ -5,15 +5,376 @@ ChromaDB向量记忆系统 - 修复版
 """
 
 import asyncio
+import atexit
 import logging
 import os
+import threading
+import time
 import uuid
-from typing import Dict, Any, List, Optional
+import weakref
+from typing import Dict, Any, List, Optional, Callable, Tuple
 from datetime import datetime
 import json
 
+import numpy as np
+
+from .embedding_cache import EmbeddingCache
+
 logger = logging.getLogger(__name__)
 
+DEFAULT_WRITE_BATCH_SIZE = 16       # 待写入记忆达到该数量时立即写入
+DEFAULT_WRITE_FLUSH_INTERVAL = 2.0  # 最早的待写入记忆等待超过该秒数时写入
+
+# 进程退出时写完所有队列中的记忆
+_open_write_queues: "weakref.WeakSet[MemoryWriteQueue]" = weakref.WeakSet()
+
+
+def _close_write_queues():
+    for queue in list(_open_write_queues):
+        queue.close()
+
+
+atexit.register(_close_write_queues)
+
+
+class MemoryWriteQueue:
+    """记忆延迟写入队列
+
+    add_memory 只把记忆放入队列后立即返回，后台线程在数量或时间阈值到达时
+    把一批记忆交给 write_func（一次编码、一次写入）。使用线程而不是事件循环任务，
+    因为界面每次分析可能新建事件循环，循环结束时未触发的定时任务会丢失。
+    """
+
+    def __init__(self, write_func: Callable[[List[Dict[str, Any]]], None],
+                 batch_size: int = DEFAULT_WRITE_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_WRITE_FLUSH_INTERVAL):
+        """
+        Args:
+            write_func: 批量写入函数，参数为 [{"id", "content", "metadata"}, ...]
+            batch_size: 数量阈值
+            flush_interval: 时间阈值（秒）
+        """
+        self.write_func = write_func
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+
+        self._pending: List[Dict[str, Any]] = []
+        self._oldest = 0.0
+        self._condition = threading.Condition()
+        # 写入锁保证 flush() 返回时，此前入队的记忆（包括后台线程正在写的一批）都已写入
+        self._write_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.stats = {"enqueued": 0, "written": 0, "batches": 0, "failed": 0, "max_batch": 0}
+
+        _open_write_queues.add(self)
+
+    def put(self, item: Dict[str, Any]):
+        """放入一条待写入记忆（不阻塞）"""
+        with self._condition:
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.append(item)
+            self.stats["enqueued"] += 1
+            closed = self._closed
+            if not closed and (self._thread is None or not self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name="memory-write-queue", daemon=True)
+                self._thread.start()
+            elif not closed and len(self._pending) >= self.batch_size:
+                self._condition.notify()
+        if closed:
+            # 已关闭（进程退出中）时同步写入，避免丢失
+            self.flush()
+
+    def _ready(self) -> bool:
+        return bool(self._pending) and (
+            len(self._pending) >= self.batch_size
+            or time.monotonic() - self._oldest >= self.flush_interval
+        )
+
+    def _run(self):
+        """后台写入线程"""
+        while True:
+            with self._condition:
+                while not self._closed and not self._ready():
+                    timeout = None
+                    if self._pending:
+                        timeout = max(0.0, self._oldest + self.flush_interval - time.monotonic())
+                    self._condition.wait(timeout)
+                if self._closed:
+                    return
+            self._write_pending()
+
+    def _take_pending(self) -> List[Dict[str, Any]]:
+        with self._condition:
+            batch, self._pending = self._pending, []
+            return batch
+
+    def _write_pending(self) -> int:
+        with self._write_lock:
+            batch = self._take_pending()
+            if not batch:
+                return 0
+            try:
+                self.write_func(batch)
+                self.stats["written"] += len(batch)
+                self.stats["batches"] += 1
+                self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+                logger.debug(f"批量写入记忆: {len(batch)} 条")
+                return len(batch)
+            except Exception as e:
+                self.stats["failed"] += len(batch)
+                logger.error(f"批量写入记忆失败（{len(batch)}条）: {e}")
+                return 0
+
+    def flush(self) -> int:
+        """在当前线程写入所有待写入记忆，返回写入的条数"""
+        return self._write_pending()
+
+    def discard(self, predicate: Callable[[Dict[str, Any]], bool] = None) -> int:
+        """丢弃待写入的记忆（全部或满足条件的），返回丢弃的条数"""
+        with self._condition:
+            before = len(self._pending)
+            self._pending = [item for item in self._pending if predicate and not predicate(item)]
+            return before - len(self._pending)
+
+    def close(self):
+        """写完剩余记忆并停止后台线程"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取队列统计"""
+        with self._condition:
+            pending = len(self._pending)
+        return {**self.stats, "pending": pending, "batch_size": self.batch_size,
+                "flush_interval": self.flush_interval}
+
+
+class SimpleEmbedding:
+    """简单的文本嵌入方法（所有预训练模型都加载失败时的备选方案）"""
+
+    def encode(self, texts):
+        """简单的文本嵌入方法"""
+        if isinstance(texts, str):
+            texts = [texts]
+
+        import hashlib
+
+        embeddings = []
+        for text in texts:
+            # 使用文本哈希和长度创建简单的嵌入向量
+            hash_obj = hashlib.md5(text.encode('utf-8'))
+            hash_bytes = hash_obj.digest()
+
+            # 转换为384维向量（与MiniLM模型维度一致）
+            embedding = np.frombuffer(hash_bytes, dtype=np.uint8)
+            embedding = np.tile(embedding, 24)[:384]  # 重复到384维
+            embedding = embedding.astype(np.float32) / 255.0  # 归一化
+
+            embeddings.append(embedding)
+
+        return np.array(embeddings) if len(embeddings) > 1 else embeddings[0]
+
+
+# 备选模型列表，按优先级排序
+EMBEDDING_MODEL_CANDIDATES = [
+    "sentence-transformers/all-MiniLM-L6-v2",
+    "paraphrase-MiniLM-L6-v2",
+    "all-MiniLM-L6-v2",
+    "sentence-transformers/paraphrase-MiniLM-L6-v2",
+    "distilbert-base-nli-mean-tokens"
+]
+
+SIMPLE_EMBEDDING_NAME = "simple-md5-384"
+DEFAULT_MODEL_WAIT_TIMEOUT = 120.0
+
+
+def _cleanup_model_cache(model_name: str, cache_dir: str):
+    """清理可能损坏的模型缓存"""
+    try:
+        import shutil
+
+        # 构建模型缓存路径
+        model_cache_path = os.path.join(cache_dir, model_name.replace("/", "_"))
+
+        if os.path.exists(model_cache_path):
+            # 检查是否有损坏的文件
+            for root, dirs, files in os.walk(model_cache_path):
+                for file in files:
+                    file_path = os.path.join(root, file)
+                    try:
+                        # 检查JSON文件是否损坏
+                        if file.endswith('.json'):
+                            with open(file_path, 'r', encoding='utf-8') as f:
+                                json.load(f)
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        logger.warning(f"发现损坏的缓存文件，清理: {file_path}")
+                        try:
+                            shutil.rmtree(model_cache_path)
+                            logger.info(f"已清理损坏的模型缓存: {model_cache_path}")
+                            break
+                        except:
+                            pass
+
+    except Exception as e:
+        logger.debug(f"缓存清理失败（可忽略）: {e}")
+
+
+class EmbeddingModelLoader:
+    """嵌入模型后台加载器
+
+    加载 sentence-transformers 模型需要数秒（首次还要下载），放在后台线程中进行，
+    分析不等待模型：模型就绪前检索记忆直接返回空结果，写入的记忆在写入队列中等待。
+    """
+
+    def __init__(self, cache_dir: str = "data/models", candidates: List[str] = None):
+        self.cache_dir = cache_dir
+        self.candidates = list(candidates or EMBEDDING_MODEL_CANDIDATES)
+        self.model = None
+        self.model_name = None
+        self.status = "idle"        # idle / loading / ready
+        self.load_seconds = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def start(self):
+        """开始后台加载（已开始或已完成时不重复加载）"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.status = "loading"
+            self._thread = threading.Thread(target=self._load, name="embedding-model-loader", daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout: float = None) -> bool:
+        """等待加载完成，返回是否就绪"""
+        return self._ready.wait(timeout)
+
+    def _load(self):
+        start_time = time.perf_counter()
+        try:
+            self.model, self.model_name = self._load_model()
+        except Exception as e:
+            logger.error(f"嵌入模型加载失败，使用简单嵌入方法: {e}")
+            self.model, self.model_name = SimpleEmbedding(), SIMPLE_EMBEDDING_NAME
+        self.load_seconds = round(time.perf_counter() - start_time, 3)
+        self.status = "ready"
+        self._ready.set()
+        logger.info(f"✅ 嵌入模型就绪: {self.model_name}，后台加载耗时 {self.load_seconds}s")
+
+    def _load_model(self):
+        """依次尝试备选模型，全部失败时使用简单嵌入方法"""
+        # 确保模型缓存目录存在
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        for i, model_name in enumerate(self.candidates):
+            try:
+                logger.info(f"尝试加载嵌入模型 ({i+1}/{len(self.candidates)}): {model_name}")
+
+                # 清理可能损坏的缓存
+                _cleanup_model_cache(model_name, self.cache_dir)
+
+                from sentence_transformers import SentenceTransformer
+
+                # 使用更稳定的模型加载方式
+                model = SentenceTransformer(
+                    model_name,
+                    cache_folder=self.cache_dir,
+                    device="cpu",  # 强制使用CPU
+                    trust_remote_code=False  # 安全设置
+                )
+
+                # 测试模型是否正常工作
+                test_embedding = model.encode("测试文本")
+                if len(test_embedding) > 0:
+                    logger.info(f"✅ 嵌入模型加载成功: {model_name}")
+                    return model, model_name
+                raise Exception("模型测试失败")
+
+            except Exception as e:
+                logger.warning(f"模型 {model_name} 加载失败: {e}")
+
+        # 所有模型都失败了，使用简单的嵌入方法
+        logger.error("所有预训练模型都失败，使用简单嵌入方法")
+        return SimpleEmbedding(), SIMPLE_EMBEDDING_NAME
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取加载状态"""
+        return {"status": self.status, "model": self.model_name, "load_seconds": self.load_seconds}
+
+
+class SharedResourceRegistry:
+    """按键共享、引用计数的进程级资源表（线程安全）
+
+    同一进程中的多个记忆管理器（多个TradingGraph、多个应用实例）按键共用
+    同一个资源，最后一个使用者释放时才关闭。
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+
+    def acquire(self, key: str, factory: Callable[[], Any]) -> Any:
+        """获取资源（不存在时用factory创建），引用计数加一"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = {"resource": factory(), "refs": 0}
+                self._entries[key] = entry
+                logger.info(f"创建共享{self.name}: {key}")
+            entry["refs"] += 1
+            return entry["resource"]
+
+    def release(self, key: str, closer: Callable[[Any], None] = None):
+        """引用计数减一，降为零时移除并关闭资源"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry["refs"] -= 1
+            if entry["refs"] > 0:
+                return
+            del self._entries[key]
+
+        logger.info(f"释放共享{self.name}: {key}")
+        if closer is not None:
+            try:
+                closer(entry["resource"])
+            except Exception as e:
+                logger.warning(f"关闭共享{self.name}失败: {e}")
+
+    def get_stats(self) -> Dict[str, int]:
+        """各资源的引用计数"""
+        with self._lock:
+            return {key: entry["refs"] for key, entry in self._entries.items()}
+
+
+# 嵌入模型按模型缓存目录共享，ChromaDB客户端按持久化目录共享，向量缓存按数据库路径共享
+_model_registry = SharedResourceRegistry("嵌入模型")
+_client_registry = SharedResourceRegistry("ChromaDB客户端")
+_embedding_cache_registry = SharedResourceRegistry("向量缓存")
+
+
+def get_shared_resource_stats() -> Dict[str, Dict[str, int]]:
+    """获取进程级共享资源的引用计数"""
+    return {
+        "embedding_models": _model_registry.get_stats(),
+        "chromadb_clients": _client_registry.get_stats(),
+        "embedding_caches": _embedding_cache_registry.get_stats()
+    }
+
+
 class ChromaDBMemoryManager:
     """ChromaDB向量记忆管理器 - 修复版"""
     
@@ -35,11 +396,36 @@ class ChromaDBMemoryManager:
         self.client = None
         self.collection = None
         self.embedding_model = None
+        self.embedding_model_name = None
+        # 嵌入模型和向量缓存为进程级共享资源，close() 时释放引用
+        self._model_key = os.path.abspath(self.config["model_cache_dir"])
+        self.model_loader = _model_registry.acquire(
+            self._model_key, lambda: EmbeddingModelLoader(self.config["model_cache_dir"]))
+        self._client_key = None
+        self._released = False
         self.initialized = False
+        self.init_seconds = None
+        self.stats = {"searches": 0, "searches_without_model": 0, "batch_searches": 0, "batch_fallbacks": 0}
         self.use_simple_fallback = False
 
+        # 文本向量缓存（查询和写入共用），按模型名+文本哈希寻址
+        self._embedding_cache_key = None
+        self.embedding_cache = None
+        if self.config.get("enable_embedding_cache"):
+            cache_path = self.config["embedding_cache_path"]
+            self._embedding_cache_key = os.path.abspath(cache_path)
+            self.embedding_cache = _embedding_cache_registry.acquire(
+                self._embedding_cache_key, lambda: EmbeddingCache(cache_path))
+
         # 简单存储作为备用
         self.simple_memories = []
+
+        # 延迟批量写入：多个智能体的记忆攒成一批，一次编码、一次写入
+        self.write_queue = MemoryWriteQueue(
+            self._write_batch,
+            batch_size=self.config["write_batch_size"],
+            flush_interval=self.config["write_flush_interval"]
+        )
         
     def _get_default_config(self) -> Dict[str, Any]:
         """获取默认配置"""
@@ -49,7 +435,13 @@ class ChromaDBMemoryManager:
             "embedding_model": "sentence-transformers/all-MiniLM-L6-v2",
             "max_memories": 1000,
             "similarity_threshold": 0.7,
-            "enable_chromadb": True
+            "enable_chromadb": True,
+            "write_batch_size": DEFAULT_WRITE_BATCH_SIZE,
+            "write_flush_interval": DEFAULT_WRITE_FLUSH_INTERVAL,
+            "enable_embedding_cache": True,
+            "embedding_cache_path": "data/cache/embeddings.db",
+            "model_cache_dir": "data/models",
+            "model_wait_timeout": DEFAULT_MODEL_WAIT_TIMEOUT
         }
     
     async def initialize(self) -> bool:
@@ -59,7 +451,11 @@ class ChromaDBMemoryManager:
         Returns:
             是否初始化成功
         """
+        if self.initialized:
+            return True
+
         try:
+            start_time = time.perf_counter()
             logger.info("🧠 初始化ChromaDB向量记忆系统...")
             logger.info(f"📋 配置信息: {list(self.config.keys())}")
             logger.info(f"📁 持久化目录: {self.config.get('persist_directory', 'NOT_SET')}")
@@ -72,11 +468,13 @@ class ChromaDBMemoryManager:
             # 初始化ChromaDB客户端
             await self._initialize_chromadb()
             
-            # 初始化嵌入模型
-            await self._initialize_embedding_model()
+            # 嵌入模型在后台线程加载，不阻塞事件循环；就绪前的分析不带记忆上下文
+            self.start_loading()
             
             self.initialized = True
-            logger.info("✅ ChromaDB向量记忆系统初始化成功")
+            self.init_seconds = round(time.perf_counter() - start_time, 3)
+            logger.info(f"✅ ChromaDB向量记忆系统初始化成功，耗时 {self.init_seconds}s"
+                        f"（嵌入模型: {self.model_loader.status}）")
             return True
 
         except Exception as e:
@@ -88,14 +486,14 @@ class ChromaDBMemoryManager:
             raise Exception(f"ChromaDB初始化失败，必须修复: {e}")
     
     def _check_chromadb_available(self) -> bool:
-        """检查ChromaDB是否可用"""
-        try:
-            import chromadb
-            import sentence_transformers
-            return True
-        except ImportError as e:
-            logger.warning(f"ChromaDB依赖不可用: {e}")
+        """检查ChromaDB是否可用（只查找模块，不在事件循环中导入torch等重量级依赖）"""
+        import importlib.util
+        missing = [name for name in ("chromadb", "sentence_transformers")
+                   if importlib.util.find_spec(name) is None]
+        if missing:
+            logger.warning(f"ChromaDB依赖不可用: {', '.join(missing)}")
             return False
+        return True
     
     async def _initialize_chromadb(self):
         """初始化ChromaDB客户端"""
@@ -107,14 +505,17 @@ class ChromaDBMemoryManager:
             persist_dir = self.config.get("persist_directory", "data/memory/chromadb")
             os.makedirs(persist_dir, exist_ok=True)
             
-            # 创建客户端
-            self.client = chromadb.PersistentClient(
-                path=persist_dir,
-                settings=Settings(
-                    anonymized_telemetry=False,
-                    allow_reset=True
-                )
-            )
+            # 同一持久化目录的客户端在进程内共享
+            client_key = os.path.abspath(persist_dir)
+            if self._client_key != client_key:
+                self.client = _client_registry.acquire(client_key, lambda: chromadb.PersistentClient(
+                    path=persist_dir,
+                    settings=Settings(
+                        anonymized_telemetry=False,
+                        allow_reset=True
+                    )
+                ))
+                self._client_key = client_key
             
             # 获取或创建集合
             self.collection = self.client.get_or_create_collection(
@@ -128,125 +529,54 @@ class ChromaDBMemoryManager:
             logger.error(f"ChromaDB客户端初始化失败: {e}")
             raise
     
-    async def _initialize_embedding_model(self):
-        """初始化嵌入模型"""
-        # 定义备选模型列表，按优先级排序
-        model_candidates = [
-            "sentence-transformers/all-MiniLM-L6-v2",
-            "paraphrase-MiniLM-L6-v2",
-            "all-MiniLM-L6-v2",
-            "sentence-transformers/paraphrase-MiniLM-L6-v2",
-            "distilbert-base-nli-mean-tokens"
-        ]
+    def start_loading(self):
+        """在后台开始加载嵌入模型（不阻塞，可重复调用）"""
+        if self._check_chromadb_available():
+            self.model_loader.start()
 
-        # 确保模型缓存目录存在
-        import os
-        cache_dir = "data/models"
-        os.makedirs(cache_dir, exist_ok=True)
+    def _adopt_model(self) -> bool:
+        """后台加载完成后取用模型，返回模型是否可用"""
+        if self.embedding_model is None and self.model_loader.ready:
+            self.embedding_model = self.model_loader.model
+            self.embedding_model_name = self.model_loader.model_name
+            self.config["embedding_model"] = self.embedding_model_name
+        return self.embedding_model is not None
 
-        for i, model_name in enumerate(model_candidates):
-            try:
-                logger.info(f"尝试加载嵌入模型 ({i+1}/{len(model_candidates)}): {model_name}")
+    def _require_model(self):
+        """等待嵌入模型加载完成（只在后台写入线程中调用）"""
+        if self._adopt_model():
+            return
+        self.model_loader.start()
+        if not self.model_loader.wait(self.config["model_wait_timeout"]):
+            raise TimeoutError(f"嵌入模型加载超过 {self.config['model_wait_timeout']}s")
+        self._adopt_model()
 
-                # 清理可能损坏的缓存
-                await self._cleanup_model_cache(model_name, cache_dir)
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        """批量编码文本，返回每条文本的向量（先查向量缓存，未命中的一次性编码）"""
+        if self.embedding_cache is None:
+            return self._encode_uncached(texts).tolist()
+        model_name = self.embedding_model_name or type(self.embedding_model).__name__
+        vectors = self.embedding_cache.encode(model_name, list(texts), self._encode_uncached)
+        return [vector.tolist() for vector in vectors]
 
-                from sentence_transformers import SentenceTransformer
+    def _encode_uncached(self, texts: List[str]) -> np.ndarray:
+        """调用嵌入模型编码，返回二维数组"""
+        vectors = np.asarray(self.embedding_model.encode(list(texts)), dtype=np.float32)
+        # 简单嵌入方法只有一条文本时返回一维向量
+        if vectors.ndim == 1:
+            vectors = vectors.reshape(1, -1)
+        return vectors
 
-                # 使用更稳定的模型加载方式
-                self.embedding_model = SentenceTransformer(
-                    model_name,
-                    cache_folder=cache_dir,
-                    device="cpu",  # 强制使用CPU
-                    trust_remote_code=False  # 安全设置
-                )
-
-                # 测试模型是否正常工作
-                test_embedding = self.embedding_model.encode("测试文本")
-                if len(test_embedding) > 0:
-                    logger.info(f"✅ 嵌入模型加载成功: {model_name}")
-                    self.config["embedding_model"] = model_name  # 更新配置
-                    return
-                else:
-                    raise Exception("模型测试失败")
-
-            except Exception as e:
-                logger.warning(f"模型 {model_name} 加载失败: {e}")
-                if i == len(model_candidates) - 1:
-                    # 所有模型都失败了，尝试使用简单的嵌入方法
-                    logger.error("所有预训练模型都失败，尝试使用简单嵌入方法")
-                    await self._initialize_simple_embedding()
-                    return
-                continue
-
-    async def _cleanup_model_cache(self, model_name: str, cache_dir: str):
-        """清理可能损坏的模型缓存"""
-        try:
-            import os
-            import shutil
-
-            # 构建模型缓存路径
-            model_cache_path = os.path.join(cache_dir, model_name.replace("/", "_"))
-
-            if os.path.exists(model_cache_path):
-                # 检查是否有损坏的文件
-                for root, dirs, files in os.walk(model_cache_path):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        try:
-                            # 检查JSON文件是否损坏
-                            if file.endswith('.json'):
-                                with open(file_path, 'r', encoding='utf-8') as f:
-                                    import json
-                                    json.load(f)
-                        except (json.JSONDecodeError, UnicodeDecodeError):
-                            logger.warning(f"发现损坏的缓存文件，清理: {file_path}")
-                            try:
-                                shutil.rmtree(model_cache_path)
-                                logger.info(f"已清理损坏的模型缓存: {model_cache_path}")
-                                break
-                            except:
-                                pass
-
-        except Exception as e:
-            logger.debug(f"缓存清理失败（可忽略）: {e}")
-
-    async def _initialize_simple_embedding(self):
-        """初始化简单的嵌入方法作为备选方案"""
-        try:
-            logger.info("初始化简单嵌入方法...")
-
-            # 创建一个简单的嵌入类
-            class SimpleEmbedding:
-                def encode(self, texts):
-                    """简单的文本嵌入方法"""
-                    if isinstance(texts, str):
-                        texts = [texts]
-
-                    import hashlib
-                    import numpy as np
-
-                    embeddings = []
-                    for text in texts:
-                        # 使用文本哈希和长度创建简单的嵌入向量
-                        hash_obj = hashlib.md5(text.encode('utf-8'))
-                        hash_bytes = hash_obj.digest()
-
-                        # 转换为384维向量（与MiniLM模型维度一致）
-                        embedding = np.frombuffer(hash_bytes, dtype=np.uint8)
-                        embedding = np.tile(embedding, 24)[:384]  # 重复到384维
-                        embedding = embedding.astype(np.float32) / 255.0  # 归一化
-
-                        embeddings.append(embedding)
-
-                    return np.array(embeddings) if len(embeddings) > 1 else embeddings[0]
-
-            self.embedding_model = SimpleEmbedding()
-            logger.info("✅ 简单嵌入方法初始化成功")
-
-        except Exception as e:
-            logger.error(f"简单嵌入方法初始化失败: {e}")
-            raise Exception("所有嵌入方法都失败，无法初始化记忆系统")
+    def _write_batch(self, items: List[Dict[str, Any]]):
+        """把一批记忆编码后一次写入ChromaDB（由写入队列在后台线程调用）"""
+        self._require_model()
+        embeddings = self._encode([item["content"] for item in items])
+        self.collection.add(
+            ids=[item["id"] for item in items],
+            embeddings=embeddings,
+            documents=[item["content"] for item in items],
+            metadatas=[item["metadata"] for item in items]
+        )
     
     async def add_memory(self, content: str, metadata: Dict[str, Any] = None) -> str:
         """
@@ -290,17 +620,9 @@ class ChromaDBMemoryManager:
                 logger.debug(f"添加简单记忆: {memory_id}")
                 
             else:
-                # 使用ChromaDB
-                embedding = self.embedding_model.encode([content])[0].tolist()
-                
-                self.collection.add(
-                    ids=[memory_id],
-                    embeddings=[embedding],
-                    documents=[content],
-                    metadatas=[full_metadata]
-                )
-                
-                logger.debug(f"添加ChromaDB记忆: {memory_id}")
+                # 使用ChromaDB：放入写入队列后立即返回，由后台线程批量编码写入
+                self.write_queue.put({"id": memory_id, "content": content, "metadata": full_metadata})
+                logger.debug(f"ChromaDB记忆已入队: {memory_id}")
             
             return memory_id
             
@@ -308,6 +630,23 @@ class ChromaDBMemoryManager:
             logger.error(f"添加记忆失败: {e}")
             return ""
     
+    def _query_collection(self, query: str, agent_id: str = None, limit: int = 5) -> List[Dict[str, Any]]:
+        """ChromaDB向量搜索（不计入检索统计，调用方需已确认嵌入模型可用）"""
+        query_embedding = self._encode([query])[0]
+
+        # 构建过滤条件
+        where_filter = {}
+        if agent_id:
+            where_filter["agent_id"] = agent_id
+
+        search_results = self.collection.query(
+            query_embeddings=[query_embedding],
+            n_results=limit,
+            where=where_filter if where_filter else None
+        )
+
+        return self._parse_query_results(search_results, 0)
+
     async def search_memories(self, query: str, agent_id: str = None, limit: int = 5) -> List[Dict[str, Any]]:
         """
         搜索相关记忆
@@ -340,37 +679,104 @@ class ChromaDBMemoryManager:
                 return results[:limit]
                 
             else:
-                # 使用ChromaDB向量搜索
-                query_embedding = self.embedding_model.encode([query])[0].tolist()
-                
-                # 构建过滤条件
-                where_filter = {}
-                if agent_id:
-                    where_filter["agent_id"] = agent_id
-                
-                search_results = self.collection.query(
-                    query_embeddings=[query_embedding],
-                    n_results=limit,
-                    where=where_filter if where_filter else None
-                )
-                
-                results = []
-                if search_results["documents"]:
-                    for i, doc in enumerate(search_results["documents"][0]):
-                        metadata = search_results["metadatas"][0][i] if search_results["metadatas"] else {}
-                        distance = search_results["distances"][0][i] if search_results["distances"] else 0.5
-                        
-                        results.append({
-                            "content": doc,
-                            "metadata": metadata,
-                            "relevance_score": 1.0 - distance  # 转换为相关性分数
-                        })
-                
-                return results
+                # 嵌入模型仍在后台加载时不等待，本次分析不带记忆上下文
+                self.stats["searches"] += 1
+                if not self._adopt_model():
+                    self.stats["searches_without_model"] += 1
+                    logger.debug("嵌入模型加载中，跳过记忆检索")
+                    return []
+
+                return self._query_collection(query, agent_id, limit)
                 
         except Exception as e:
             logger.error(f"搜索记忆失败: {e}")
             return []
+
+    def _parse_query_results(self, search_results: Dict[str, Any], index: int) -> List[Dict[str, Any]]:
+        """把 collection.query 第index个查询的结果转换为记忆列表"""
+        results = []
+        if search_results["documents"]:
+            for i, doc in enumerate(search_results["documents"][index]):
+                metadata = search_results["metadatas"][index][i] if search_results["metadatas"] else {}
+                distance = search_results["distances"][index][i] if search_results["distances"] else 0.5
+
+                results.append({
+                    "content": doc,
+                    "metadata": metadata,
+                    "relevance_score": 1.0 - distance  # 转换为相关性分数
+                })
+        return results
+
+    async def search_memories_batch(self, requests: List[Tuple[str, Optional[str]]],
+                                    limit: int = 5) -> List[List[Dict[str, Any]]]:
+        """
+        批量搜索多个智能体的相关记忆
+
+        相同的查询文本只编码一次，所有查询合并为一次多查询 collection.query
+        （按智能体ID用$in过滤并多取一些结果），再按智能体分发；
+        结果中某个智能体不足limit条且可能还有更多时，单独为它补查。
+
+        Args:
+            requests: [(查询字符串, 智能体ID), ...]，智能体ID为None表示不过滤
+            limit: 每个请求返回的数量上限
+
+        Returns:
+            与requests一一对应的记忆列表
+        """
+        if not requests:
+            return []
+
+        try:
+            if not self.initialized:
+                await self.initialize()
+
+            if self.use_simple_fallback or not self.collection:
+                return [await self.search_memories(query, agent_id, limit) for query, agent_id in requests]
+
+            self.stats["searches"] += len(requests)
+            self.stats["batch_searches"] += 1
+            if not self._adopt_model():
+                self.stats["searches_without_model"] += len(requests)
+                logger.debug("嵌入模型加载中，跳过批量记忆检索")
+                return [[] for _ in requests]
+
+            total = self.collection.count()
+            if total == 0:
+                return [[] for _ in requests]
+
+            queries = list(dict.fromkeys(query for query, _ in requests))
+            agent_ids = list(dict.fromkeys(agent_id for _, agent_id in requests))
+            if None in agent_ids:
+                where_filter = None
+            elif len(agent_ids) == 1:
+                where_filter = {"agent_id": agent_ids[0]}
+            else:
+                where_filter = {"agent_id": {"$in": agent_ids}}
+
+            # 每个查询需要覆盖所有智能体，多取一倍以减少补查
+            n_results = min(total, limit * len(agent_ids) * 2)
+            query_embeddings = self._encode(queries)
+            search_results = self.collection.query(
+                query_embeddings=query_embeddings,
+                n_results=n_results,
+                where=where_filter
+            )
+            candidates = {query: self._parse_query_results(search_results, i) for i, query in enumerate(queries)}
+
+            results = []
+            for query, agent_id in requests:
+                matched = [memory for memory in candidates[query]
+                           if agent_id is None or memory["metadata"].get("agent_id") == agent_id]
+                if len(matched) < limit and len(candidates[query]) >= n_results:
+                    # 候选被其他智能体占满，单独补查
+                    self.stats["batch_fallbacks"] += 1
+                    matched = self._query_collection(query, agent_id, limit)
+                results.append(matched[:limit])
+            return results
+
+        except Exception as e:
+            logger.error(f"批量搜索记忆失败: {e}")
+            return [[] for _ in requests]
     
     async def get_memory_stats(self) -> Dict[str, Any]:
         """获取记忆统计信息"""
@@ -387,7 +793,13 @@ class ChromaDBMemoryManager:
                     "total_memories": count,
                     "storage_type": "chromadb",
                     "initialized": self.initialized,
-                    "collection_name": self.config["collection_name"]
+                    "collection_name": self.config["collection_name"],
+                    "write_queue": self.write_queue.get_stats(),
+                    "embedding_model": self.model_loader.get_stats(),
+                    "init_seconds": self.init_seconds,
+                    "shared_resources": get_shared_resource_stats(),
+                    **self.stats,
+                    "embedding_cache": self.embedding_cache.get_stats() if self.embedding_cache else None
                 }
         except Exception as e:
             logger.error(f"获取记忆统计失败: {e}")
@@ -405,6 +817,11 @@ class ChromaDBMemoryManager:
                 else:
                     self.simple_memories.clear()
             else:
+                # 尚未写入的记忆一并丢弃
+                if agent_id:
+                    self.write_queue.discard(lambda item: item["metadata"].get("agent_id") == agent_id)
+                else:
+                    self.write_queue.discard()
                 if self.collection:
                     if agent_id:
                         # 删除特定智能体的记忆
@@ -420,6 +837,33 @@ class ChromaDBMemoryManager:
         except Exception as e:
             logger.error(f"清理记忆失败: {e}")
 
+    async def flush(self) -> int:
+        """立即写入队列中的记忆（在线程池中执行，不阻塞事件循环），返回写入条数"""
+        return await asyncio.to_thread(self.write_queue.flush)
+
+    def release(self):
+        """写完队列中的记忆，释放共享的嵌入模型、客户端和向量缓存（可重复调用，释放后不再使用）"""
+        if self._released:
+            return
+        self._released = True
+        self.write_queue.close()
+
+        _model_registry.release(self._model_key)
+        if self._embedding_cache_key:
+            _embedding_cache_registry.release(self._embedding_cache_key, lambda cache: cache.close())
+        if self._client_key:
+            _client_registry.release(self._client_key)
+
+        self.embedding_model = None
+        self.embedding_cache = None
+        self.client = None
+        self.collection = None
+        self.initialized = False
+
+    async def close(self):
+        """写完队列中的记忆并释放共享资源"""
+        await asyncio.to_thread(self.release)
+
 def create_chromadb_memory_manager(config: Dict[str, Any] = None) -> ChromaDBMemoryManager:
     """
     创建ChromaDB记忆管理器
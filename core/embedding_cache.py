@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文本向量缓存 - 按嵌入模型名和文本哈希寻址的两级缓存（内存LRU + SQLite），
+避免同一查询（如股票代码）被每个智能体在每次分析中重复编码
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Callable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_MEMORY_ITEMS = 2048
+DEFAULT_MAX_DISK_ITEMS = 20000
+
+
+class EmbeddingCache:
+    """两级文本向量缓存：内存LRU + SQLite持久化"""
+
+    def __init__(self, db_path: str = "data/cache/embeddings.db",
+                 max_memory_items: int = DEFAULT_MAX_MEMORY_ITEMS,
+                 max_disk_items: int = DEFAULT_MAX_DISK_ITEMS):
+        """
+        Args:
+            db_path: 数据库路径
+            max_memory_items: 内存LRU容量
+            max_disk_items: 持久化条目上限，超出时删除最早写入的条目
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+
+        self.memory_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.stats = {"hits": 0, "memory_hits": 0, "misses": 0, "writes": 0, "encode_calls": 0}
+
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._init_database()
+
+    def _init_database(self):
+        """初始化缓存表"""
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    cache_key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_embeddings_created ON embeddings(created_at)"
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        """根据模型名和文本生成缓存键"""
+        return hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """批量读取缓存的向量，未命中的位置为None"""
+        keys = [self.make_key(model, text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+
+        with self._lock:
+            for key in keys:
+                vector = self.memory_cache.get(key)
+                if vector is not None:
+                    self.memory_cache.move_to_end(key)
+                    found[key] = vector
+                    self.stats["memory_hits"] += 1
+
+            missing = [key for key in dict.fromkeys(keys) if key not in found]
+            if missing:
+                try:
+                    placeholders = ",".join("?" * len(missing))
+                    rows = self._conn.execute(
+                        f"SELECT cache_key, vector FROM embeddings WHERE cache_key IN ({placeholders})",
+                        missing
+                    ).fetchall()
+                except Exception as e:
+                    logger.error(f"读取向量缓存失败: {e}")
+                    rows = []
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    found[key] = vector
+                    self._remember(key, vector)
+
+            vectors = [found.get(key) for key in keys]
+            hits = sum(1 for vector in vectors if vector is not None)
+            self.stats["hits"] += hits
+            self.stats["misses"] += len(keys) - hits
+            return vectors
+
+    def put_many(self, model: str, texts: List[str], vectors: List[np.ndarray]) -> bool:
+        """批量写入向量"""
+        now = time.time()
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = self.make_key(model, text)
+                vector = np.asarray(vector, dtype=np.float32)
+                self._remember(key, vector)
+                rows.append((key, model, vector.tobytes(), now))
+
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (cache_key, model, vector, created_at) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+                excess = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_disk_items
+                if excess > 0:
+                    self._conn.execute(
+                        "DELETE FROM embeddings WHERE cache_key IN "
+                        "(SELECT cache_key FROM embeddings ORDER BY created_at LIMIT ?)",
+                        (excess,)
+                    )
+                self._conn.commit()
+                self.stats["writes"] += len(rows)
+                return True
+            except Exception as e:
+                logger.error(f"写入向量缓存失败: {e}")
+                return False
+
+    def encode(self, model: str, texts: List[str],
+               encode_func: Callable[[List[str]], List[np.ndarray]]) -> List[np.ndarray]:
+        """
+        返回文本向量，未命中的文本（去重后）一次性交给encode_func编码并写入缓存
+
+        Args:
+            model: 嵌入模型名（不同模型的向量不能混用）
+            texts: 文本列表
+            encode_func: 批量编码函数
+        """
+        vectors = self.get_many(model, texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            encoded = [np.asarray(vector, dtype=np.float32) for vector in encode_func(missing)]
+            self.stats["encode_calls"] += 1
+            self.put_many(model, missing, encoded)
+            by_text = dict(zip(missing, encoded))
+            vectors = [by_text[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        return vectors
+
+    def _remember(self, key: str, vector: np.ndarray):
+        """写入内存LRU"""
+        self.memory_cache[key] = vector
+        self.memory_cache.move_to_end(key)
+        while len(self.memory_cache) > self.max_memory_items:
+            self.memory_cache.popitem(last=False)
+
+    def clear(self) -> int:
+        """清空缓存，返回删除的持久化条目数"""
+        with self._lock:
+            self.memory_cache.clear()
+            try:
+                cursor = self._conn.execute("DELETE FROM embeddings")
+                self._conn.commit()
+                return cursor.rowcount
+            except Exception as e:
+                logger.error(f"清空向量缓存失败: {e}")
+                return 0
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self.memory_cache.clear()
+            self._conn.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取命中统计"""
+        with self._lock:
+            try:
+                disk_items = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            except Exception:
+                disk_items = 0
+
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+                "memory_hit_rate": round(self.stats["memory_hits"] / lookups, 3) if lookups else 0.0,
+                "memory_items": len(self.memory_cache),
+                "disk_items": disk_items,
+                "db_path": str(self.db_path)
+            }
@@ -14,14 +14,19 @@ from pathlib import Path
 import aiohttp
 import openai
 
+from .http_client_pool import get_http_client_pool
+
 logger = logging.getLogger(__name__)
 
 class EnhancedLLMManager:
     """增强的LLM配置管理器"""
     
-    def __init__(self, config_dir: str = "config"):
+    def __init__(self, config_dir: str = "config", http_pool=None):
         self.config_dir = Path(config_dir)
         self.config_dir.mkdir(exist_ok=True)
+
+        # 连接测试与分析流程共享同一个HTTP连接池
+        self.http_pool = http_pool or get_http_client_pool()
         
         self.llm_config_file = self.config_dir / "llm_config.json"
         self.providers_config_file = self.config_dir / "llm_providers.json"
@@ -349,7 +354,8 @@ class EnhancedLLMManager:
         try:
             client = openai.AsyncOpenAI(
                 api_key=api_key,
-                base_url=provider_config["base_url"]
+                base_url=provider_config["base_url"],
+                http_client=self.http_pool.get_client(provider_config["base_url"])
             )
             
             # 获取第一个可用模型
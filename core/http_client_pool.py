@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP连接池 - 为所有LLM提供商调用共享长连接
+"""
+
+import asyncio
+import logging
+import threading
+import weakref
+from typing import Dict, Any, Optional
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+    httpx = None
+
+try:
+    import h2  # noqa: F401  httpx启用HTTP/2需要h2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+DEFAULT_POOL_CONFIG = {
+    "max_connections": 20,           # 每个base URL的最大连接数
+    "max_keepalive_connections": 10, # 每个base URL保持的空闲连接数
+    "keepalive_expiry": 60.0,        # 空闲连接保持时间（秒）
+    "http2": True,                   # 可用时启用HTTP/2
+    "timeout": 30.0                  # 默认请求超时（秒）
+}
+
+
+class HTTPClientPool:
+    """按base URL划分的httpx.AsyncClient连接池
+
+    httpx的连接绑定在创建它的事件循环上，而Gradio的同步回调会在不同线程中
+    新建事件循环，因此客户端按 (事件循环, base URL) 缓存，事件循环被回收后
+    对应的客户端也随之释放。
+    """
+
+    def __init__(self, config: Dict[str, Any] = None):
+        self.config = {**DEFAULT_POOL_CONFIG, **(config or {})}
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, Any]]" = \
+            weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.stats = {
+            "requests": 0,
+            "new_connections": 0,
+            "clients_created": 0
+        }
+
+    def _http2_enabled(self) -> bool:
+        return bool(self.config.get("http2")) and HTTP2_AVAILABLE
+
+    @staticmethod
+    def _base_url(url: str) -> str:
+        """提取 scheme://host[:port] 作为连接池键"""
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def _create_client(self, base_url: str):
+        limits = httpx.Limits(
+            max_connections=self.config["max_connections"],
+            max_keepalive_connections=self.config["max_keepalive_connections"],
+            keepalive_expiry=self.config["keepalive_expiry"]
+        )
+        client = httpx.AsyncClient(
+            base_url=base_url,
+            limits=limits,
+            timeout=self.config["timeout"],
+            http2=self._http2_enabled()
+        )
+        self.stats["clients_created"] += 1
+        logger.info(f"创建HTTP连接池: {base_url} (HTTP/2: {self._http2_enabled()})")
+        return client
+
+    def get_client(self, url: str):
+        """获取当前事件循环下指定URL对应的共享客户端"""
+        if not HTTPX_AVAILABLE:
+            raise ImportError("httpx未安装，请运行: pip install httpx")
+
+        loop = asyncio.get_running_loop()
+        base_url = self._base_url(url)
+
+        with self._lock:
+            loop_clients = self._clients.setdefault(loop, {})
+            client = loop_clients.get(base_url)
+            if client is None or client.is_closed:
+                client = self._create_client(base_url)
+                loop_clients[base_url] = client
+            return client
+
+    async def _trace(self, event_name: str, info: Dict[str, Any]):
+        """httpcore跟踪回调，用于统计新建连接数"""
+        if event_name == "connection.connect_tcp.started":
+            self.stats["new_connections"] += 1
+
+    async def request(self, method: str, url: str, timeout: float = None, **kwargs):
+        """通过共享连接池发送请求"""
+        client = self.get_client(url)
+        self.stats["requests"] += 1
+
+        extensions = kwargs.pop("extensions", {})
+        extensions.setdefault("trace", self._trace)
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+
+        return await client.request(method, url, extensions=extensions, **kwargs)
+
+    async def post(self, url: str, timeout: float = None, **kwargs):
+        """发送POST请求"""
+        return await self.request("POST", url, timeout=timeout, **kwargs)
+
+    def stream(self, method: str, url: str, timeout: float = None, **kwargs):
+        """
+        以流式方式发送请求
+
+        Returns:
+            异步上下文管理器，使用方式: async with pool.stream(...) as response
+        """
+        client = self.get_client(url)
+        self.stats["requests"] += 1
+
+        extensions = kwargs.pop("extensions", {})
+        extensions.setdefault("trace", self._trace)
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+
+        return client.stream(method, url, extensions=extensions, **kwargs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取连接池统计（打开/空闲连接数、复用率）"""
+        open_connections = 0
+        idle_connections = 0
+        base_urls = set()
+
+        with self._lock:
+            loop_clients = [dict(clients) for clients in self._clients.values()]
+
+        for clients in loop_clients:
+            for base_url, client in clients.items():
+                if client.is_closed:
+                    continue
+                base_urls.add(base_url)
+                # httpcore连接池未公开统计接口，这里尽量读取
+                pool = getattr(getattr(client, "_transport", None), "_pool", None)
+                for connection in getattr(pool, "connections", []):
+                    open_connections += 1
+                    try:
+                        if connection.is_idle():
+                            idle_connections += 1
+                    except Exception:
+                        pass
+
+        requests = self.stats["requests"]
+        reused = max(requests - self.stats["new_connections"], 0)
+
+        return {
+            "base_urls": sorted(base_urls),
+            "open_connections": open_connections,
+            "idle_connections": idle_connections,
+            "total_requests": requests,
+            "new_connections": self.stats["new_connections"],
+            "reuse_ratio": round(reused / requests, 3) if requests else 0.0,
+            "http2": self._http2_enabled(),
+            "max_connections": self.config["max_connections"],
+            "max_keepalive_connections": self.config["max_keepalive_connections"]
+        }
+
+    async def aclose(self):
+        """关闭当前事件循环下的所有客户端"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        with self._lock:
+            clients = self._clients.pop(loop, {})
+
+        for client in clients.values():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.debug(f"关闭HTTP客户端失败（可忽略）: {e}")
+
+
+_shared_pool: Optional[HTTPClientPool] = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_http_client_pool(config: Dict[str, Any] = None) -> HTTPClientPool:
+    """
+    获取进程级共享的HTTP连接池
+
+    Args:
+        config: 连接池配置，已创建的客户端不受后续配置影响
+
+    Returns:
+        HTTPClientPool实例
+    """
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = HTTPClientPool(config)
+        elif config:
+            _shared_pool.config.update(config)
+        return _shared_pool
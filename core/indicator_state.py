@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量技术指标 - 保存O(1)状态，每根新K线只做常数次运算
+
+与 TechnicalIndicatorEngine 的完整序列计算结果一致，状态可序列化为JSON
+持久化到数据库，下次启动直接从上次的状态继续，无需重新计算历史。
+"""
+
+import copy
+import logging
+import math
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+from .technical_indicators import DEFAULT_INDICATOR_PARAMS
+
+logger = logging.getLogger(__name__)
+
+STATE_VERSION = 1
+
+
+class RollingWindow:
+    """定长滑动窗口：维护累计和与平方和"""
+
+    def __init__(self, window: int, values: List[float] = None):
+        self.window = window
+        self.values = deque(values or [], maxlen=window)
+        self.total = math.fsum(self.values)
+        self.total_sq = math.fsum(v * v for v in self.values)
+
+    def push(self, value: float):
+        if len(self.values) == self.window:
+            old = self.values[0]
+            self.total -= old
+            self.total_sq -= old * old
+        self.values.append(value)
+        self.total += value
+        self.total_sq += value * value
+
+    def mean(self) -> Optional[float]:
+        if len(self.values) < self.window:
+            return None
+        return self.total / self.window
+
+    def std(self, ddof: int = 1) -> Optional[float]:
+        n = len(self.values)
+        if n < self.window or n <= ddof:
+            return None
+        variance = (self.total_sq - self.total * self.total / n) / (n - ddof)
+        return math.sqrt(max(variance, 0.0))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"window": self.window, "values": list(self.values)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RollingWindow":
+        # 从原始值重建累计和，避免浮点误差随持久化次数累积
+        return cls(data["window"], data["values"])
+
+
+class RollingExtreme:
+    """滑动窗口最高/最低值（单调队列，均摊O(1)）"""
+
+    def __init__(self, window: int, use_max: bool, index: int = 0, items: List[List[float]] = None):
+        self.window = window
+        self.use_max = use_max
+        self.index = index
+        self.items = deque(tuple(item) for item in (items or []))
+
+    def push(self, value: float):
+        while self.items and (self.items[-1][1] <= value if self.use_max else self.items[-1][1] >= value):
+            self.items.pop()
+        self.items.append((self.index, value))
+        if self.items[0][0] <= self.index - self.window:
+            self.items.popleft()
+        self.index += 1
+
+    def value(self) -> Optional[float]:
+        if self.index < self.window:
+            return None
+        return self.items[0][1]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"window": self.window, "use_max": self.use_max, "index": self.index,
+                "items": [list(item) for item in self.items]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RollingExtreme":
+        return cls(data["window"], data["use_max"], data["index"], data["items"])
+
+
+class SmoothingState:
+    """指数递推平滑状态（与 recursive_smooth 语义一致）"""
+
+    def __init__(self, alpha: float, warmup: int = 1, seed: Optional[float] = None,
+                 state: Optional[float] = None, count: int = 0, total: float = 0.0):
+        self.alpha = alpha
+        self.warmup = warmup
+        self.seed = seed
+        self.state = seed if state is None else state
+        self.count = count
+        self.total = total
+
+    def push(self, value: float) -> Optional[float]:
+        self.count += 1
+        if self.seed is not None:
+            self.state += self.alpha * (value - self.state)
+        elif self.count < self.warmup:
+            self.total += value
+            return None
+        elif self.count == self.warmup:
+            self.state = (self.total + value) / self.warmup
+        else:
+            self.state += self.alpha * (value - self.state)
+        return self.state
+
+    def value(self) -> Optional[float]:
+        if self.seed is None and self.count < self.warmup:
+            return None
+        return self.state
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"alpha": self.alpha, "warmup": self.warmup, "seed": self.seed,
+                "state": self.state, "count": self.count, "total": self.total}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SmoothingState":
+        return cls(**data)
+
+
+class IncrementalIndicators:
+    """增量技术指标集合
+
+    update() 提交一根已完成的K线；preview() 用尚未收盘的K线（如盘中实时价）
+    计算指标但不改变状态。
+    """
+
+    def __init__(self, params: Dict[str, Any] = None):
+        self.params = {**DEFAULT_INDICATOR_PARAMS, **(params or {})}
+        p = self.params
+
+        self.bars = 0
+        self.last_date: Optional[str] = None
+        self.prev_close: Optional[float] = None
+        self.obv = 0.0
+
+        self.ma = {w: RollingWindow(w) for w in p["ma_windows"]}
+        self.volume_ma = {w: RollingWindow(w) for w in p["volume_ma_windows"]}
+
+        boll_period = p["bollinger"][0]
+        self.boll_window = self.ma.get(boll_period) or RollingWindow(boll_period)
+
+        period = p["rsi_period"]
+        self.avg_gain = SmoothingState(1.0 / period, warmup=period)
+        self.avg_loss = SmoothingState(1.0 / period, warmup=period)
+
+        fast, slow, signal = p["macd"]
+        self.ema_fast = SmoothingState(2.0 / (fast + 1))
+        self.ema_slow = SmoothingState(2.0 / (slow + 1))
+        self.dea = SmoothingState(2.0 / (signal + 1))
+
+        rsv_period, k_smooth, d_smooth = p["kdj"]
+        self.highest = RollingExtreme(rsv_period, use_max=True)
+        self.lowest = RollingExtreme(rsv_period, use_max=False)
+        self.kdj_k = SmoothingState(1.0 / k_smooth, seed=50.0)
+        self.kdj_d = SmoothingState(1.0 / d_smooth, seed=50.0)
+
+        self.atr = SmoothingState(1.0 / p["atr_period"], warmup=p["atr_period"])
+
+    def update(self, high: float, low: float, close: float, volume: float,
+               date: str = None) -> Dict[str, Optional[float]]:
+        """提交一根已完成的K线，返回最新指标"""
+        high, low, close, volume = float(high), float(low), float(close), float(volume)
+
+        for window in self.ma.values():
+            window.push(close)
+        if self.boll_window not in self.ma.values():
+            self.boll_window.push(close)
+        for window in self.volume_ma.values():
+            window.push(volume)
+
+        # RSI
+        if self.prev_close is not None:
+            change = close - self.prev_close
+            self.avg_gain.push(max(change, 0.0))
+            self.avg_loss.push(max(-change, 0.0))
+            self.obv += volume * ((change > 0) - (change < 0))
+
+        # MACD
+        dif = self.ema_fast.push(close) - self.ema_slow.push(close)
+        self.dea.push(dif)
+
+        # KDJ
+        self.highest.push(high)
+        self.lowest.push(low)
+        highest, lowest = self.highest.value(), self.lowest.value()
+        if highest is not None:
+            spread = highest - lowest
+            rsv = (close - lowest) / spread * 100.0 if spread > 0 else 50.0
+            k = self.kdj_k.push(rsv)
+            self.kdj_d.push(k)
+
+        # ATR
+        if self.prev_close is None:
+            true_range = high - low
+        else:
+            true_range = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.atr.push(true_range)
+
+        self.prev_close = close
+        self.bars += 1
+        if date is not None:
+            self.last_date = str(date)
+
+        return self.values()
+
+    def preview(self, high: float, low: float, close: float, volume: float) -> Dict[str, Optional[float]]:
+        """用未完成的K线计算指标，不改变已提交的状态"""
+        return copy.deepcopy(self).update(high, low, close, volume)
+
+    def values(self) -> Dict[str, Optional[float]]:
+        """当前指标值（键名与 TechnicalIndicatorEngine 一致）"""
+        result: Dict[str, Optional[float]] = {}
+        for w, window in self.ma.items():
+            result[f"ma{w}"] = window.mean()
+        for w, window in self.volume_ma.items():
+            result[f"volume_ma{w}"] = window.mean()
+
+        avg_gain, avg_loss = self.avg_gain.value(), self.avg_loss.value()
+        if avg_gain is None or avg_loss is None:
+            result["rsi"] = None
+        elif avg_loss == 0:
+            result["rsi"] = 100.0
+        else:
+            result["rsi"] = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+        if self.bars:
+            dif = self.ema_fast.value() - self.ema_slow.value()
+            result["macd_dif"] = dif
+            result["macd_dea"] = self.dea.value()
+            result["macd_hist"] = 2.0 * (dif - self.dea.value())
+        else:
+            result["macd_dif"] = result["macd_dea"] = result["macd_hist"] = None
+
+        if self.highest.value() is not None:
+            k, d = self.kdj_k.value(), self.kdj_d.value()
+            result["kdj_k"], result["kdj_d"], result["kdj_j"] = k, d, 3.0 * k - 2.0 * d
+        else:
+            result["kdj_k"] = result["kdj_d"] = result["kdj_j"] = None
+
+        result["atr"] = self.atr.value()
+        result["obv"] = self.obv if self.bars else None
+
+        middle = self.boll_window.mean()
+        std = self.boll_window.std()
+        width = self.params["bollinger"][1]
+        result["bollinger_middle"] = middle
+        result["bollinger_upper"] = middle + width * std if middle is not None else None
+        result["bollinger_lower"] = middle - width * std if middle is not None else None
+
+        return {name: (round(value, 4) if value is not None else None) for name, value in result.items()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """序列化状态"""
+        boll_period = self.params["bollinger"][0]
+        return {
+            "version": STATE_VERSION,
+            "params": {k: list(v) if isinstance(v, tuple) else v for k, v in self.params.items()},
+            "bars": self.bars,
+            "last_date": self.last_date,
+            "prev_close": self.prev_close,
+            "obv": self.obv,
+            "ma": {str(w): window.to_dict() for w, window in self.ma.items()},
+            "volume_ma": {str(w): window.to_dict() for w, window in self.volume_ma.items()},
+            "boll_window": None if boll_period in self.ma else self.boll_window.to_dict(),
+            "avg_gain": self.avg_gain.to_dict(),
+            "avg_loss": self.avg_loss.to_dict(),
+            "ema_fast": self.ema_fast.to_dict(),
+            "ema_slow": self.ema_slow.to_dict(),
+            "dea": self.dea.to_dict(),
+            "highest": self.highest.to_dict(),
+            "lowest": self.lowest.to_dict(),
+            "kdj_k": self.kdj_k.to_dict(),
+            "kdj_d": self.kdj_d.to_dict(),
+            "atr": self.atr.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IncrementalIndicators":
+        """从序列化状态恢复"""
+        if data.get("version") != STATE_VERSION:
+            raise ValueError(f"不支持的指标状态版本: {data.get('version')}")
+
+        params = {k: tuple(v) if isinstance(v, list) else v for k, v in data["params"].items()}
+        indicators = cls(params)
+        indicators.bars = data["bars"]
+        indicators.last_date = data["last_date"]
+        indicators.prev_close = data["prev_close"]
+        indicators.obv = data["obv"]
+        indicators.ma = {int(w): RollingWindow.from_dict(v) for w, v in data["ma"].items()}
+        indicators.volume_ma = {int(w): RollingWindow.from_dict(v) for w, v in data["volume_ma"].items()}
+
+        boll_period = params["bollinger"][0]
+        indicators.boll_window = indicators.ma[boll_period] if data["boll_window"] is None \
+            else RollingWindow.from_dict(data["boll_window"])
+
+        for name in ("avg_gain", "avg_loss", "ema_fast", "ema_slow", "dea", "kdj_k", "kdj_d", "atr"):
+            setattr(indicators, name, SmoothingState.from_dict(data[name]))
+        indicators.highest = RollingExtreme.from_dict(data["highest"])
+        indicators.lowest = RollingExtreme.from_dict(data["lowest"])
+        return indicators
+
+    @classmethod
+    def from_history(cls, high, low, close, volume, dates=None,
+                     params: Dict[str, Any] = None) -> "IncrementalIndicators":
+        """用历史K线建立初始状态"""
+        indicators = cls(params)
+        dates = list(dates) if dates is not None else [None] * len(close)
+        for h, l, c, v, d in zip(high, low, close, volume, dates):
+            indicators.update(h, l, c, v, date=d)
+        return indicators
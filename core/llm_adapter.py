@@ -9,8 +9,14 @@ import logging
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 
+from .http_client_pool import get_http_client_pool
+from .rate_limiter import estimate_tokens
+
 logger = logging.getLogger(__name__)
 
+# 主模型预计排队超过该秒数且备用模型有空闲额度时，直接改用备用模型
+FALLBACK_QUEUE_SECONDS = 30.0
+
 class LLMAdapter:
     """LLM适配器 - 桥接现有LLM调用和tradingagents架构"""
     
@@ -25,6 +31,8 @@ class LLMAdapter:
         self.llm_config = enhanced_app.llm_config
         self.agent_model_config = enhanced_app.agent_model_config
         self.custom_llm_providers = enhanced_app.custom_llm_providers
+        # 与应用共享HTTP连接池，_call_llm发出的请求都会复用其中的长连接
+        self.http_pool = getattr(enhanced_app, "http_pool", None) or get_http_client_pool()
         
     async def invoke(self, messages: List[Dict[str, str]], agent_id: str = "default") -> str:
         """
@@ -47,15 +55,10 @@ class LLMAdapter:
                 provider, model = model_config.split(":", 1)
 
                 # 提取用户消息内容
-                prompt = ""
-                for message in messages:
-                    if message.get("role") == "user":
-                        prompt = message.get("content", "")
-                        break
+                prompt = self._extract_prompt(messages)
 
-                if not prompt:
-                    # 如果没有用户消息，合并所有消息
-                    prompt = "\n".join([msg.get("content", "") for msg in messages])
+                # 主模型限流排队过久时改用备用模型（_call_llm内部仍会按额度排队）
+                provider, model = self._route_by_rate_limit(provider, model, model_config, prompt)
 
                 # 调用现有的LLM方法
                 response = await self.enhanced_app._call_llm(provider, model, prompt, agent_id)
@@ -70,10 +73,7 @@ class LLMAdapter:
 
                 if attempt < max_retries - 1:
                     # 尝试使用备用提供商
-                    if "deepseek" in model_config:
-                        backup_config = "阿里百炼:qwen-turbo"
-                    else:
-                        backup_config = "deepseek:deepseek-chat"
+                    backup_config = self._get_backup_config(model_config)
 
                     try:
                         backup_provider, backup_model = backup_config.split(":", 1)
@@ -92,6 +92,56 @@ class LLMAdapter:
                     logger.error(f"所有LLM调用尝试失败: {e}")
                     return self._get_fallback_response(agent_id, prompt)
 
+    @staticmethod
+    def _get_backup_config(model_config: str) -> str:
+        """主模型对应的备用模型"""
+        return "阿里百炼:qwen-turbo" if "deepseek" in model_config else "deepseek:deepseek-chat"
+
+    def _route_by_rate_limit(self, provider: str, model: str, model_config: str, prompt: str) -> tuple:
+        """主模型预计排队过久、备用模型已配置且排队更短时，返回备用模型"""
+        rate_limiter = getattr(self.enhanced_app, "rate_limiter", None)
+        if rate_limiter is None:
+            return provider, model
+
+        tokens = estimate_tokens(prompt)
+        primary_wait = rate_limiter.estimate_wait(provider, model, tokens)
+        if primary_wait <= FALLBACK_QUEUE_SECONDS:
+            return provider, model
+
+        backup_provider, backup_model = self._get_backup_config(model_config).split(":", 1)
+        if backup_provider in self.llm_config and \
+                rate_limiter.estimate_wait(backup_provider, backup_model, tokens) < primary_wait:
+            logger.info(f"{provider}:{model} 预计排队 {primary_wait:.0f}s，改用 {backup_provider}:{backup_model}")
+            return backup_provider, backup_model
+        return provider, model
+
+    async def stream(self, messages: List[Dict[str, str]], agent_id: str = "default"):
+        """
+        流式LLM调用接口，逐段产出响应文本
+
+        Args:
+            messages: 消息列表，格式为[{"role": "user", "content": "..."}]
+            agent_id: 智能体ID，用于获取对应的模型配置
+        """
+        model_config = self.agent_model_config.get(agent_id, "deepseek:deepseek-chat")
+        provider, model = model_config.split(":", 1)
+        prompt = self._extract_prompt(messages)
+
+        async for delta in self.enhanced_app.stream_llm(provider, model, prompt, agent_id):
+            yield delta
+
+    @staticmethod
+    def _extract_prompt(messages: List[Dict[str, str]]) -> str:
+        """提取用户消息内容，没有用户消息时合并所有消息"""
+        for message in messages:
+            if message.get("role") == "user":
+                prompt = message.get("content", "")
+                if prompt:
+                    return prompt
+                break
+
+        return "\n".join([msg.get("content", "") for msg in messages])
+
     def _get_fallback_response(self, agent_id: str, prompt: str) -> str:
         """获取智能体的备用响应"""
         # 根据智能体类型和提示内容生成更有意义的备用响应
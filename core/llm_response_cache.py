@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLM响应缓存 - 按提供商、模型、生成参数和提示内容寻址的响应缓存
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# A股交易时段边界（开盘、午间休市、午后开盘、收盘）
+MARKET_SESSION_BOUNDARIES = [(9, 30), (11, 30), (13, 0), (15, 0)]
+
+
+def next_market_session_boundary(now: datetime = None) -> datetime:
+    """
+    获取下一个交易时段边界
+
+    同一时段内行情输入不变，缓存的响应在进入下一时段前一直有效；
+    周末顺延到下一个交易日开盘（节假日不做特殊处理）。
+    """
+    now = now or datetime.now()
+    day = now.replace(second=0, microsecond=0)
+
+    for _ in range(8):
+        if day.weekday() < 5:
+            for hour, minute in MARKET_SESSION_BOUNDARIES:
+                boundary = day.replace(hour=hour, minute=minute)
+                if boundary > now:
+                    return boundary
+        day = (day + timedelta(days=1)).replace(hour=0, minute=0)
+
+    return now + timedelta(days=1)
+
+
+class LLMResponseCache:
+    """两级LLM响应缓存：内存LRU + SQLite持久化"""
+
+    def __init__(self, db_path: str = "data/cache/llm_responses.db", max_memory_items: int = 256):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_memory_items = max_memory_items
+
+        self.memory_cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.stats = {"hits": 0, "memory_hits": 0, "misses": 0, "writes": 0}
+
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._init_database()
+
+    def _init_database(self):
+        """初始化缓存表"""
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS llm_responses (
+                    cache_key TEXT PRIMARY KEY,
+                    provider TEXT,
+                    model TEXT,
+                    response TEXT NOT NULL,
+                    expire_at REAL NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_llm_responses_expire ON llm_responses(expire_at)"
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(provider: str, model: str, temperature: float, max_tokens: int, prompt: str) -> str:
+        """根据请求内容生成缓存键"""
+        payload = json.dumps([provider, model, temperature, max_tokens, prompt], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """获取缓存的响应，不存在或已过期返回None"""
+        now = time.time()
+
+        with self._lock:
+            item = self.memory_cache.get(key)
+            if item is not None:
+                response, expire_at = item
+                if expire_at > now:
+                    self.memory_cache.move_to_end(key)
+                    self.stats["hits"] += 1
+                    self.stats["memory_hits"] += 1
+                    return response
+                del self.memory_cache[key]
+
+            try:
+                row = self._conn.execute(
+                    "SELECT response, expire_at FROM llm_responses WHERE cache_key = ? AND expire_at > ?",
+                    (key, now)
+                ).fetchone()
+            except Exception as e:
+                logger.error(f"读取LLM响应缓存失败: {e}")
+                row = None
+
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+
+            self._remember(key, row[0], row[1])
+            self.stats["hits"] += 1
+            return row[0]
+
+    def set(self, key: str, response: str, expire_at: datetime = None,
+            provider: str = "", model: str = "") -> bool:
+        """写入缓存，默认在下一个交易时段边界过期"""
+        expire_ts = (expire_at or next_market_session_boundary()).timestamp()
+        now = time.time()
+
+        with self._lock:
+            self._remember(key, response, expire_ts)
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_responses "
+                    "(cache_key, provider, model, response, expire_at, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, provider, model, response, expire_ts, now)
+                )
+                # 借助过期索引顺带清理已失效的条目
+                self._conn.execute("DELETE FROM llm_responses WHERE expire_at <= ?", (now,))
+                self._conn.commit()
+                self.stats["writes"] += 1
+                return True
+            except Exception as e:
+                logger.error(f"写入LLM响应缓存失败: {e}")
+                return False
+
+    def _remember(self, key: str, response: str, expire_at: float):
+        """写入内存LRU"""
+        self.memory_cache[key] = (response, expire_at)
+        self.memory_cache.move_to_end(key)
+        while len(self.memory_cache) > self.max_memory_items:
+            self.memory_cache.popitem(last=False)
+
+    def clear(self) -> int:
+        """清空缓存，返回删除的持久化条目数"""
+        with self._lock:
+            self.memory_cache.clear()
+            try:
+                cursor = self._conn.execute("DELETE FROM llm_responses")
+                self._conn.commit()
+                return cursor.rowcount
+            except Exception as e:
+                logger.error(f"清空LLM响应缓存失败: {e}")
+                return 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取命中统计"""
+        with self._lock:
+            try:
+                disk_items = self._conn.execute(
+                    "SELECT COUNT(*) FROM llm_responses WHERE expire_at > ?", (time.time(),)
+                ).fetchone()[0]
+            except Exception:
+                disk_items = 0
+
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+                "memory_items": len(self.memory_cache),
+                "disk_items": disk_items,
+                "db_path": str(self.db_path)
+            }
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+列式行情存储 - 每只股票每个字段一个定长二进制文件，通过np.memmap零拷贝读取
+"""
+
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 字段 -> 存储类型；日期以 datetime64[D] 的int64天数保存
+OHLCV_COLUMNS = {
+    "date": np.dtype("datetime64[D]"),
+    "open": np.dtype(np.float64),
+    "high": np.dtype(np.float64),
+    "low": np.dtype(np.float64),
+    "close": np.dtype(np.float64),
+    "volume": np.dtype(np.float64)
+}
+
+
+class OHLCVColumnStore:
+    """按股票分目录的列式OHLCV存储
+
+    data/ohlcv/<symbol>/<field>.bin 为无文件头的定长数组，追加新交易日只需
+    在文件末尾写入字节；读取时用 np.memmap 映射，计算指标不需要逐行构造Python对象。
+    日期列最后写入，行数取各列长度的最小值，写入中断也不会读到半行。
+    """
+
+    def __init__(self, root: str = "data/ohlcv"):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _symbol_dir(self, symbol: str) -> Path:
+        return self.root / symbol
+
+    def _column_path(self, symbol: str, field: str) -> Path:
+        return self._symbol_dir(symbol) / f"{field}.bin"
+
+    def row_count(self, symbol: str) -> int:
+        """已存储的交易日数量"""
+        counts = []
+        for field, dtype in OHLCV_COLUMNS.items():
+            path = self._column_path(symbol, field)
+            if not path.exists():
+                return 0
+            counts.append(path.stat().st_size // dtype.itemsize)
+        return min(counts)
+
+    def read(self, symbol: str, last_n: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        读取行情列（只读内存映射，不复制数据）
+
+        Args:
+            symbol: 股票代码
+            last_n: 只取最近N个交易日
+
+        Returns:
+            {"date": datetime64[D]数组, "open": ..., "high": ..., "low": ..., "close": ..., "volume": ...}
+        """
+        rows = self.row_count(symbol)
+        if rows == 0:
+            return {field: np.empty(0, dtype=dtype) for field, dtype in OHLCV_COLUMNS.items()}
+
+        start = max(rows - last_n, 0) if last_n else 0
+        columns = {}
+        for field, dtype in OHLCV_COLUMNS.items():
+            mapped = np.memmap(self._column_path(symbol, field), dtype=dtype, mode="r", shape=(rows,))
+            columns[field] = mapped[start:rows]
+        return columns
+
+    def last_date(self, symbol: str) -> Optional[np.datetime64]:
+        """最新交易日"""
+        rows = self.row_count(symbol)
+        if rows == 0:
+            return None
+        mapped = np.memmap(self._column_path(symbol, "date"), dtype=OHLCV_COLUMNS["date"],
+                           mode="r", shape=(rows,))
+        return mapped[-1]
+
+    def append(self, symbol: str, dates, open_prices, high_prices, low_prices,
+               close_prices, volumes) -> int:
+        """
+        追加交易日数据，只写入晚于已有最新交易日的部分
+
+        数据早于已有记录（补历史）时整体合并重写。
+
+        Returns:
+            新增行数
+        """
+        incoming = {
+            "date": np.asarray(dates, dtype="datetime64[D]"),
+            "open": np.asarray(open_prices, dtype=np.float64),
+            "high": np.asarray(high_prices, dtype=np.float64),
+            "low": np.asarray(low_prices, dtype=np.float64),
+            "close": np.asarray(close_prices, dtype=np.float64),
+            "volume": np.asarray(volumes, dtype=np.float64)
+        }
+        if incoming["date"].size == 0:
+            return 0
+
+        order = np.argsort(incoming["date"], kind="stable")
+        incoming = {field: values[order] for field, values in incoming.items()}
+
+        with self._lock:
+            last = self.last_date(symbol)
+            if last is not None and incoming["date"][0] <= last:
+                existing = self.read(symbol)
+                if incoming["date"][0] < existing["date"][0] or \
+                        not np.isin(incoming["date"][incoming["date"] <= last], existing["date"]).all():
+                    return self._rewrite(symbol, existing, incoming)
+
+                # 已存在的交易日跳过，只追加新交易日
+                mask = incoming["date"] > last
+                incoming = {field: values[mask] for field, values in incoming.items()}
+                if incoming["date"].size == 0:
+                    return 0
+
+            self._symbol_dir(symbol).mkdir(parents=True, exist_ok=True)
+            # 日期列最后写入，保证行数以完整写入的行为准
+            for field in [f for f in OHLCV_COLUMNS if f != "date"] + ["date"]:
+                self._truncate_to_rows(symbol, field)
+                with open(self._column_path(symbol, field), "ab") as f:
+                    f.write(incoming[field].tobytes())
+
+            return int(incoming["date"].size)
+
+    def _truncate_to_rows(self, symbol: str, field: str):
+        """去掉上次中断写入留下的多余尾部"""
+        path = self._column_path(symbol, field)
+        if not path.exists():
+            return
+        expected = self.row_count(symbol) * OHLCV_COLUMNS[field].itemsize
+        if path.stat().st_size > expected:
+            with open(path, "r+b") as f:
+                f.truncate(expected)
+
+    def _rewrite(self, symbol: str, existing: Dict[str, np.ndarray], incoming: Dict[str, np.ndarray]) -> int:
+        """合并新旧数据后重写（新数据覆盖同日旧数据）"""
+        merged_dates = np.concatenate([incoming["date"], existing["date"]])
+        _, first_index = np.unique(merged_dates, return_index=True)
+
+        merged = {}
+        for field in OHLCV_COLUMNS:
+            merged[field] = np.concatenate([incoming[field], np.asarray(existing[field])])[first_index]
+        added = merged["date"].size - existing["date"].size
+
+        for field in OHLCV_COLUMNS:
+            path = self._column_path(symbol, field)
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(merged[field].tobytes())
+            os.replace(tmp_path, path)
+
+        logger.info(f"重写列式行情 {symbol}: {merged['date'].size} 个交易日")
+        return int(added)
+
+    def append_frame(self, symbol: str, hist_data) -> int:
+        """追加akshare stock_zh_a_hist 返回的DataFrame"""
+        if hist_data is None or hist_data.empty:
+            return 0
+
+        import pandas as pd
+        return self.append(
+            symbol,
+            pd.to_datetime(hist_data['日期']).to_numpy().astype("datetime64[D]"),
+            hist_data['开盘'].to_numpy(), hist_data['最高'].to_numpy(),
+            hist_data['最低'].to_numpy(), hist_data['收盘'].to_numpy(),
+            hist_data['成交量'].to_numpy()
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取存储统计"""
+        symbols = [p.name for p in self.root.iterdir() if p.is_dir()]
+        total_bytes = sum(f.stat().st_size for s in symbols for f in (self.root / s).glob("*.bin"))
+        return {
+            "root": str(self.root),
+            "symbols": len(symbols),
+            "size_mb": round(total_bytes / (1024 * 1024), 2)
+        }
+
+
+if __name__ == "__main__":
+    import sqlite3
+    import tempfile
+
+    # 基准：读取多年历史用于指标计算（SQLite逐行 vs memmap列）
+    days = 2500
+    rng = np.random.default_rng(0)
+    dates = np.datetime64("2015-01-01") + np.arange(days)
+    close = 50 + np.cumsum(rng.normal(0, 0.5, days))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = OHLCVColumnStore(tmp_dir)
+        store.append("000001", dates, close, close + 1, close - 1, close, rng.integers(1, 10 ** 7, days))
+
+        conn = sqlite3.connect(os.path.join(tmp_dir, "bench.db"))
+        conn.execute("CREATE TABLE stock_data (symbol TEXT, date TEXT, open_price REAL, high_price REAL, "
+                     "low_price REAL, close_price REAL, volume INTEGER, UNIQUE(symbol, date))")
+        conn.executemany("INSERT INTO stock_data VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         [("000001", str(d), c, c + 1, c - 1, c, 1000) for d, c in zip(dates, close.tolist())])
+        conn.commit()
+
+        rounds = 50
+        start = time.perf_counter()
+        for _ in range(rounds):
+            rows = conn.execute("SELECT date, open_price, high_price, low_price, close_price, volume "
+                                "FROM stock_data WHERE symbol = ? ORDER BY date", ("000001",)).fetchall()
+            records = [{"日期": r[0], "开盘": r[1], "最高": r[2], "最低": r[3], "收盘": r[4], "成交量": r[5]}
+                       for r in rows]
+            np.array([r["收盘"] for r in records])
+        sqlite_ms = (time.perf_counter() - start) / rounds * 1000
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            np.asarray(store.read("000001")["close"]).sum()
+        memmap_ms = (time.perf_counter() - start) / rounds * 1000
+        conn.close()
+
+    print(f"{days}个交易日: SQLite逐行 {sqlite_ms:.2f}ms, memmap列 {memmap_ms:.3f}ms")
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+提示词token预算 - 按提供商的分词方式计算token数，超出预算时用
+IntelligentSummarizer 压缩较旧、权重较低的内容，保证提示词不超过配置的预算
+"""
+
+import logging
+import threading
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+from .intelligent_summarizer import IntelligentSummarizer
+from .rate_limiter import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+    tiktoken = None
+
+# 提示词token预算，查找顺序："提供商:模型" -> "提供商" -> "default"
+DEFAULT_PROMPT_BUDGETS = {
+    "default": 2500
+}
+
+# 使用tiktoken分词的提供商（其余提供商的分词器不公开，使用估算）
+TIKTOKEN_PROVIDERS = ("openai",)
+
+SUMMARY_MARKER = "\n\n💡 *内容已智能精简"
+MIN_SECTION_TOKENS = 20         # 分到的额度低于该值的片段直接省略
+STRUCTURE_MIN_CHARS = 300       # 低于该长度时按句子而不是按段落精简
+
+# 每次分析的压缩统计（分析开始时设置，同一分析内的并发任务共享同一个字典）
+_analysis_usage: ContextVar[Optional[Dict[str, int]]] = ContextVar("prompt_budget_usage", default=None)
+
+# 提示词片段：(名称, 原文, 权重)，超出预算时按权重分配token，权重低的先被压缩
+Section = Tuple[str, str, float]
+
+
+def start_usage_tracking() -> Dict[str, int]:
+    """开始统计当前分析的提示词压缩情况，返回统计字典（分析过程中持续累加）"""
+    usage = {"prompts": 0, "compacted_prompts": 0, "compacted_sections": 0,
+             "original_tokens": 0, "final_tokens": 0, "saved_tokens": 0}
+    _analysis_usage.set(usage)
+    return usage
+
+
+class PromptBudgetManager:
+    """提示词token预算管理"""
+
+    def __init__(self, budgets: Dict[str, int] = None):
+        """
+        Args:
+            budgets: 提示词token预算，键为"提供商"或"提供商:模型"，"default"为默认预算
+        """
+        self.budgets = {**DEFAULT_PROMPT_BUDGETS, **(budgets or {})}
+        self._encodings: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.stats = {"prompts": 0, "compacted_prompts": 0, "compacted_sections": 0,
+                      "original_tokens": 0, "final_tokens": 0, "saved_tokens": 0}
+
+    def get_budget(self, provider: str, model: str) -> int:
+        return int(self.budgets.get(f"{provider}:{model}") or self.budgets.get(provider)
+                   or self.budgets["default"])
+
+    def _get_encoding(self, model: str):
+        encoding = self._encodings.get(model)
+        if encoding is None:
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                encoding = tiktoken.get_encoding("cl100k_base")
+            self._encodings[model] = encoding
+        return encoding
+
+    def count_tokens(self, text: str, provider: str = "", model: str = "") -> int:
+        """按提供商的分词方式计算token数（无可用分词器时估算）"""
+        if not text:
+            return 0
+        if TIKTOKEN_AVAILABLE and provider in TIKTOKEN_PROVIDERS:
+            try:
+                return len(self._get_encoding(model).encode(text))
+            except Exception as e:
+                logger.debug(f"tiktoken分词失败，改用估算: {e}")
+        return estimate_tokens(text)
+
+    def compact(self, text: str, max_tokens: int, provider: str = "", model: str = "",
+                context: str = "") -> str:
+        """
+        把文本压缩到max_tokens以内
+
+        先用 IntelligentSummarizer 按关键词和句子重要性精简，仍然超出时逐步收紧，
+        最后按字符截断兜底。
+        """
+        tokens = self.count_tokens(text, provider, model)
+        if tokens <= max_tokens:
+            return text
+        if max_tokens < MIN_SECTION_TOKENS:
+            return ""
+
+        max_chars = int(len(text) * max_tokens / tokens)
+        for _ in range(4):
+            if max_chars < 20:
+                break
+            # 额度较小时按段落精简可能一段都放不下，改为按句子精简
+            summary = IntelligentSummarizer(max_chars).summarize_content(
+                text, context, preserve_structure=max_chars >= STRUCTURE_MIN_CHARS)
+            summary = summary.split(SUMMARY_MARKER)[0].strip()
+            if not summary:
+                break
+            summary_tokens = self.count_tokens(summary, provider, model)
+            if summary_tokens <= max_tokens:
+                return summary
+            max_chars = int(max_chars * max_tokens / summary_tokens * 0.9)
+
+        # 兜底：按字符截断
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.count_tokens(text[:middle] + "...", provider, model) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return text[:low] + "..." if low else ""
+
+    def allocate(self, sections: List[Section], available: int,
+                 provider: str = "", model: str = "") -> Dict[str, int]:
+        """
+        按权重把可用token分配给各片段（注水法）
+
+        需求小于份额的片段按原长度保留，剩余额度再按权重分给其余片段。
+        """
+        needs = {name: self.count_tokens(text, provider, model) for name, text, _ in sections}
+        weights = {name: max(weight, 1e-6) for name, _, weight in sections}
+        allocation: Dict[str, int] = {}
+        pending = sorted(needs, key=lambda name: needs[name] / weights[name])
+        remaining = max(available, 0)
+
+        while pending:
+            total_weight = sum(weights[name] for name in pending)
+            name = pending[0]
+            share = remaining * weights[name] / total_weight
+            if needs[name] <= share:
+                allocation[name] = needs[name]
+                remaining -= needs[name]
+                pending.pop(0)
+            else:
+                # 剩余片段都超出份额，按权重切分
+                for name in pending:
+                    allocation[name] = int(remaining * weights[name] / total_weight)
+                break
+        return allocation
+
+    def fit_prompt(self, render: Callable[[Dict[str, str]], str], sections: List[Section],
+                   provider: str = "", model: str = "", budget: int = None, context: str = "") -> str:
+        """
+        生成不超过预算的提示词
+
+        Args:
+            render: 由 {片段名: 片段文本} 生成完整提示词的函数
+            sections: (片段名, 原文, 权重) 列表，较旧的辩论轮次应给较低权重
+            budget: token预算，默认按提供商/模型配置
+            context: 压缩时用于判断句子相关性的上下文
+
+        Returns:
+            提示词
+        """
+        budget = budget or self.get_budget(provider, model)
+        original = {name: text or "" for name, text, _ in sections}
+        prompt = render(original)
+        original_tokens = self.count_tokens(prompt, provider, model)
+        compacted_sections = 0
+
+        if original_tokens > budget:
+            skeleton_tokens = self.count_tokens(render({name: "" for name in original}), provider, model)
+            available = budget - skeleton_tokens
+            fitted = dict(original)
+
+            # 分配后片段之间的换行等会带来少量误差，不满足时收紧预算重试
+            for _ in range(3):
+                allocation = self.allocate(sections, available, provider, model)
+                for name, text in original.items():
+                    fitted[name] = self.compact(text, allocation.get(name, 0), provider, model, context)
+                prompt = render(fitted)
+                if self.count_tokens(prompt, provider, model) <= budget:
+                    break
+                available -= max(self.count_tokens(prompt, provider, model) - budget, MIN_SECTION_TOKENS)
+
+            compacted_sections = sum(1 for name in original if fitted[name] != original[name])
+
+        final_tokens = self.count_tokens(prompt, provider, model)
+        if final_tokens > budget:
+            logger.warning(f"提示词固定部分已超出预算: {final_tokens} > {budget} tokens")
+        self._record(original_tokens, final_tokens, compacted_sections)
+        return prompt
+
+    def _record(self, original_tokens: int, final_tokens: int, compacted_sections: int):
+        """累加全局和当前分析的统计"""
+        saved = max(original_tokens - final_tokens, 0)
+        with self._lock:
+            for usage in (self.stats, _analysis_usage.get()):
+                if usage is None:
+                    continue
+                usage["prompts"] += 1
+                usage["original_tokens"] += original_tokens
+                usage["final_tokens"] += final_tokens
+                usage["saved_tokens"] += saved
+                if compacted_sections:
+                    usage["compacted_prompts"] += 1
+                    usage["compacted_sections"] += compacted_sections
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取预算和压缩统计"""
+        return {**self.stats, "budgets": dict(self.budgets),
+                "tokenizer": "tiktoken" if TIKTOKEN_AVAILABLE else "estimate"}
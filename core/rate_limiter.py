@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLM速率限制 - 按提供商和模型的令牌桶（每分钟请求数、每分钟token数），
+超出额度时排队等待而不是失败，并遵守429响应的Retry-After
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# 额度查找顺序："提供商:模型" -> "提供商" -> "default"
+DEFAULT_RATE_LIMITS = {
+    "default": {"rpm": 60, "tpm": 100000},
+    "deepseek": {"rpm": 120, "tpm": 300000},
+    "阿里百炼": {"rpm": 120, "tpm": 300000},
+    "dashscope": {"rpm": 120, "tpm": 300000}
+}
+
+DEFAULT_RETRY_AFTER = 5.0       # 429响应未给出Retry-After时的等待秒数
+DEFAULT_MAX_WAIT = 120.0        # 排队超过该时间则放弃
+
+
+class RateLimitTimeout(Exception):
+    """排队等待超过上限"""
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数：中日韩字符约1个token，其余字符约4个字符1个token"""
+    if not text:
+        return 0
+    cjk = sum(1 for ch in text if "一" <= ch <= "鿿" or "　" <= ch <= "ヿ")
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析Retry-After头（秒数或HTTP日期）"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """令牌桶（按分钟额度匀速补充，容量为一分钟的额度）
+
+    reserve() 允许余额为负：调用方先占位再按欠额等待，先到先得，
+    同一时刻排队的请求按预约顺序依次放行。
+    """
+
+    def __init__(self, per_minute: float, capacity: float = None):
+        self.per_minute = float(per_minute)
+        self.rate = self.per_minute / 60.0
+        self.capacity = float(capacity or per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float = None) -> float:
+        """预约amount个令牌，返回需要等待的秒数"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def try_take(self, amount: float = 1, now: float = None) -> bool:
+        """令牌足够时取走并返回True，否则不改变余额"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return True
+        return False
+
+    def refund(self, amount: float, now: float = None):
+        """归还未使用的令牌"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def charge(self, amount: float, now: float = None):
+        """追加扣除（实际用量超过预约时）"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        self.tokens -= amount
+
+    def wait_time(self, amount: float, now: float = None) -> float:
+        """不预约，估算现在取amount个令牌需要等待的秒数"""
+        now = time.monotonic() if now is None else now
+        tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        deficit = min(amount, self.capacity) - tokens
+        return max(0.0, deficit / self.rate)
+
+
+class Reservation:
+    """一次LLM请求占用的额度，请求完成后按实际token数结算"""
+
+    def __init__(self, limiter: "LLMRateLimiter", key: tuple, tokens: int):
+        self.limiter = limiter
+        self.key = key
+        self.tokens = tokens
+        self.wait_seconds = 0.0
+        self.settled = False
+
+    def settle(self, actual_tokens: int):
+        """按实际token数多退少补"""
+        if self.settled:
+            return
+        self.settled = True
+        self.limiter._adjust_tokens(self.key, actual_tokens - self.tokens)
+
+
+class LLMRateLimiter:
+    """按(提供商, 模型)限制LLM请求速率
+
+    每个键两个令牌桶：请求数/分钟、token数/分钟。桶的运算在线程锁内完成，
+    等待用 asyncio.sleep，因此不同事件循环（界面每次分析可能新建循环）共享同一份额度。
+    """
+
+    def __init__(self, limits: Dict[str, Dict[str, float]] = None, max_wait: float = DEFAULT_MAX_WAIT):
+        self.limits = {**DEFAULT_RATE_LIMITS, **(limits or {})}
+        self.max_wait = max_wait
+
+        self._lock = threading.Lock()
+        self._buckets: Dict[tuple, Dict[str, TokenBucket]] = {}
+        self._blocked_until: Dict[tuple, float] = {}
+        self.stats: Dict[tuple, Dict[str, float]] = {}
+
+    def get_limits(self, provider: str, model: str) -> Dict[str, float]:
+        return (self.limits.get(f"{provider}:{model}") or self.limits.get(provider)
+                or self.limits["default"])
+
+    def set_limits(self, key: str, rpm: float = None, tpm: float = None):
+        """设置额度（key为"提供商"或"提供商:模型"），已有的令牌桶重新创建"""
+        current = dict(self.limits.get(key) or self.limits["default"])
+        if rpm:
+            current["rpm"] = rpm
+        if tpm:
+            current["tpm"] = tpm
+        with self._lock:
+            self.limits[key] = current
+            self._buckets.clear()
+
+    def _get_buckets(self, key: tuple) -> Dict[str, TokenBucket]:
+        buckets = self._buckets.get(key)
+        if buckets is None:
+            limits = self.get_limits(*key)
+            buckets = {"requests": TokenBucket(limits["rpm"]), "tokens": TokenBucket(limits["tpm"])}
+            self._buckets[key] = buckets
+        return buckets
+
+    def _get_stats(self, key: tuple) -> Dict[str, float]:
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = {"requests": 0, "queued": 0, "max_queue_depth": 0, "waited": 0,
+                     "total_wait_seconds": 0.0, "max_wait_seconds": 0.0,
+                     "rate_limited": 0, "timeouts": 0, "tokens_reserved": 0, "tokens_used": 0}
+            self.stats[key] = stats
+        return stats
+
+    def _reserve(self, key: tuple, tokens: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            buckets = self._get_buckets(key)
+            delay = max(buckets["requests"].reserve(1, now), buckets["tokens"].reserve(tokens, now))
+            blocked_until = self._blocked_until.get(key, 0.0)
+            return max(delay, blocked_until - now)
+
+    def _release(self, key: tuple, tokens: int):
+        """取消预约时归还额度"""
+        with self._lock:
+            buckets = self._get_buckets(key)
+            buckets["requests"].refund(1)
+            buckets["tokens"].refund(tokens)
+
+    def _adjust_tokens(self, key: tuple, difference: int):
+        with self._lock:
+            bucket = self._get_buckets(key)["tokens"]
+            if difference > 0:
+                bucket.charge(difference)
+            elif difference < 0:
+                bucket.refund(-difference)
+            self._get_stats(key)["tokens_used"] += difference
+
+    def estimate_wait(self, provider: str, model: str, tokens: int = 0) -> float:
+        """估算现在发出请求需要排队的秒数（不占用额度）"""
+        key = (provider, model)
+        with self._lock:
+            now = time.monotonic()
+            buckets = self._get_buckets(key)
+            delay = max(buckets["requests"].wait_time(1, now), buckets["tokens"].wait_time(tokens, now))
+            return max(delay, self._blocked_until.get(key, 0.0) - now)
+
+    def penalize(self, provider: str, model: str, retry_after: float = None):
+        """收到429后，在Retry-After之前暂停该模型的所有请求"""
+        key = (provider, model)
+        retry_after = DEFAULT_RETRY_AFTER if retry_after is None else retry_after
+        with self._lock:
+            self._blocked_until[key] = max(self._blocked_until.get(key, 0.0), time.monotonic() + retry_after)
+            self._get_stats(key)["rate_limited"] += 1
+        logger.warning(f"{provider}:{model} 触发限流，{retry_after:.1f}s 后继续")
+
+    async def acquire(self, provider: str, model: str, tokens: int = 0) -> Reservation:
+        """
+        获取一次请求的额度，超出时排队等待
+
+        Args:
+            provider: 提供商
+            model: 模型
+            tokens: 预计token数（提示 + 最大输出）
+
+        Raises:
+            RateLimitTimeout: 预计等待超过max_wait
+        """
+        key = (provider, model)
+        reservation = Reservation(self, key, tokens)
+        stats = self._get_stats(key)
+        stats["requests"] += 1
+        stats["tokens_reserved"] += tokens
+        stats["tokens_used"] += tokens
+
+        start_time = time.monotonic()
+        delay = self._reserve(key, tokens)
+        if delay <= 0:
+            return reservation
+
+        stats["waited"] += 1
+        stats["queued"] += 1
+        stats["max_queue_depth"] = max(stats["max_queue_depth"], stats["queued"])
+        try:
+            while delay > 0:
+                if time.monotonic() - start_time + delay > self.max_wait:
+                    stats["timeouts"] += 1
+                    raise RateLimitTimeout(f"{provider}:{model} 排队等待超过 {self.max_wait:.0f}s")
+                await asyncio.sleep(delay)
+                # 等待期间可能又收到429，继续等到解除
+                with self._lock:
+                    delay = self._blocked_until.get(key, 0.0) - time.monotonic()
+        except BaseException:
+            self._release(key, tokens)
+            stats["tokens_used"] -= tokens
+            raise
+        finally:
+            stats["queued"] -= 1
+
+        reservation.wait_seconds = time.monotonic() - start_time
+        stats["total_wait_seconds"] += reservation.wait_seconds
+        stats["max_wait_seconds"] = max(stats["max_wait_seconds"], reservation.wait_seconds)
+        if reservation.wait_seconds > 1:
+            logger.info(f"{provider}:{model} 限流排队 {reservation.wait_seconds:.1f}s")
+        return reservation
+
+    @asynccontextmanager
+    async def limit(self, provider: str, model: str, tokens: int = 0):
+        """在额度内执行一次请求，返回可结算的预约"""
+        reservation = await self.acquire(provider, model, tokens)
+        yield reservation
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取各模型的排队和限流统计"""
+        now = time.monotonic()
+        result = {}
+        for key, stats in self.stats.items():
+            limits = self.get_limits(*key)
+            result[f"{key[0]}:{key[1]}"] = {
+                **{k: (round(v, 3) if isinstance(v, float) else v) for k, v in stats.items()},
+                "avg_wait_seconds": round(stats["total_wait_seconds"] / stats["waited"], 3) if stats["waited"] else 0.0,
+                "blocked_seconds": round(max(0.0, self._blocked_until.get(key, 0.0) - now), 1),
+                "rpm": limits["rpm"],
+                "tpm": limits["tpm"]
+            }
+        return result
+
+
+_shared_limiter: Optional[LLMRateLimiter] = None
+_shared_limiter_lock = threading.Lock()
+
+
+def get_llm_rate_limiter(limits: Dict[str, Dict[str, float]] = None) -> LLMRateLimiter:
+    """获取进程级共享的LLM速率限制器"""
+    global _shared_limiter
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            _shared_limiter = LLMRateLimiter(limits)
+        return _shared_limiter
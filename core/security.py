@@ -6,7 +6,8 @@ import os
 import logging
 from typing import Dict, Any, Optional
 import hashlib
-import time
+
+from .rate_limiter import TokenBucket
 
 logger = logging.getLogger(__name__)
 
@@ -16,7 +17,7 @@ class SecurityManager:
     def __init__(self):
         self.api_keys = {}
         self.rate_limits = {}
-        self.last_requests = {}
+        self.total_requests = 0
         
     def set_api_key(self, provider: str, api_key: str):
         """设置API密钥"""
@@ -36,26 +37,19 @@ class SecurityManager:
         return self.api_keys.get(provider)
     
     def check_rate_limit(self, provider: str, limit_per_minute: int = 60) -> bool:
-        """检查速率限制"""
+        """检查速率限制（每个提供商一个令牌桶，O(1)）"""
         try:
-            current_time = time.time()
-            
-            if provider not in self.last_requests:
-                self.last_requests[provider] = []
-            
-            # 清理超过1分钟的请求记录
-            self.last_requests[provider] = [
-                req_time for req_time in self.last_requests[provider]
-                if current_time - req_time < 60
-            ]
+            bucket = self.rate_limits.get(provider)
+            if bucket is None or bucket.per_minute != limit_per_minute:
+                bucket = TokenBucket(limit_per_minute)
+                self.rate_limits[provider] = bucket
             
             # 检查是否超过限制
-            if len(self.last_requests[provider]) >= limit_per_minute:
+            if not bucket.try_take(1):
                 logger.warning(f"速率限制: {provider} 超过 {limit_per_minute}/分钟")
                 return False
             
-            # 记录当前请求
-            self.last_requests[provider].append(current_time)
+            self.total_requests += 1
             return True
             
         except Exception as e:
@@ -119,5 +113,5 @@ class SecurityManager:
             "api_keys_configured": len(self.api_keys),
             "providers": list(self.api_keys.keys()),
             "rate_limits_active": len(self.rate_limits),
-            "total_requests": sum(len(reqs) for reqs in self.last_requests.values())
+            "total_requests": self.total_requests
         }
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+A股实时行情快照 - 全市场行情按间隔统一刷新，按代码O(1)查询
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REFRESH_INTERVAL = 60  # 秒
+DEFAULT_RETRY_BACKOFF = 5      # 刷新失败后的首次重试间隔（秒），连续失败时翻倍，最长为刷新间隔
+
+
+def _to_python(value: Any) -> Any:
+    """NumPy标量转为Python原生类型"""
+    return value.item() if hasattr(value, "item") else value
+
+
+class _Snapshot(NamedTuple):
+    """一次刷新得到的快照（整体替换，读取方一次取用，列数组与行号索引始终对应）"""
+    columns: Dict[str, Any]
+    positions: Dict[str, int]
+    frame: Any
+
+
+_EMPTY_SNAPSHOT = _Snapshot({}, {}, None)
+
+
+class SpotSnapshotService:
+    """全市场实时行情快照
+
+    `ak.stock_zh_a_spot_em()` 一次返回约5000行，按单只股票过滤非常浪费。
+    这里每个刷新间隔最多下载一次，按列保存为NumPy数组，
+    并建立 代码 -> 行号 的字典索引，多用户、批量分析共享同一份快照。
+    异步刷新交给AkShare执行器（如提供），受该接口的并发上限和超时约束。
+    """
+
+    def __init__(self, refresh_interval: float = DEFAULT_REFRESH_INTERVAL,
+                 fetcher: Callable[[], Any] = None,
+                 retry_backoff: float = DEFAULT_RETRY_BACKOFF,
+                 executor: Any = None):
+        """
+        Args:
+            refresh_interval: 刷新间隔（秒）
+            fetcher: 下载全市场行情的函数，默认 ak.stock_zh_a_spot_em
+            retry_backoff: 刷新失败后的首次重试间隔（秒）
+            executor: AkShare执行器（提供 async run(endpoint, func)），None时使用事件循环默认线程池
+        """
+        self.refresh_interval = refresh_interval
+        self.retry_backoff = retry_backoff
+        self._fetcher = fetcher
+        self.executor = executor
+
+        self._snapshot = _EMPTY_SNAPSHOT
+        self._refreshed_at = 0.0
+        self._retry_after = 0.0
+        self._consecutive_failures = 0
+
+        self._lock = threading.Lock()
+        self.stats = {"refreshes": 0, "refresh_failures": 0, "lookups": 0, "misses": 0}
+
+    def _fetch(self):
+        if self._fetcher is not None:
+            return self._fetcher()
+
+        import akshare as ak
+        return ak.stock_zh_a_spot_em()
+
+    def is_stale(self) -> bool:
+        """快照是否需要刷新（刷新失败后的退避期内不再重试）"""
+        now = time.time()
+        return now - self._refreshed_at >= self.refresh_interval and now >= self._retry_after
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        刷新快照（同一时刻只有一个线程下载，其余线程等待后直接使用新快照）
+
+        Returns:
+            快照是否可用
+        """
+        if not force and not self.is_stale():
+            return bool(self._snapshot.positions)
+
+        with self._lock:
+            if not force and not self.is_stale():
+                return bool(self._snapshot.positions)
+
+            start_time = time.time()
+            try:
+                frame = self._fetch()
+                if frame is None or frame.empty:
+                    raise ValueError("实时行情为空")
+
+                symbols = frame["代码"].astype(str).to_numpy()
+                # 单次赋值替换整个快照，其他线程不会读到新旧混合的列和索引
+                self._snapshot = _Snapshot(
+                    columns={column: frame[column].to_numpy() for column in frame.columns},
+                    positions={symbol: index for index, symbol in enumerate(symbols)},
+                    frame=frame.set_index("代码", drop=False)
+                )
+                self._refreshed_at = time.time()
+                self._retry_after = 0.0
+                self._consecutive_failures = 0
+                self.stats["refreshes"] += 1
+
+                logger.info(f"实时行情快照已刷新: {len(symbols)} 只股票，耗时 {time.time() - start_time:.2f}s")
+                return True
+
+            except Exception as e:
+                self.stats["refresh_failures"] += 1
+                backoff = min(self.retry_backoff * 2 ** self._consecutive_failures, self.refresh_interval)
+                self._consecutive_failures += 1
+                self._retry_after = time.time() + backoff
+                if self._snapshot.positions:
+                    logger.warning(f"刷新实时行情快照失败，继续使用旧快照: {e}")
+                    return True
+                logger.error(f"刷新实时行情快照失败: {e}")
+                return False
+
+    def _get_row(self, symbol: str) -> Optional[Dict[str, Any]]:
+        snapshot = self._snapshot
+        position = snapshot.positions.get(symbol)
+        if position is None:
+            self.stats["misses"] += 1
+            return None
+
+        return {column: _to_python(values[position]) for column, values in snapshot.columns.items()}
+
+    def lookup(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """
+        查询单只股票的实时行情
+
+        Returns:
+            以akshare列名为键的行情字典，未找到返回None
+        """
+        self.stats["lookups"] += 1
+        if not self.refresh():
+            return None
+        return self._get_row(symbol)
+
+    def lookup_many(self, symbols: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """批量查询实时行情"""
+        self.stats["lookups"] += len(symbols)
+        if not self.refresh():
+            return {symbol: None for symbol in symbols}
+        return {symbol: self._get_row(symbol) for symbol in symbols}
+
+    async def arefresh(self, force: bool = False) -> bool:
+        """异步刷新：在AkShare执行器（或默认线程池）中下载，不阻塞事件循环"""
+        if not force and not self.is_stale():
+            return bool(self._snapshot.positions)
+
+        try:
+            if self.executor is not None:
+                return await self.executor.run("stock_zh_a_spot_em", self.refresh, force)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.refresh, force)
+        except asyncio.TimeoutError:
+            logger.warning("刷新实时行情快照超时，继续使用现有快照")
+            return bool(self._snapshot.positions)
+
+    async def alookup(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """异步查询：需要刷新时在线程池中下载，不阻塞事件循环"""
+        await self.arefresh()
+        # 不能调用lookup()：刷新失败时快照仍过期，lookup会在事件循环线程上再次同步下载
+        self.stats["lookups"] += 1
+        return self._get_row(symbol)
+
+    def get_frame(self):
+        """获取以代码为索引的完整快照DataFrame"""
+        self.refresh()
+        return self._snapshot.frame
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取快照统计"""
+        return {
+            **self.stats,
+            "symbols": len(self._snapshot.positions),
+            "refresh_interval": self.refresh_interval,
+            "refreshed_at": datetime.fromtimestamp(self._refreshed_at).isoformat() if self._refreshed_at else None,
+            "age_seconds": round(time.time() - self._refreshed_at, 1) if self._refreshed_at else None
+        }
+
+
+_shared_snapshot: Optional[SpotSnapshotService] = None
+_shared_snapshot_lock = threading.Lock()
+
+
+def get_spot_snapshot_service(refresh_interval: float = None, executor: Any = None) -> SpotSnapshotService:
+    """获取进程级共享的行情快照服务（executor为用于异步刷新的AkShare执行器）"""
+    global _shared_snapshot
+    with _shared_snapshot_lock:
+        if _shared_snapshot is None:
+            _shared_snapshot = SpotSnapshotService(refresh_interval or DEFAULT_REFRESH_INTERVAL, executor=executor)
+        else:
+            if refresh_interval:
+                _shared_snapshot.refresh_interval = refresh_interval
+            if executor is not None:
+                _shared_snapshot.executor = executor
+        return _shared_snapshot
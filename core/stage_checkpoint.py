@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分析阶段检查点 - 七阶段智能体分析每完成一个阶段即持久化其输出，
+按股票、分析深度和输入哈希寻址，失败或中断后重跑只执行缺失的阶段
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List
+
+logger = logging.getLogger(__name__)
+
+# 真实智能体分析的阶段顺序
+ANALYSIS_STAGES = [
+    "data_collection",
+    "analyst_team",
+    "research_team",
+    "trading_strategy",
+    "risk_assessment",
+    "final_decision",
+    "reflection"
+]
+
+DEFAULT_CHECKPOINT_TTL_HOURS = 24
+
+
+def make_input_hash(*parts: Any) -> str:
+    """
+    由分析输入生成哈希（分析师列表、模型配置、交易日等）
+
+    任一输入变化都会得到新的哈希，旧检查点自然失效。
+    """
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def today_input() -> str:
+    """当天日期，作为输入哈希的一部分（行情每天变化，检查点不跨交易日复用）"""
+    return datetime.now().strftime("%Y-%m-%d")
+
+
+class StageCheckpointStore:
+    """分析阶段检查点存储（SQLite）"""
+
+    def __init__(self, db_path: str = "data/cache/stage_checkpoints.db",
+                 ttl_hours: float = DEFAULT_CHECKPOINT_TTL_HOURS):
+        """
+        Args:
+            db_path: 数据库路径
+            ttl_hours: 检查点保留时长，过期的在写入时顺带清理
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_hours * 3600
+
+        self._lock = threading.RLock()
+        self.stats = {"saved": 0, "loaded_runs": 0, "resumed_stages": 0}
+
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._init_database()
+
+    def _init_database(self):
+        """初始化检查点表"""
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS stage_checkpoints (
+                    symbol TEXT NOT NULL,
+                    depth TEXT NOT NULL,
+                    input_hash TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    output TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (symbol, depth, input_hash, stage)
+                )
+            ''')
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_stage_checkpoints_created ON stage_checkpoints(created_at)"
+            )
+            self._conn.commit()
+
+    def load(self, symbol: str, depth: str, input_hash: str) -> Dict[str, Any]:
+        """
+        读取一次分析已完成的阶段
+
+        Returns:
+            阶段名 -> 阶段输出，没有检查点时返回空字典
+        """
+        with self._lock:
+            try:
+                rows = self._conn.execute(
+                    "SELECT stage, output FROM stage_checkpoints "
+                    "WHERE symbol = ? AND depth = ? AND input_hash = ? AND created_at > ?",
+                    (symbol, depth, input_hash, time.time() - self.ttl_seconds)
+                ).fetchall()
+            except Exception as e:
+                logger.error(f"读取分析阶段检查点失败: {e}")
+                return {}
+
+        completed = {}
+        for stage, output in rows:
+            try:
+                completed[stage] = json.loads(output)
+            except ValueError as e:
+                logger.warning(f"阶段检查点 {symbol}/{stage} 已损坏，忽略: {e}")
+        if completed:
+            self.stats["loaded_runs"] += 1
+        return completed
+
+    def save(self, symbol: str, depth: str, input_hash: str, stage: str, output: Dict[str, Any]) -> bool:
+        """保存一个已完成阶段的输出"""
+        now = time.time()
+        try:
+            payload = json.dumps(output, ensure_ascii=False, default=str)
+        except (TypeError, ValueError) as e:
+            logger.error(f"阶段 {stage} 输出无法序列化: {e}")
+            return False
+
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO stage_checkpoints "
+                    "(symbol, depth, input_hash, stage, output, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (symbol, depth, input_hash, stage, payload, now)
+                )
+                self._conn.execute("DELETE FROM stage_checkpoints WHERE created_at <= ?",
+                                   (now - self.ttl_seconds,))
+                self._conn.commit()
+                self.stats["saved"] += 1
+                return True
+            except Exception as e:
+                logger.error(f"保存分析阶段检查点失败: {e}")
+                return False
+
+    def clear(self, symbol: str = None) -> int:
+        """删除检查点（指定股票或全部），返回删除的条目数"""
+        with self._lock:
+            try:
+                if symbol:
+                    cursor = self._conn.execute("DELETE FROM stage_checkpoints WHERE symbol = ?", (symbol,))
+                else:
+                    cursor = self._conn.execute("DELETE FROM stage_checkpoints")
+                self._conn.commit()
+                return cursor.rowcount
+            except Exception as e:
+                logger.error(f"清空分析阶段检查点失败: {e}")
+                return 0
+
+    def list_runs(self, symbol: str = None) -> List[Dict[str, Any]]:
+        """列出未过期的分析及其已完成阶段"""
+        query = ("SELECT symbol, depth, input_hash, GROUP_CONCAT(stage), MAX(created_at) "
+                 "FROM stage_checkpoints WHERE created_at > ?")
+        params: List[Any] = [time.time() - self.ttl_seconds]
+        if symbol:
+            query += " AND symbol = ?"
+            params.append(symbol)
+        query += " GROUP BY symbol, depth, input_hash ORDER BY MAX(created_at) DESC"
+
+        with self._lock:
+            try:
+                rows = self._conn.execute(query, params).fetchall()
+            except Exception as e:
+                logger.error(f"读取分析阶段检查点失败: {e}")
+                return []
+
+        return [{
+            "symbol": row[0],
+            "depth": row[1],
+            "input_hash": row[2],
+            "stages": [stage for stage in ANALYSIS_STAGES if stage in row[3].split(",")],
+            "updated_at": datetime.fromtimestamp(row[4]).isoformat()
+        } for row in rows]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取检查点统计"""
+        with self._lock:
+            try:
+                stored = self._conn.execute(
+                    "SELECT COUNT(*) FROM stage_checkpoints WHERE created_at > ?",
+                    (time.time() - self.ttl_seconds,)
+                ).fetchone()[0]
+            except Exception:
+                stored = 0
+        return {**self.stats, "stored_stages": stored,
+                "ttl_hours": self.ttl_seconds / 3600, "db_path": str(self.db_path)}
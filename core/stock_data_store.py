@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+股票数据存储 - 长连接SQLite持久化，批量写入历史行情
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+OHLCV_FIELDS = ["open_price", "high_price", "low_price", "close_price", "volume"]
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",      # 读写互不阻塞
+    "synchronous": "NORMAL",    # WAL模式下NORMAL即可保证一致性
+    "cache_size": -32000,       # 约32MB页缓存（负数单位为KB）
+    "temp_store": "MEMORY"
+}
+
+
+class StockDataStore:
+    """股票数据存储
+
+    整个进程共用一个连接（check_same_thread=False + 锁），
+    历史行情通过 executemany 在单个事务内批量写入，
+    (symbol, date) 上的覆盖索引使按代码取最近N日行情无需回表。
+    """
+
+    def __init__(self, db_path: str = "data/trading_data.db"):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        for name, value in SQLITE_PRAGMAS.items():
+            self.conn.execute(f"PRAGMA {name}={value}")
+
+        self.init_schema()
+
+    def init_schema(self):
+        """创建数据表和索引"""
+        with self._lock:
+            cursor = self.conn.cursor()
+
+            # 创建股票数据表
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS stock_data (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    symbol TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    open_price REAL,
+                    high_price REAL,
+                    low_price REAL,
+                    close_price REAL,
+                    volume INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE(symbol, date)
+                )
+            ''')
+
+            # 覆盖索引：按代码取行情时直接从索引读出所有字段
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_stock_data_symbol_date_ohlcv
+                ON stock_data(symbol, date, open_price, high_price, low_price, close_price, volume)
+            ''')
+
+            # 创建技术指标表
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS technical_indicators (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    symbol TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    rsi REAL,
+                    macd REAL,
+                    ma5 REAL,
+                    ma20 REAL,
+                    bollinger_upper REAL,
+                    bollinger_lower REAL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE(symbol, date)
+                )
+            ''')
+
+            # 增量指标状态（每只股票每个周期一行，JSON序列化）
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS indicator_state (
+                    symbol TEXT NOT NULL,
+                    timeframe TEXT NOT NULL,
+                    last_date TEXT,
+                    state TEXT NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY(symbol, timeframe)
+                )
+            ''')
+
+            # 创建新闻数据表
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS news_data (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    symbol TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    news_content TEXT,
+                    sentiment_score REAL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            self.conn.commit()
+
+    def upsert_ohlcv(self, symbol: str, dates, open_prices, high_prices,
+                     low_prices, close_prices, volumes) -> int:
+        """
+        批量写入历史行情（单事务 executemany）
+
+        Args:
+            symbol: 股票代码
+            dates: 'YYYY-MM-DD' 日期数组
+            open_prices/high_prices/low_prices/close_prices/volumes: 与dates等长的数组
+
+        Returns:
+            写入行数
+        """
+        dates = np.asarray(dates).astype(str)
+        if dates.size == 0:
+            return 0
+
+        # 整列转换为Python原生类型，避免逐行构造对象
+        rows = zip(
+            [symbol] * dates.size,
+            dates.tolist(),
+            np.asarray(open_prices, dtype=np.float64).tolist(),
+            np.asarray(high_prices, dtype=np.float64).tolist(),
+            np.asarray(low_prices, dtype=np.float64).tolist(),
+            np.asarray(close_prices, dtype=np.float64).tolist(),
+            np.asarray(volumes, dtype=np.int64).tolist()
+        )
+
+        with self._lock:
+            try:
+                with self.conn:
+                    self.conn.executemany('''
+                        INSERT INTO stock_data
+                        (symbol, date, open_price, high_price, low_price, close_price, volume)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(symbol, date) DO UPDATE SET
+                            open_price = excluded.open_price,
+                            high_price = excluded.high_price,
+                            low_price = excluded.low_price,
+                            close_price = excluded.close_price,
+                            volume = excluded.volume
+                    ''', rows)
+                return int(dates.size)
+            except Exception as e:
+                logger.error(f"批量写入历史行情失败: {e}")
+                return 0
+
+    def upsert_ohlcv_frame(self, symbol: str, hist_data) -> int:
+        """批量写入akshare stock_zh_a_hist 返回的DataFrame"""
+        if hist_data is None or hist_data.empty:
+            return 0
+
+        import pandas as pd
+        dates = pd.to_datetime(hist_data['日期']).dt.strftime('%Y-%m-%d').to_numpy()
+        return self.upsert_ohlcv(
+            symbol, dates,
+            hist_data['开盘'].to_numpy(), hist_data['最高'].to_numpy(),
+            hist_data['最低'].to_numpy(), hist_data['收盘'].to_numpy(),
+            hist_data['成交量'].to_numpy()
+        )
+
+    def get_last_date(self, symbol: str) -> Optional[str]:
+        """获取该股票已保存的最新交易日"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT MAX(date) FROM stock_data WHERE symbol = ?", (symbol,)
+            ).fetchone()
+        return row[0] if row and row[0] else None
+
+    def load_ohlcv(self, symbol: str, limit: int = 100) -> Dict[str, np.ndarray]:
+        """
+        读取最近N个交易日的行情（按日期升序）
+
+        Returns:
+            {"date": ..., "open_price": ..., ...} 列数组
+        """
+        with self._lock:
+            rows = self.conn.execute('''
+                SELECT date, open_price, high_price, low_price, close_price, volume
+                FROM stock_data WHERE symbol = ?
+                ORDER BY date DESC LIMIT ?
+            ''', (symbol, limit)).fetchall()
+
+        rows.reverse()
+        if not rows:
+            return {"date": np.array([], dtype=str),
+                    **{field: np.array([], dtype=np.float64) for field in OHLCV_FIELDS}}
+
+        columns = list(zip(*rows))
+        result = {"date": np.array(columns[0])}
+        for field, values in zip(OHLCV_FIELDS, columns[1:]):
+            result[field] = np.array(values, dtype=np.float64)
+        return result
+
+    def get_daily_snapshot(self, symbol: str, date: str) -> Tuple[Optional[tuple], Optional[tuple]]:
+        """获取某日的行情行和技术指标行"""
+        with self._lock:
+            stock_row = self.conn.execute(
+                "SELECT * FROM stock_data WHERE symbol = ? AND date = ?", (symbol, date)
+            ).fetchone()
+            if not stock_row:
+                return None, None
+
+            tech_row = self.conn.execute(
+                "SELECT * FROM technical_indicators WHERE symbol = ? AND date = ?", (symbol, date)
+            ).fetchone()
+            return stock_row, tech_row
+
+    def save_daily_snapshot(self, symbol: str, date: str, price_data: Dict[str, Any],
+                            tech_data: Dict[str, Any]):
+        """在同一事务中保存当日行情和技术指标"""
+        with self._lock:
+            with self.conn:
+                self.conn.execute('''
+                    INSERT OR REPLACE INTO stock_data
+                    (symbol, date, open_price, high_price, low_price, close_price, volume)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (symbol, date, price_data['open'], price_data['high'],
+                      price_data['low'], price_data['current_price'], price_data['volume']))
+
+                self.conn.execute('''
+                    INSERT OR REPLACE INTO technical_indicators
+                    (symbol, date, rsi, macd, ma5, ma20, bollinger_upper, bollinger_lower)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (symbol, date, tech_data['rsi'], tech_data['macd'],
+                      tech_data['ma5'], tech_data['ma20'],
+                      tech_data['bollinger_upper'], tech_data['bollinger_lower']))
+
+    def load_indicator_state(self, symbol: str, timeframe: str = "daily") -> Optional[Dict[str, Any]]:
+        """读取增量指标状态"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT state FROM indicator_state WHERE symbol = ? AND timeframe = ?", (symbol, timeframe)
+            ).fetchone()
+        if not row:
+            return None
+        try:
+            return json.loads(row[0])
+        except ValueError as e:
+            logger.error(f"解析指标状态失败: {e}")
+            return None
+
+    def save_indicator_state(self, symbol: str, state: Dict[str, Any], timeframe: str = "daily"):
+        """保存增量指标状态"""
+        with self._lock:
+            with self.conn:
+                self.conn.execute('''
+                    INSERT OR REPLACE INTO indicator_state (symbol, timeframe, last_date, state, updated_at)
+                    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ''', (symbol, timeframe, state.get("last_date"), json.dumps(state)))
+
+    def close(self):
+        """关闭连接"""
+        with self._lock:
+            try:
+                self.conn.close()
+            except Exception as e:
+                logger.error(f"关闭数据库连接失败: {e}")
+
+
+def _synthetic_history(days: int):
+    """生成基准测试用的随机行情（与stock_zh_a_hist列名一致）"""
+    import pandas as pd
+
+    rng = np.random.default_rng(42)
+    close = 50 + np.cumsum(rng.normal(0, 0.5, days))
+    return pd.DataFrame({
+        '日期': pd.date_range('2015-01-01', periods=days, freq='D'),
+        '开盘': close + rng.normal(0, 0.2, days),
+        '最高': close + np.abs(rng.normal(0, 0.5, days)),
+        '最低': close - np.abs(rng.normal(0, 0.5, days)),
+        '收盘': close,
+        '成交量': rng.integers(1_000_000, 10_000_000, days)
+    })
+
+
+def _legacy_insert(db_path: str, symbol: str, hist_data):
+    """原实现：每次新建连接，iterrows逐行 execute"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    for _, row in hist_data.iterrows():
+        date_str = row['日期'].strftime('%Y-%m-%d')
+        cursor.execute('''
+            INSERT OR REPLACE INTO stock_data
+            (symbol, date, open_price, high_price, low_price, close_price, volume)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (symbol, date_str, float(row['开盘']), float(row['最高']),
+              float(row['最低']), float(row['收盘']), int(row['成交量'])))
+    conn.commit()
+    conn.close()
+
+
+def run_benchmark(symbols: int = 20) -> List[Dict[str, Any]]:
+    """对比原逐行写入与批量写入（180日和多年回填）"""
+    import tempfile
+
+    results = []
+    for days in (180, 2500):
+        hist_data = _synthetic_history(days)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            legacy_db = str(Path(tmp_dir) / "legacy.db")
+            StockDataStore(legacy_db).close()
+            start = time.perf_counter()
+            for i in range(symbols):
+                _legacy_insert(legacy_db, f"{i:06d}", hist_data)
+            legacy_seconds = time.perf_counter() - start
+
+            store = StockDataStore(str(Path(tmp_dir) / "store.db"))
+            start = time.perf_counter()
+            for i in range(symbols):
+                store.upsert_ohlcv_frame(f"{i:06d}", hist_data)
+            batch_seconds = time.perf_counter() - start
+            store.close()
+
+        results.append({
+            "days": days,
+            "symbols": symbols,
+            "legacy_seconds": round(legacy_seconds, 3),
+            "batch_seconds": round(batch_seconds, 3),
+            "speedup": round(legacy_seconds / batch_seconds, 1) if batch_seconds else None
+        })
+    return results
+
+
+if __name__ == "__main__":
+    for result in run_benchmark():
+        print(f"{result['days']}日 x {result['symbols']}只: 逐行 {result['legacy_seconds']}s, "
+              f"批量 {result['batch_seconds']}s, 提升 {result['speedup']}x")
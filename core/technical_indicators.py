@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+技术指标引擎 - 基于NumPy向量化计算完整指标序列
+
+输入既可以是单只股票的一维序列，也可以是 (股票数, 交易日数) 的二维对齐数组，
+沿最后一个轴（时间）计算，二维时所有股票同时计算。
+"""
+
+import logging
+import math
+from typing import Dict, Any, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+logger = logging.getLogger(__name__)
+
+try:
+    from scipy.signal import lfilter
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+    lfilter = None
+
+
+# 不超过该行数时递推使用纯Python循环
+PYTHON_LOOP_MAX_ROWS = 4
+
+DEFAULT_INDICATOR_PARAMS = {
+    "ma_windows": (5, 10, 20, 60),
+    "volume_ma_windows": (5, 10),
+    "rsi_period": 14,
+    "macd": (12, 26, 9),        # 快线、慢线、信号线
+    "kdj": (9, 3, 3),           # RSV周期、K平滑、D平滑
+    "atr_period": 14,
+    "bollinger": (20, 2)        # 周期、标准差倍数
+}
+
+
+def _as_rows(values) -> np.ndarray:
+    """转换为 (行, 时间) 的float64二维数组"""
+    array = np.asarray(values, dtype=np.float64)
+    return array.reshape(1, -1) if array.ndim == 1 else array
+
+
+def recursive_smooth(x: np.ndarray, alpha: float, warmup: int = 1,
+                     seed: Optional[float] = None) -> np.ndarray:
+    """
+    指数递推平滑 y_t = y_{t-1} + alpha * (x_t - y_{t-1})
+
+    Args:
+        x: (行, 时间) 数组，NaN处保持状态不变并输出NaN
+        alpha: 平滑系数（EMA为2/(n+1)，Wilder平滑为1/n）
+        warmup: 前warmup个有效值取算术平均作为初值，之前输出NaN
+        seed: 给定初始状态（如KDJ的50），此时忽略warmup
+
+    Returns:
+        与x同形状的平滑序列
+    """
+    rows, length = x.shape
+    out = np.full((rows, length), np.nan)
+    if length == 0:
+        return out
+
+    nan_mask = np.isnan(x)
+    leading = int(np.argmin(nan_mask.all(axis=0))) if not nan_mask.all() else length
+    body = x[:, leading:]
+
+    # 无缺失值时使用scipy的IIR滤波（C实现）
+    if SCIPY_AVAILABLE and body.size and not np.isnan(body).any():
+        a = [1.0, alpha - 1.0]
+        if seed is not None:
+            zi = np.full((rows, 1), (1.0 - alpha) * seed)
+            out[:, leading:] = lfilter([alpha], a, body, axis=1, zi=zi)[0]
+        elif body.shape[1] >= warmup:
+            init = body[:, :warmup].mean(axis=1)
+            out[:, leading + warmup - 1] = init
+            if body.shape[1] > warmup:
+                zi = ((1.0 - alpha) * init).reshape(rows, 1)
+                out[:, leading + warmup:] = lfilter([alpha], a, body[:, warmup:], axis=1, zi=zi)[0]
+        return out
+
+    # 行数很少时逐个元素递推比逐步调用NumPy更快
+    if rows <= PYTHON_LOOP_MAX_ROWS:
+        for row in range(rows):
+            out[row] = _smooth_row(x[row].tolist(), alpha, warmup, seed)
+        return out
+
+    # 通用路径：沿时间逐步递推，所有行同时计算
+    state = np.full(rows, np.nan if seed is None else float(seed))
+    count = np.zeros(rows)
+    for t in range(leading, length):
+        xt = x[:, t]
+        valid = ~nan_mask[:, t]
+        count += valid
+        if seed is None:
+            step = np.where(count <= warmup, 1.0 / np.maximum(count, 1.0), alpha)
+            updated = np.where(np.isnan(state), xt, state + step * (xt - state))
+            state = np.where(valid, updated, state)
+            out[:, t] = np.where(valid & (count >= warmup), state, np.nan)
+        else:
+            state = np.where(valid, state + alpha * (xt - state), state)
+            out[:, t] = np.where(valid, state, np.nan)
+    return out
+
+
+def _smooth_row(values, alpha: float, warmup: int, seed: Optional[float]) -> list:
+    """单行递推（纯Python浮点运算）"""
+    out = []
+    state = seed
+    count = 0
+    total = 0.0
+    for value in values:
+        if value != value:  # NaN
+            out.append(math.nan)
+            continue
+        count += 1
+        if seed is not None:
+            state += alpha * (value - state)
+        elif count < warmup:
+            total += value
+            out.append(math.nan)
+            continue
+        elif count == warmup:
+            state = (total + value) / warmup
+        else:
+            state += alpha * (value - state)
+        out.append(state)
+    return out
+
+
+def rolling_mean(x: np.ndarray, window: int) -> np.ndarray:
+    """滑动平均（窗口内有缺失值时为NaN）"""
+    rows, length = x.shape
+    out = np.full((rows, length), np.nan)
+    if length < window:
+        return out
+
+    filled = np.where(np.isnan(x), 0.0, x)
+    csum = np.cumsum(filled, axis=1)
+    nans = np.cumsum(np.isnan(x), axis=1)
+    csum = np.concatenate([np.zeros((rows, 1)), csum], axis=1)
+    nans = np.concatenate([np.zeros((rows, 1)), nans], axis=1)
+
+    sums = csum[:, window:] - csum[:, :-window]
+    missing = nans[:, window:] - nans[:, :-window]
+    out[:, window - 1:] = np.where(missing == 0, sums / window, np.nan)
+    return out
+
+
+def rolling_std(x: np.ndarray, window: int, ddof: int = 1) -> np.ndarray:
+    """滑动标准差"""
+    rows, length = x.shape
+    out = np.full((rows, length), np.nan)
+    if length < window:
+        return out
+    out[:, window - 1:] = sliding_window_view(x, window, axis=1).std(axis=-1, ddof=ddof)
+    return out
+
+
+def rolling_max(x: np.ndarray, window: int) -> np.ndarray:
+    rows, length = x.shape
+    out = np.full((rows, length), np.nan)
+    if length >= window:
+        out[:, window - 1:] = sliding_window_view(x, window, axis=1).max(axis=-1)
+    return out
+
+
+def rolling_min(x: np.ndarray, window: int) -> np.ndarray:
+    rows, length = x.shape
+    out = np.full((rows, length), np.nan)
+    if length >= window:
+        out[:, window - 1:] = sliding_window_view(x, window, axis=1).min(axis=-1)
+    return out
+
+
+def _previous(x: np.ndarray) -> np.ndarray:
+    """前一期数值（首列为NaN）"""
+    prev = np.empty_like(x)
+    prev[:, 0] = np.nan
+    prev[:, 1:] = x[:, :-1]
+    return prev
+
+
+class TechnicalIndicatorEngine:
+    """向量化技术指标引擎"""
+
+    def __init__(self, params: Dict[str, Any] = None):
+        self.params = {**DEFAULT_INDICATOR_PARAMS, **(params or {})}
+
+    def compute_series(self, high, low, close, volume) -> Dict[str, np.ndarray]:
+        """
+        计算完整指标序列
+
+        Args:
+            high/low/close/volume: 一维序列或 (股票数, 交易日数) 二维数组
+
+        Returns:
+            指标名 -> 与输入同形状的序列
+        """
+        one_dim = np.ndim(close) == 1
+        high, low, close, volume = (_as_rows(v) for v in (high, low, close, volume))
+        p = self.params
+        series: Dict[str, np.ndarray] = {}
+
+        # 均线（共用一次前缀和的滑动平均）
+        for window in p["ma_windows"]:
+            series[f"ma{window}"] = rolling_mean(close, window)
+        for window in p["volume_ma_windows"]:
+            series[f"volume_ma{window}"] = rolling_mean(volume, window)
+
+        prev_close = _previous(close)
+        change = close - prev_close
+
+        # RSI（Wilder平滑）
+        period = p["rsi_period"]
+        gain = np.where(np.isnan(change), np.nan, np.maximum(change, 0.0))
+        loss = np.where(np.isnan(change), np.nan, np.maximum(-change, 0.0))
+        avg_gain = recursive_smooth(gain, 1.0 / period, warmup=period)
+        avg_loss = recursive_smooth(loss, 1.0 / period, warmup=period)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rs = avg_gain / avg_loss
+            rsi = 100.0 - 100.0 / (1.0 + rs)
+        series["rsi"] = np.where((avg_loss == 0) & ~np.isnan(avg_gain), 100.0, rsi)
+
+        # MACD（DIF、DEA、柱状值按A股惯例为2倍差值）
+        fast, slow, signal = p["macd"]
+        ema_fast = recursive_smooth(close, 2.0 / (fast + 1))
+        ema_slow = recursive_smooth(close, 2.0 / (slow + 1))
+        dif = ema_fast - ema_slow
+        dea = recursive_smooth(dif, 2.0 / (signal + 1))
+        series["macd_dif"] = dif
+        series["macd_dea"] = dea
+        series["macd_hist"] = 2.0 * (dif - dea)
+
+        # KDJ
+        rsv_period, k_smooth, d_smooth = p["kdj"]
+        lowest = rolling_min(low, rsv_period)
+        highest = rolling_max(high, rsv_period)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            spread = highest - lowest
+            rsv = np.where(spread > 0, (close - lowest) / spread * 100.0, 50.0)
+        rsv = np.where(np.isnan(lowest) | np.isnan(close), np.nan, rsv)
+        k = recursive_smooth(rsv, 1.0 / k_smooth, seed=50.0)
+        d = recursive_smooth(k, 1.0 / d_smooth, seed=50.0)
+        series["kdj_k"] = k
+        series["kdj_d"] = d
+        series["kdj_j"] = 3.0 * k - 2.0 * d
+
+        # ATR（Wilder平滑）
+        true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+        true_range = np.where(np.isnan(close), np.nan, true_range)
+        atr_period = p["atr_period"]
+        series["atr"] = recursive_smooth(true_range, 1.0 / atr_period, warmup=atr_period)
+
+        # OBV
+        direction = np.sign(np.nan_to_num(change))
+        obv = np.cumsum(direction * np.nan_to_num(volume), axis=1)
+        series["obv"] = np.where(np.isnan(close), np.nan, obv)
+
+        # 布林带
+        boll_period, boll_width = p["bollinger"]
+        middle = series.get(f"ma{boll_period}")
+        if middle is None:
+            middle = rolling_mean(close, boll_period)
+        std = rolling_std(close, boll_period)
+        series["bollinger_middle"] = middle
+        series["bollinger_upper"] = middle + boll_width * std
+        series["bollinger_lower"] = middle - boll_width * std
+
+        if one_dim:
+            series = {name: values[0] for name, values in series.items()}
+        return series
+
+    def compute_latest(self, high, low, close, volume) -> Dict[str, Optional[float]]:
+        """计算指标并返回最新一期的数值（NaN转为None）"""
+        series = self.compute_series(high, low, close, volume)
+        return self.latest_values(series)
+
+    @staticmethod
+    def latest_values(series: Dict[str, np.ndarray]) -> Dict[str, Optional[float]]:
+        """取一维指标序列的最后一个值"""
+        latest = {}
+        for name, values in series.items():
+            value = float(values[-1]) if len(values) else math.nan
+            latest[name] = None if math.isnan(value) else round(value, 4)
+        return latest
+
+    def compute_frame(self, hist_data) -> Dict[str, np.ndarray]:
+        """对akshare stock_zh_a_hist 格式的DataFrame计算完整指标序列"""
+        return self.compute_series(
+            hist_data['最高'].to_numpy(dtype=np.float64),
+            hist_data['最低'].to_numpy(dtype=np.float64),
+            hist_data['收盘'].to_numpy(dtype=np.float64),
+            hist_data['成交量'].to_numpy(dtype=np.float64)
+        )
+
+
+def _pandas_baseline(hist_data) -> Dict[str, float]:
+    """原RealDataCollector的pandas实现（仅末值RSI、MACD、MA5/MA20、布林带）"""
+    close_prices = hist_data['收盘'].astype(float)
+    ma5 = close_prices.rolling(window=5).mean().iloc[-1]
+    ma20 = close_prices.rolling(window=20).mean().iloc[-1]
+
+    delta = close_prices.diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    rsi = (100 - (100 / (1 + gain / loss))).iloc[-1]
+
+    macd = (close_prices.ewm(span=12).mean() - close_prices.ewm(span=26).mean()).iloc[-1]
+
+    ma = close_prices.rolling(window=20).mean()
+    std = close_prices.rolling(window=20).std()
+    return {"rsi": rsi, "macd": macd, "ma5": ma5, "ma20": ma20,
+            "bollinger_upper": (ma + std * 2).iloc[-1], "bollinger_lower": (ma - std * 2).iloc[-1]}
+
+
+if __name__ == "__main__":
+    import time
+    import pandas as pd
+
+    rng = np.random.default_rng(7)
+    engine = TechnicalIndicatorEngine()
+    print(f"scipy加速: {'可用' if SCIPY_AVAILABLE else '不可用'}")
+
+    for days in (100, 2500):
+        close = 50 + np.cumsum(rng.normal(0, 0.5, days))
+        frame = pd.DataFrame({
+            '最高': close + np.abs(rng.normal(0, 0.5, days)),
+            '最低': close - np.abs(rng.normal(0, 0.5, days)),
+            '收盘': close,
+            '成交量': rng.integers(1_000_000, 10_000_000, days).astype(float)
+        })
+
+        rounds = 50
+        start = time.perf_counter()
+        for _ in range(rounds):
+            _pandas_baseline(frame)
+        pandas_ms = (time.perf_counter() - start) / rounds * 1000
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            engine.compute_frame(frame)
+        engine_ms = (time.perf_counter() - start) / rounds * 1000
+
+        print(f"{days}个交易日: pandas末值(6项) {pandas_ms:.2f}ms, "
+              f"NumPy完整序列({len(engine.compute_frame(frame))}项) {engine_ms:.2f}ms")
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLM用量统计 - 解析提供商响应中的usage，按调用记录提示/输出token数、耗时和估算费用，
+并按智能体、分析阶段和单次分析汇总，便于找出花费和耗时最多的智能体
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 单价（元/百万token），查找顺序："提供商:模型" -> 模型 -> 模型前缀 -> 提供商 -> "default"
+# 价格会随提供商调整，仅用于估算，可通过 pricing 参数覆盖
+DEFAULT_PRICING = {
+    "default": {"input": 2.0, "output": 8.0},
+    "deepseek-chat": {"input": 2.0, "output": 8.0},
+    "deepseek-reasoner": {"input": 4.0, "output": 16.0},
+    "gpt-4o-mini": {"input": 1.1, "output": 4.4},
+    "gpt-4o": {"input": 18.0, "output": 72.0},
+    "gpt-4": {"input": 216.0, "output": 432.0},
+    "gpt-3.5-turbo": {"input": 3.6, "output": 10.8},
+    "gemini-1.5-flash": {"input": 0.55, "output": 2.2},
+    "gemini-1.5-pro": {"input": 9.0, "output": 36.0},
+    "moonshot-v1-8k": {"input": 12.0, "output": 12.0},
+    "moonshot-v1-32k": {"input": 24.0, "output": 24.0},
+    "moonshot-v1-128k": {"input": 60.0, "output": 60.0},
+    "qwen-turbo": {"input": 0.3, "output": 0.6},
+    "qwen-plus": {"input": 0.8, "output": 2.0},
+    "qwen-max": {"input": 2.4, "output": 9.6}
+}
+
+USAGE_GROUPS = {
+    "agent": "agent_id",
+    "stage": "stage",
+    "analysis": "analysis_id",
+    "model": "provider || ':' || model"
+}
+
+# 当前分析的上下文（分析ID、股票、阶段），同一分析内的并发任务继承同一份上下文
+_usage_context: ContextVar[Optional[Dict[str, str]]] = ContextVar("llm_usage_context", default=None)
+
+
+def extract_usage(result: Dict[str, Any]) -> Optional[Dict[str, int]]:
+    """
+    从提供商响应中解析token用量
+
+    支持OpenAI兼容格式（usage.prompt_tokens / completion_tokens，Moonshot流式
+    响应放在choices[0].usage中）和Gemini格式（usageMetadata）。
+
+    Returns:
+        {"prompt_tokens", "completion_tokens"}，响应中没有用量时返回None
+    """
+    if not isinstance(result, dict):
+        return None
+
+    usage = result.get("usage")
+    if not usage:
+        choices = result.get("choices") or []
+        usage = choices[0].get("usage") if choices and isinstance(choices[0], dict) else None
+    if isinstance(usage, dict) and ("prompt_tokens" in usage or "completion_tokens" in usage):
+        return {"prompt_tokens": int(usage.get("prompt_tokens") or 0),
+                "completion_tokens": int(usage.get("completion_tokens") or 0)}
+
+    metadata = result.get("usageMetadata")
+    if isinstance(metadata, dict):
+        return {"prompt_tokens": int(metadata.get("promptTokenCount") or 0),
+                "completion_tokens": int(metadata.get("candidatesTokenCount") or 0)}
+    return None
+
+
+def start_analysis_usage(symbol: str = "") -> str:
+    """开始统计一次分析的LLM用量，返回分析ID（分析过程中的调用都归到该ID下）"""
+    analysis_id = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    _usage_context.set({"analysis_id": analysis_id, "symbol": symbol, "stage": ""})
+    return analysis_id
+
+
+@contextmanager
+def usage_stage(stage: str):
+    """在with块内把LLM调用归到指定的分析阶段"""
+    current = _usage_context.get() or {"analysis_id": "", "symbol": "", "stage": ""}
+    token = _usage_context.set({**current, "stage": stage})
+    try:
+        yield
+    finally:
+        _usage_context.reset(token)
+
+
+def current_usage_context() -> Dict[str, str]:
+    """当前的分析ID、股票和阶段（不在分析中时均为空字符串）"""
+    return dict(_usage_context.get() or {"analysis_id": "", "symbol": "", "stage": ""})
+
+
+class LLMUsageTracker:
+    """LLM调用用量记录（SQLite）"""
+
+    def __init__(self, db_path: str = "data/cache/llm_usage.db", pricing: Dict[str, Dict[str, float]] = None):
+        """
+        Args:
+            db_path: 数据库路径
+            pricing: 单价覆盖（元/百万token），键同 DEFAULT_PRICING
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.pricing = {**DEFAULT_PRICING, **(pricing or {})}
+
+        self._lock = threading.RLock()
+        self.stats = {"recorded": 0, "provider_usage": 0, "estimated_usage": 0}
+
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._init_database()
+
+    def _init_database(self):
+        """初始化用量表"""
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS llm_usage (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at REAL NOT NULL,
+                    analysis_id TEXT NOT NULL DEFAULT '',
+                    symbol TEXT NOT NULL DEFAULT '',
+                    stage TEXT NOT NULL DEFAULT '',
+                    agent_id TEXT NOT NULL,
+                    provider TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    prompt_tokens INTEGER NOT NULL,
+                    completion_tokens INTEGER NOT NULL,
+                    usage_source TEXT NOT NULL,
+                    latency REAL NOT NULL,
+                    queue_seconds REAL NOT NULL DEFAULT 0,
+                    cost REAL NOT NULL
+                )
+            ''')
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_analysis ON llm_usage(analysis_id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_created ON llm_usage(created_at)")
+            self._conn.commit()
+
+    def get_price(self, provider: str, model: str) -> Dict[str, float]:
+        """查找模型单价（元/百万token）"""
+        price = self.pricing.get(f"{provider}:{model}") or self.pricing.get(model)
+        if price:
+            return price
+        # 带日期或版本后缀的模型名按最长前缀匹配（如 gpt-4o-2024-08-06）
+        prefixes = [key for key in self.pricing if ":" not in key and model.startswith(key)]
+        if prefixes:
+            return self.pricing[max(prefixes, key=len)]
+        return self.pricing.get(provider) or self.pricing["default"]
+
+    def estimate_cost(self, provider: str, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        """估算一次调用的费用（元）"""
+        price = self.get_price(provider, model)
+        return (prompt_tokens * price["input"] + completion_tokens * price["output"]) / 1_000_000
+
+    def record(self, agent_id: str, provider: str, model: str, prompt_tokens: int, completion_tokens: int,
+               latency: float, status: str = "success", usage_source: str = "provider",
+               queue_seconds: float = 0.0) -> Dict[str, Any]:
+        """
+        记录一次LLM调用，分析ID和阶段取自当前上下文
+
+        Args:
+            usage_source: "provider"（响应中的usage）、"estimate"（本地估算）或 "cache"（命中缓存，不计费）
+            queue_seconds: 限流排队时间（不计入latency）
+
+        Returns:
+            本次调用的用量记录
+        """
+        context = current_usage_context()
+        cost = 0.0 if usage_source == "cache" else self.estimate_cost(provider, model, prompt_tokens, completion_tokens)
+        entry = {
+            **context,
+            "agent_id": agent_id,
+            "provider": provider,
+            "model": model,
+            "status": status,
+            "prompt_tokens": int(prompt_tokens),
+            "completion_tokens": int(completion_tokens),
+            "usage_source": usage_source,
+            "latency": round(latency, 3),
+            "queue_seconds": round(queue_seconds, 3),
+            "cost": round(cost, 6)
+        }
+
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT INTO llm_usage (created_at, analysis_id, symbol, stage, agent_id, provider, model, "
+                    "status, prompt_tokens, completion_tokens, usage_source, latency, queue_seconds, cost) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (time.time(), entry["analysis_id"], entry["symbol"], entry["stage"], agent_id, provider,
+                     model, status, entry["prompt_tokens"], entry["completion_tokens"], usage_source,
+                     latency, queue_seconds, cost)
+                )
+                self._conn.commit()
+                self.stats["recorded"] += 1
+                if usage_source == "provider":
+                    self.stats["provider_usage"] += 1
+                elif usage_source == "estimate":
+                    self.stats["estimated_usage"] += 1
+            except Exception as e:
+                logger.error(f"记录LLM用量失败: {e}")
+        return entry
+
+    def summarize(self, group_by: str = "agent", analysis_id: str = None,
+                  since_hours: float = None) -> List[Dict[str, Any]]:
+        """
+        按维度汇总用量，按费用从高到低排序
+
+        Args:
+            group_by: "agent"、"stage"、"analysis" 或 "model"
+            analysis_id: 只统计指定分析
+            since_hours: 只统计最近若干小时
+        """
+        if group_by not in USAGE_GROUPS:
+            raise ValueError(f"不支持的汇总维度: {group_by}")
+
+        query = (f"SELECT {USAGE_GROUPS[group_by]} AS name, COUNT(*), "
+                 "SUM(status = 'cached'), SUM(status = 'failed'), "
+                 "SUM(prompt_tokens), SUM(completion_tokens), SUM(cost), "
+                 "SUM(latency), MAX(latency), SUM(queue_seconds), MIN(symbol), MIN(created_at) "
+                 "FROM llm_usage WHERE 1 = 1")
+        params: List[Any] = []
+        if analysis_id:
+            query += " AND analysis_id = ?"
+            params.append(analysis_id)
+        if since_hours:
+            query += " AND created_at > ?"
+            params.append(time.time() - since_hours * 3600)
+        query += " GROUP BY name ORDER BY SUM(cost) DESC, SUM(latency) DESC"
+
+        with self._lock:
+            try:
+                rows = self._conn.execute(query, params).fetchall()
+            except Exception as e:
+                logger.error(f"汇总LLM用量失败: {e}")
+                return []
+
+        summary = []
+        for (name, calls, cached, failed, prompt_tokens, completion_tokens, cost,
+             total_latency, max_latency, queue_seconds, symbol, first_at) in rows:
+            # 命中缓存的调用没有网络耗时，不参与平均耗时
+            requests = calls - (cached or 0)
+            if group_by == "stage" and not name:
+                name = "(未分阶段)"
+            item = {
+                group_by: name,
+                "calls": calls,
+                "cached": cached or 0,
+                "failed": failed or 0,
+                "prompt_tokens": prompt_tokens or 0,
+                "completion_tokens": completion_tokens or 0,
+                "total_tokens": (prompt_tokens or 0) + (completion_tokens or 0),
+                "cost": round(cost or 0.0, 4),
+                "total_latency": round(total_latency or 0.0, 2),
+                "avg_latency": round((total_latency or 0.0) / requests, 2) if requests else 0.0,
+                "max_latency": round(max_latency or 0.0, 2),
+                "queue_seconds": round(queue_seconds or 0.0, 2)
+            }
+            if group_by == "analysis":
+                item["symbol"] = symbol
+                item["started_at"] = datetime.fromtimestamp(first_at).isoformat(timespec="seconds")
+            summary.append(item)
+        return summary
+
+    def get_analysis_usage(self, analysis_id: str) -> Dict[str, Any]:
+        """单次分析的用量：合计、按智能体和按阶段"""
+        by_agent = self.summarize("agent", analysis_id=analysis_id)
+        totals = {key: sum(item[key] for item in by_agent)
+                  for key in ("calls", "cached", "failed", "prompt_tokens", "completion_tokens",
+                              "total_tokens", "total_latency")}
+        totals["cost"] = round(sum(item["cost"] for item in by_agent), 4)
+        return {
+            "analysis_id": analysis_id,
+            "totals": totals,
+            "by_agent": by_agent,
+            "by_stage": self.summarize("stage", analysis_id=analysis_id)
+        }
+
+    def clear(self) -> int:
+        """清空用量记录，返回删除的条目数"""
+        with self._lock:
+            try:
+                cursor = self._conn.execute("DELETE FROM llm_usage")
+                self._conn.commit()
+                return cursor.rowcount
+            except Exception as e:
+                logger.error(f"清空LLM用量失败: {e}")
+                return 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取用量记录统计"""
+        with self._lock:
+            try:
+                stored, cost = self._conn.execute("SELECT COUNT(*), SUM(cost) FROM llm_usage").fetchone()
+            except Exception:
+                stored, cost = 0, 0.0
+        return {**self.stats, "stored_calls": stored, "total_cost": round(cost or 0.0, 4),
+                "currency": "CNY", "db_path": str(self.db_path)}
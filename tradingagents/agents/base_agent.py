@@ -36,6 +36,8 @@ class BaseAgent(ABC):
         self.agent_config = self._get_agent_config()
         self.conversation_history = []
         self.analysis_count = 0
+        # 批量预取的记忆：查询字符串 -> 记忆列表（同一智能体可能同时分析多只股票）
+        self._prefetched_memories: Dict[str, List[Dict[str, Any]]] = {}
         
         logger.info(f"初始化智能体: {self.agent_id} ({self.agent_type})")
     
@@ -79,15 +81,17 @@ class BaseAgent(ABC):
         带记忆系统的处理方法
         """
         try:
-            # 检索相关记忆
+            # 检索相关记忆（优先使用依赖图批量预取的结果）
             relevant_memories = []
             if self.memory_manager:
                 query = self._extract_query_from_input(input_data)
-                relevant_memories = await self.memory_manager.search_memories(
-                    query, 
-                    agent_id=self.agent_id,
-                    limit=5
-                )
+                relevant_memories = self._prefetched_memories.pop(query, None)
+                if relevant_memories is None:
+                    relevant_memories = await self.memory_manager.search_memories(
+                        query, 
+                        agent_id=self.agent_id,
+                        limit=5
+                    )
             
             # 将记忆添加到上下文
             enhanced_context = {
@@ -118,6 +122,14 @@ class BaseAgent(ABC):
                 "timestamp": datetime.now().isoformat()
             }
     
+    def prefetch_memories(self, query: str, memories: List[Dict[str, Any]]):
+        """记录批量检索到的记忆，下一次相同查询的 process_with_memory 直接使用"""
+        self._prefetched_memories[query] = memories
+
+    def clear_prefetched_memories(self, query: str):
+        """丢弃未被使用的预取记忆，避免以后的同一查询用到过期结果"""
+        self._prefetched_memories.pop(query, None)
+
     def _extract_query_from_input(self, input_data: Dict[str, Any]) -> str:
         """从输入数据中提取查询字符串"""
         if isinstance(input_data, dict):
@@ -6,7 +6,7 @@ import asyncio
 import logging
 import os
 import sys
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 import json
 
@@ -63,8 +63,16 @@ class MemoryManager:
             self.embedding_model = None
             self.memories = []  # 简单内存存储
     
+    def preload(self):
+        """启动时在后台开始加载嵌入模型（不阻塞）"""
+        if self.use_chromadb_manager:
+            self.chromadb_manager.start_loading()
+
     async def initialize(self):
-        """初始化记忆系统"""
+        """初始化记忆系统（已初始化时直接返回）"""
+        if self.initialized:
+            return
+
         try:
             if self.use_chromadb_manager:
                 # 使用修复版ChromaDB记忆管理器 - 强制成功
@@ -281,6 +289,28 @@ class MemoryManager:
             logger.error(f"搜索记忆失败: {e}")
             return []
     
+    async def search_memories_batch(self,
+                                    requests: List[Tuple[str, Optional[str]]],
+                                    limit: int = 5) -> List[List[Dict[str, Any]]]:
+        """
+        批量搜索多个智能体的相关记忆（一次编码、一次查询）
+
+        Args:
+            requests: [(查询字符串, 智能体ID), ...]
+            limit: 每个请求返回的数量上限
+
+        Returns:
+            与requests一一对应的记忆列表
+        """
+        if not self.initialized:
+            await self.initialize()
+
+        if self.use_chromadb_manager and self.chromadb_manager:
+            return await self.chromadb_manager.search_memories_batch(requests, limit)
+
+        return [await self.search_memories(query, agent_id=agent_id, limit=limit)
+                for query, agent_id in requests]
+
     async def get_agent_memories(self, agent_id: str, limit: int = 10) -> List[Dict[str, Any]]:
         """获取特定智能体的记忆"""
         return await self.search_memories("", agent_id=agent_id, limit=limit, similarity_threshold=0.0)
@@ -313,6 +343,17 @@ class MemoryManager:
             
         except Exception as e:
             logger.error(f"清除记忆失败: {e}")
+
+    async def flush(self) -> int:
+        """立即写入延迟写入队列中的记忆，返回写入条数"""
+        if self.use_chromadb_manager and self.chromadb_manager:
+            return await self.chromadb_manager.flush()
+        return 0
+
+    async def close(self):
+        """写完待写入的记忆，释放共享的嵌入模型和ChromaDB客户端引用"""
+        if self.use_chromadb_manager and self.chromadb_manager:
+            await self.chromadb_manager.close()
     
     def get_status(self) -> Dict[str, Any]:
         """获取记忆系统状态"""
@@ -330,5 +371,10 @@ class MemoryManager:
                 status["memory_count"] = len(self.memories) if hasattr(self, 'memories') else 0
         except:
             status["memory_count"] = 0
+
+        if self.use_chromadb_manager and self.chromadb_manager:
+            status["write_queue"] = self.chromadb_manager.write_queue.get_stats()
+            if self.chromadb_manager.embedding_cache is not None:
+                status["embedding_cache"] = self.chromadb_manager.embedding_cache.get_stats()
         
         return status
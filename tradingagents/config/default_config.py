@@ -151,7 +151,27 @@ DATA_CONFIG = {
     },
     "network": {
         "timeout": 5,
-        "max_retries": 2
+        "max_retries": 2,
+        "max_workers": 8,  # AkShare I/O线程池大小
+        # 单个接口的执行超时（秒，不含排队时间），覆盖默认timeout；
+        # 全市场表格接口需分页下载数千行，超时须留足
+        "endpoint_timeouts": {
+            "stock_zh_a_spot_em": 30,
+            "stock_info_a_code_name": 30,
+            "stock_comment_em": 30,
+            "stock_hot_rank_wc": 20,
+            "stock_zh_a_hist": 15,
+            "stock_zh_a_hist_min_em": 15,
+            "stock_news_em": 15,
+            "stock_financial_em": 15
+        },
+        # 单个接口的最大并发数，未列出的接口使用default
+        "endpoint_concurrency": {
+            "default": 4,
+            "stock_zh_a_spot_em": 1,
+            "stock_info_a_code_name": 1,
+            "stock_hot_rank_wc": 1
+        }
     }
 }
 
@@ -182,7 +202,12 @@ WORKFLOW_CONFIG = {
         "shallow": False,
         "medium": False,
         "deep": True
-    }
+    },
+    "node_timeout_seconds": 180,  # 依赖图中单个智能体节点的超时
+    "node_retries": 1,
+    "debate_mode": "sequential",  # "parallel": 多空双方每轮同时发言
+    "enable_reflection": True,
+    "batch_memory_prefetch": True  # 并行阶段的智能体记忆一次批量检索
 }
 
 def get_config() -> Dict[str, Any]:
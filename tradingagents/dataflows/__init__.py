@@ -4,10 +4,17 @@
 
 from .interface import DataInterface
 from .akshare_client import AkShareClient
-from .cache_manager import CacheManager
+from .cache_manager import CacheManager, migrate_pickle_cache
+from .single_flight import SingleFlight, AsyncSingleFlight
+from .akshare_executor import AkShareExecutor, get_akshare_executor
 
 __all__ = [
     'DataInterface',
     'AkShareClient',
-    'CacheManager'
+    'CacheManager',
+    'migrate_pickle_cache',
+    'SingleFlight',
+    'AsyncSingleFlight',
+    'AkShareExecutor',
+    'get_akshare_executor'
 ]
@@ -18,9 +18,14 @@ except ImportError:
     pd = None
 
 from ..config.default_config import DATA_CONFIG
+from .single_flight import AsyncSingleFlight, coalesce_calls
+from .akshare_executor import get_akshare_executor
 
 logger = logging.getLogger(__name__)
 
+# 计算技术指标所需的日线历史长度（自然日，约120个交易日）
+DAILY_HISTORY_DAYS = 180
+
 class AkShareClient:
     """AkShare数据客户端"""
     
@@ -29,10 +34,17 @@ class AkShareClient:
         self.enabled = self.config["enabled"] and AKSHARE_AVAILABLE
         self.cache = {}
         self.cache_duration = self.config.get("cache_duration", 300)
+        # 日线历史DataFrame缓存：key -> (缓存时间, DataFrame)
+        self.frame_cache = {}
+        # 合并并发的相同请求，避免同一接口被同时重复调用
+        self.single_flight = AsyncSingleFlight()
+        # 阻塞的AkShare调用放到共享线程池执行
+        self.executor = get_akshare_executor()
         
         if not AKSHARE_AVAILABLE:
             logger.warning("AkShare不可用，将使用模拟数据")
     
+    @coalesce_calls
     async def get_stock_basic_info(self, symbol: str) -> Dict[str, Any]:
         """获取股票基本信息 - stock_info_a_code_name"""
         try:
@@ -44,7 +56,7 @@ class AkShareClient:
                 return self.cache[cache_key]
             
             # 获取A股股票信息
-            stock_info = ak.stock_info_a_code_name()
+            stock_info = await self._call_akshare("stock_info_a_code_name")
             stock_data = stock_info[stock_info['code'] == symbol]
             
             if stock_data.empty:
@@ -67,6 +79,7 @@ class AkShareClient:
             logger.error(f"获取股票基本信息失败: {e}")
             return self._mock_basic_info(symbol)
     
+    @coalesce_calls
     async def get_stock_daily_data(self, symbol: str, period: str = "daily", 
                                   start_date: str = None, end_date: str = None) -> Dict[str, Any]:
         """获取股票日线数据 - stock_zh_a_hist"""
@@ -78,15 +91,17 @@ class AkShareClient:
             if self._is_cache_valid(cache_key):
                 return self.cache[cache_key]
             
-            # 设置默认日期范围
-            if not end_date:
-                end_date = datetime.now().strftime("%Y%m%d")
-            if not start_date:
-                start_date = (datetime.now() - timedelta(days=30)).strftime("%Y%m%d")
-            
-            # 获取历史数据
-            df = ak.stock_zh_a_hist(symbol=symbol, period=period, 
-                                   start_date=start_date, end_date=end_date)
+            if start_date or end_date:
+                # 指定日期范围时单独获取
+                if not end_date:
+                    end_date = datetime.now().strftime("%Y%m%d")
+                if not start_date:
+                    start_date = (datetime.now() - timedelta(days=30)).strftime("%Y%m%d")
+                df = await self._call_akshare("stock_zh_a_hist", symbol=symbol, period=period,
+                                              start_date=start_date, end_date=end_date)
+            else:
+                # 与技术指标共用同一份日线历史
+                df = await self._get_daily_frame(symbol, period)
             
             if df.empty:
                 return self._mock_daily_data(symbol)
@@ -116,6 +131,49 @@ class AkShareClient:
             logger.error(f"获取股票日线数据失败: {e}")
             return self._mock_daily_data(symbol)
     
+    @coalesce_calls
+    async def _get_daily_frame(self, symbol: str, period: str = "daily"):
+        """获取日线历史DataFrame（带缓存）"""
+        cache_key = f"daily_frame_{symbol}_{period}"
+        cached = self.frame_cache.get(cache_key)
+        if cached and (datetime.now() - cached[0]).total_seconds() < self.cache_duration:
+            return cached[1]
+        
+        end_date = datetime.now().strftime("%Y%m%d")
+        start_date = (datetime.now() - timedelta(days=DAILY_HISTORY_DAYS)).strftime("%Y%m%d")
+        df = await self._call_akshare("stock_zh_a_hist", symbol=symbol, period=period,
+                                      start_date=start_date, end_date=end_date)
+        
+        if not df.empty:
+            self.frame_cache[cache_key] = (datetime.now(), df)
+        return df
+    
+    async def get_stock_history(self, symbol: str, period: str = "daily") -> Dict[str, Any]:
+        """获取日线历史序列（按日期升序的各列数组），用于计算技术指标"""
+        try:
+            if not self.enabled:
+                return self._mock_history(symbol)
+            
+            df = await self._get_daily_frame(symbol, period)
+            if df.empty:
+                return self._mock_history(symbol)
+            
+            return {
+                "symbol": symbol,
+                "dates": [str(d) for d in df["日期"]],
+                "open": df["开盘"].astype(float).tolist(),
+                "high": df["最高"].astype(float).tolist(),
+                "low": df["最低"].astype(float).tolist(),
+                "close": df["收盘"].astype(float).tolist(),
+                "volume": df["成交量"].astype(float).tolist(),
+                "data_source": "akshare"
+            }
+            
+        except Exception as e:
+            logger.error(f"获取日线历史失败: {e}")
+            return self._mock_history(symbol)
+    
+    @coalesce_calls
     async def get_stock_minute_data(self, symbol: str, period: str = "1") -> Dict[str, Any]:
         """获取股票分钟数据 - stock_zh_a_hist_min_em"""
         try:
@@ -127,7 +185,7 @@ class AkShareClient:
                 return self.cache[cache_key]
             
             # 获取分钟数据
-            df = ak.stock_zh_a_hist_min_em(symbol=symbol, period=period)
+            df = await self._call_akshare("stock_zh_a_hist_min_em", symbol=symbol, period=period)
             
             if df.empty:
                 return self._mock_minute_data(symbol)
@@ -153,6 +211,7 @@ class AkShareClient:
             logger.error(f"获取股票分钟数据失败: {e}")
             return self._mock_minute_data(symbol)
     
+    @coalesce_calls
     async def get_hot_stocks(self, limit: int = 20) -> List[Dict[str, Any]]:
         """获取热门股票 - stock_hot_rank_wc"""
         try:
@@ -164,7 +223,7 @@ class AkShareClient:
                 return self.cache[cache_key]
             
             # 获取热门股票
-            df = ak.stock_hot_rank_wc()
+            df = await self._call_akshare("stock_hot_rank_wc")
             
             if df.empty:
                 return self._mock_hot_stocks(limit)
@@ -188,6 +247,7 @@ class AkShareClient:
             logger.error(f"获取热门股票失败: {e}")
             return self._mock_hot_stocks(limit)
     
+    @coalesce_calls
     async def get_stock_comments(self, symbol: str, limit: int = 100) -> Dict[str, Any]:
         """获取股票评论 - stock_comment_em"""
         try:
@@ -199,7 +259,7 @@ class AkShareClient:
                 return self.cache[cache_key]
             
             # 获取股票评论
-            df = ak.stock_comment_em(symbol=symbol)
+            df = await self._call_akshare("stock_comment_em", symbol=symbol)
             
             if df.empty:
                 return self._mock_comments(symbol)
@@ -239,6 +299,7 @@ class AkShareClient:
             logger.error(f"获取股票评论失败: {e}")
             return self._mock_comments(symbol)
     
+    @coalesce_calls
     async def get_stock_news(self, symbol: str, limit: int = 10) -> List[Dict[str, Any]]:
         """获取股票新闻 - stock_news_em"""
         try:
@@ -250,7 +311,7 @@ class AkShareClient:
                 return self.cache[cache_key]
             
             # 获取股票新闻
-            df = ak.stock_news_em(symbol=symbol)
+            df = await self._call_akshare("stock_news_em", symbol=symbol)
             
             if df.empty:
                 return self._mock_news(symbol, limit)
@@ -272,6 +333,7 @@ class AkShareClient:
             logger.error(f"获取股票新闻失败: {e}")
             return self._mock_news(symbol, limit)
     
+    @coalesce_calls
     async def get_financial_data(self, symbol: str) -> Dict[str, Any]:
         """获取财务数据 - stock_financial_em"""
         try:
@@ -283,7 +345,7 @@ class AkShareClient:
                 return self.cache[cache_key]
             
             # 获取财务数据
-            df = ak.stock_financial_em(symbol=symbol)
+            df = await self._call_akshare("stock_financial_em", symbol=symbol)
             
             if df.empty:
                 return self._mock_financial(symbol)
@@ -311,6 +373,18 @@ class AkShareClient:
             logger.error(f"获取财务数据失败: {e}")
             return self._mock_financial(symbol)
     
+    async def _call_akshare(self, api_name: str, **kwargs):
+        """在线程池中调用AkShare接口（受并发上限和超时约束）"""
+        return await self.executor.run(api_name, getattr(ak, api_name), **kwargs)
+    
+    def get_executor_stats(self) -> Dict[str, Any]:
+        """获取AkShare线程池统计"""
+        return self.executor.get_stats()
+    
+    def get_single_flight_stats(self) -> Dict[str, Any]:
+        """获取请求合并统计"""
+        return self.single_flight.get_stats()
+    
     def _is_cache_valid(self, cache_key: str, duration: int = None) -> bool:
         """检查缓存是否有效"""
         if cache_key not in self.cache:
@@ -355,6 +429,22 @@ class AkShareClient:
             "timestamp": datetime.now().isoformat()
         }
     
+    def _mock_history(self, symbol: str, days: int = 120) -> Dict[str, Any]:
+        import random
+        close = 50.0
+        history = {"symbol": symbol, "dates": [], "open": [], "high": [], "low": [],
+                   "close": [], "volume": [], "data_source": "mock"}
+        for i in range(days):
+            open_price = close
+            close = max(round(close * (1 + random.uniform(-0.03, 0.03)), 2), 1.0)
+            history["dates"].append((datetime.now() - timedelta(days=days - i)).strftime("%Y-%m-%d"))
+            history["open"].append(open_price)
+            history["high"].append(max(open_price, close) * (1 + random.uniform(0, 0.01)))
+            history["low"].append(min(open_price, close) * (1 - random.uniform(0, 0.01)))
+            history["close"].append(close)
+            history["volume"].append(float(random.randint(1000000, 10000000)))
+        return history
+    
     def _mock_minute_data(self, symbol: str) -> Dict[str, Any]:
         import random
         base_price = 50.0
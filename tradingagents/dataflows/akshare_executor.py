@@ -0,0 +1,173 @@
+"""
+AkShare I/O执行器 - 在有界线程池中运行阻塞的AkShare调用
+"""
+
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from ..config.default_config import DATA_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class AkShareExecutor:
+    """AkShare专用线程池
+
+    - 线程池大小有界，阻塞调用不再占用事件循环
+    - 按接口限制并发数（信号量按事件循环创建）
+    - 超时取自 DATA_CONFIG["network"]，从函数开始执行时计时；超时或被取消时
+      放弃等待，尚未开始执行的任务会从线程池队列中撤销
+    - in_flight 统计实际占用线程的调用，包括已超时但仍在运行的调用
+    """
+
+    def __init__(self, config: Dict[str, Any] = None):
+        self.config = {**DATA_CONFIG["network"], **(config or {})}
+        self.max_workers = self.config.get("max_workers", 8)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix="akshare-io")
+
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = \
+            weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "timeouts": 0,
+            "cancelled": 0,
+            "retries": 0,
+            "total_latency": 0.0
+        }
+        self.in_flight: Dict[str, int] = {}
+
+    def get_timeout(self, endpoint: str) -> float:
+        """获取接口超时时间"""
+        return self.config.get("endpoint_timeouts", {}).get(endpoint, self.config.get("timeout", 5))
+
+    def get_concurrency(self, endpoint: str) -> int:
+        """获取接口并发上限"""
+        limits = self.config.get("endpoint_concurrency", {})
+        return limits.get(endpoint, limits.get("default", 4))
+
+    def _get_semaphore(self, endpoint: str) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            loop_semaphores = self._semaphores.setdefault(loop, {})
+            semaphore = loop_semaphores.get(endpoint)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.get_concurrency(endpoint))
+                loop_semaphores[endpoint] = semaphore
+            return semaphore
+
+    def _track(self, endpoint: str, delta: int):
+        with self._lock:
+            self.in_flight[endpoint] = self.in_flight.get(endpoint, 0) + delta
+
+    async def run(self, endpoint: str, func: Callable[..., Any], *args,
+                  timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        在线程池中执行阻塞调用
+
+        超时从函数真正开始执行时计时，在线程池队列中排队的时间不计入。
+        超时后线程仍在运行且无法中断，因此超时不再重试（重试只会在线程池里
+        再堆积一个同样的慢调用），仅对抛出异常的调用重试。
+
+        Args:
+            endpoint: 接口名称，用于并发限制、超时配置和统计
+            func: 阻塞函数
+            timeout: 超时（秒），默认按接口配置
+
+        Returns:
+            函数返回值
+
+        Raises:
+            asyncio.TimeoutError: 执行超时
+        """
+        timeout = timeout or self.get_timeout(endpoint)
+        max_retries = self.config.get("max_retries", 0)
+        loop = asyncio.get_running_loop()
+
+        async with self._get_semaphore(endpoint):
+            for attempt in range(max_retries + 1):
+                self.stats["submitted"] += 1
+                started = asyncio.Event()
+                start_time = [0.0]
+
+                def call():
+                    start_time[0] = time.time()
+                    try:
+                        loop.call_soon_threadsafe(started.set)
+                    except RuntimeError:
+                        pass  # 事件循环已关闭，无人等待结果
+                    self._track(endpoint, 1)
+                    try:
+                        return func(*args, **kwargs)
+                    finally:
+                        self._track(endpoint, -1)
+
+                future = asyncio.wrap_future(self._executor.submit(call))
+                try:
+                    # 排队阶段不计时；被取消时尚未开始的任务随future一起从队列撤销
+                    waiter = asyncio.ensure_future(started.wait())
+                    try:
+                        await asyncio.wait({waiter, future}, return_when=asyncio.FIRST_COMPLETED)
+                    finally:
+                        waiter.cancel()
+
+                    remaining = timeout - (time.time() - start_time[0])
+                    result = await asyncio.wait_for(asyncio.shield(future), timeout=max(remaining, 0))
+                    self.stats["completed"] += 1
+                    self.stats["total_latency"] += time.time() - start_time[0]
+                    return result
+                except asyncio.CancelledError:
+                    # 已在运行的线程无法中断，只能放弃等待其结果
+                    future.cancel()
+                    self.stats["cancelled"] += 1
+                    raise
+                except asyncio.TimeoutError:
+                    self.stats["timeouts"] += 1
+                    logger.warning(f"AkShare接口 {endpoint} 执行超时 ({timeout}s)，不再重试")
+                    raise
+                except Exception as e:
+                    self.stats["failed"] += 1
+                    logger.warning(f"AkShare接口 {endpoint} 调用失败 (尝试 {attempt + 1}/{max_retries + 1}): {e}")
+                    if attempt >= max_retries:
+                        raise
+
+                self.stats["retries"] += 1
+                await asyncio.sleep(min(2 ** attempt * 0.5, 5))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取执行统计"""
+        completed = self.stats["completed"]
+        with self._lock:
+            in_flight = {endpoint: count for endpoint, count in self.in_flight.items() if count}
+        return {
+            **{k: v for k, v in self.stats.items() if k != "total_latency"},
+            "avg_latency": round(self.stats["total_latency"] / completed, 3) if completed else 0.0,
+            "max_workers": self.max_workers,
+            "in_flight": in_flight
+        }
+
+    def shutdown(self, wait: bool = False):
+        """关闭线程池，取消尚未开始的任务"""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_shared_executor: Optional[AkShareExecutor] = None
+_shared_executor_lock = threading.Lock()
+
+
+def get_akshare_executor() -> AkShareExecutor:
+    """获取进程级共享的AkShare执行器"""
+    global _shared_executor
+    with _shared_executor_lock:
+        if _shared_executor is None:
+            _shared_executor = AkShareExecutor()
+        return _shared_executor
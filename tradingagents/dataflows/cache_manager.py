@@ -1,214 +1,242 @@
 """
 缓存管理器 - 数据缓存和管理
+
+磁盘缓存存放在单个SQLite(WAL)文件中，过期时间建有索引，
+清理过期项只需一次范围删除；内存层为带字节计数的LRU。
 """
 
 import logging
 import json
 import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
 from typing import Dict, Any, Optional
-from datetime import datetime, timedelta
+from datetime import datetime
 import pickle
 
+from .single_flight import SingleFlight
+
 logger = logging.getLogger(__name__)
 
+# 旧版每个键一个pickle文件的后缀
+LEGACY_CACHE_SUFFIX = ".cache"
+
+
 class CacheManager:
     """数据缓存管理器"""
-    
-    def __init__(self, cache_dir: str = "./data/cache"):
+
+    def __init__(self, cache_dir: str = "./data/cache", db_name: str = "cache.db",
+                 max_memory_items: int = 1024, max_memory_bytes: int = 64 * 1024 * 1024):
         self.cache_dir = cache_dir
-        self.memory_cache = {}
+        self.db_path = os.path.join(cache_dir, db_name)
         self.default_ttl = 300  # 5分钟默认TTL
-        
+
+        # 内存LRU：key -> (data, expire_at, size)
+        self.memory_cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self.max_memory_items = max_memory_items
+        self.max_memory_bytes = max_memory_bytes
+        self.memory_bytes = 0
+
+        self._lock = threading.RLock()
+        self.stats = {"hits": 0, "memory_hits": 0, "misses": 0, "evictions": 0}
+        # get_or_set 对同一键的并发回调只执行一次
+        self.single_flight = SingleFlight()
+
         # 创建缓存目录
         os.makedirs(cache_dir, exist_ok=True)
-    
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._init_database()
+
+    def _init_database(self):
+        """初始化缓存表和过期索引"""
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    cache_key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    expire_at REAL NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_cache_entries_expire ON cache_entries(expire_at)"
+            )
+            self._conn.commit()
+
     def get(self, key: str, default: Any = None) -> Any:
         """获取缓存数据"""
         try:
-            # 首先检查内存缓存
-            if key in self.memory_cache:
-                cache_item = self.memory_cache[key]
-                if self._is_valid(cache_item):
-                    return cache_item["data"]
-                else:
-                    del self.memory_cache[key]
-            
-            # 检查磁盘缓存
-            cache_file = self._get_cache_file(key)
-            if os.path.exists(cache_file):
+            now = time.time()
+            with self._lock:
+                # 首先检查内存缓存
+                item = self.memory_cache.get(key)
+                if item is not None:
+                    if item[1] > now:
+                        self.memory_cache.move_to_end(key)
+                        self.stats["hits"] += 1
+                        self.stats["memory_hits"] += 1
+                        return item[0]
+                    self._forget(key)
+
+                # 检查磁盘缓存
+                row = self._conn.execute(
+                    "SELECT value, size, expire_at FROM cache_entries WHERE cache_key = ? AND expire_at > ?",
+                    (key, now)
+                ).fetchone()
+
+                if row is None:
+                    self.stats["misses"] += 1
+                    return default
+
                 try:
-                    with open(cache_file, 'rb') as f:
-                        cache_item = pickle.load(f)
-                    
-                    if self._is_valid(cache_item):
-                        # 加载到内存缓存
-                        self.memory_cache[key] = cache_item
-                        return cache_item["data"]
-                    else:
-                        # 删除过期的磁盘缓存
-                        os.remove(cache_file)
+                    data = pickle.loads(row[0])
                 except Exception as e:
                     logger.error(f"读取磁盘缓存失败: {e}")
-                    if os.path.exists(cache_file):
-                        os.remove(cache_file)
-            
-            return default
-            
+                    self._conn.execute("DELETE FROM cache_entries WHERE cache_key = ?", (key,))
+                    self._conn.commit()
+                    self.stats["misses"] += 1
+                    return default
+
+                # 加载到内存缓存
+                self._remember(key, data, row[2], row[1])
+                self.stats["hits"] += 1
+                return data
+
         except Exception as e:
             logger.error(f"获取缓存失败: {e}")
             return default
-    
+
     def set(self, key: str, data: Any, ttl: int = None) -> bool:
         """设置缓存数据"""
         try:
             ttl = ttl or self.default_ttl
-            expire_time = datetime.now() + timedelta(seconds=ttl)
-            
-            cache_item = {
-                "data": data,
-                "expire_time": expire_time,
-                "created_time": datetime.now()
-            }
-            
-            # 保存到内存缓存
-            self.memory_cache[key] = cache_item
-            
-            # 保存到磁盘缓存
-            cache_file = self._get_cache_file(key)
-            try:
-                with open(cache_file, 'wb') as f:
-                    pickle.dump(cache_item, f)
-            except Exception as e:
-                logger.error(f"保存磁盘缓存失败: {e}")
-            
+            now = time.time()
+            expire_at = now + ttl
+
+            blob = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+
+            with self._lock:
+                # 保存到内存缓存
+                self._remember(key, data, expire_at, len(blob))
+
+                # 保存到磁盘缓存
+                try:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO cache_entries "
+                        "(cache_key, value, size, expire_at, created_at) VALUES (?, ?, ?, ?, ?)",
+                        (key, sqlite3.Binary(blob), len(blob), expire_at, now)
+                    )
+                    self._conn.commit()
+                except Exception as e:
+                    logger.error(f"保存磁盘缓存失败: {e}")
+
             return True
-            
+
         except Exception as e:
             logger.error(f"设置缓存失败: {e}")
             return False
-    
+
     def delete(self, key: str) -> bool:
         """删除缓存数据"""
         try:
-            # 删除内存缓存
-            if key in self.memory_cache:
-                del self.memory_cache[key]
-            
-            # 删除磁盘缓存
-            cache_file = self._get_cache_file(key)
-            if os.path.exists(cache_file):
-                os.remove(cache_file)
-            
+            with self._lock:
+                self._forget(key)
+                self._conn.execute("DELETE FROM cache_entries WHERE cache_key = ?", (key,))
+                self._conn.commit()
+
             return True
-            
+
         except Exception as e:
             logger.error(f"删除缓存失败: {e}")
             return False
-    
+
     def clear(self) -> bool:
         """清空所有缓存"""
         try:
-            # 清空内存缓存
-            self.memory_cache.clear()
-            
-            # 清空磁盘缓存
-            for filename in os.listdir(self.cache_dir):
-                if filename.endswith('.cache'):
-                    file_path = os.path.join(self.cache_dir, filename)
-                    os.remove(file_path)
-            
+            with self._lock:
+                self.memory_cache.clear()
+                self.memory_bytes = 0
+                self._conn.execute("DELETE FROM cache_entries")
+                self._conn.commit()
+
             return True
-            
+
         except Exception as e:
             logger.error(f"清空缓存失败: {e}")
             return False
-    
+
     def cleanup_expired(self) -> int:
         """清理过期缓存"""
         try:
-            cleaned_count = 0
-            
-            # 清理内存缓存
-            expired_keys = []
-            for key, cache_item in self.memory_cache.items():
-                if not self._is_valid(cache_item):
-                    expired_keys.append(key)
-            
-            for key in expired_keys:
-                del self.memory_cache[key]
-                cleaned_count += 1
-            
-            # 清理磁盘缓存
-            for filename in os.listdir(self.cache_dir):
-                if filename.endswith('.cache'):
-                    file_path = os.path.join(self.cache_dir, filename)
-                    try:
-                        with open(file_path, 'rb') as f:
-                            cache_item = pickle.load(f)
-                        
-                        if not self._is_valid(cache_item):
-                            os.remove(file_path)
-                            cleaned_count += 1
-                    except Exception:
-                        # 如果文件损坏，直接删除
-                        os.remove(file_path)
-                        cleaned_count += 1
-            
+            now = time.time()
+            with self._lock:
+                expired_keys = [key for key, item in self.memory_cache.items() if item[1] <= now]
+                for key in expired_keys:
+                    self._forget(key)
+
+                # 按过期索引范围删除，无需逐条反序列化
+                cursor = self._conn.execute("DELETE FROM cache_entries WHERE expire_at <= ?", (now,))
+                self._conn.commit()
+
+            cleaned_count = max(cursor.rowcount, len(expired_keys))
             logger.info(f"清理了 {cleaned_count} 个过期缓存项")
             return cleaned_count
-            
+
         except Exception as e:
             logger.error(f"清理过期缓存失败: {e}")
             return 0
-    
+
     def get_cache_info(self) -> Dict[str, Any]:
         """获取缓存信息"""
         try:
-            memory_count = len(self.memory_cache)
-            
-            disk_count = 0
-            disk_size = 0
-            for filename in os.listdir(self.cache_dir):
-                if filename.endswith('.cache'):
-                    disk_count += 1
-                    file_path = os.path.join(self.cache_dir, filename)
-                    disk_size += os.path.getsize(file_path)
-            
-            return {
-                "memory_cache_count": memory_count,
-                "disk_cache_count": disk_count,
-                "disk_cache_size_mb": round(disk_size / (1024 * 1024), 2),
-                "cache_directory": self.cache_dir,
-                "default_ttl": self.default_ttl
-            }
-            
+            with self._lock:
+                disk_count, disk_size = self._conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries WHERE expire_at > ?",
+                    (time.time(),)
+                ).fetchone()
+
+                lookups = self.stats["hits"] + self.stats["misses"]
+                return {
+                    "memory_cache_count": len(self.memory_cache),
+                    "memory_cache_size_mb": round(self.memory_bytes / (1024 * 1024), 2),
+                    "disk_cache_count": disk_count,
+                    "disk_cache_size_mb": round(disk_size / (1024 * 1024), 2),
+                    "cache_directory": self.cache_dir,
+                    "database_file": self.db_path,
+                    "default_ttl": self.default_ttl,
+                    "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+                    **self.stats,
+                    "single_flight": self.single_flight.get_stats()
+                }
+
         except Exception as e:
             logger.error(f"获取缓存信息失败: {e}")
             return {"error": str(e)}
-    
+
     def exists(self, key: str) -> bool:
         """检查缓存是否存在且有效"""
         try:
-            # 检查内存缓存
-            if key in self.memory_cache:
-                return self._is_valid(self.memory_cache[key])
-            
-            # 检查磁盘缓存
-            cache_file = self._get_cache_file(key)
-            if os.path.exists(cache_file):
-                try:
-                    with open(cache_file, 'rb') as f:
-                        cache_item = pickle.load(f)
-                    return self._is_valid(cache_item)
-                except Exception:
-                    return False
-            
-            return False
-            
+            now = time.time()
+            with self._lock:
+                item = self.memory_cache.get(key)
+                if item is not None and item[1] > now:
+                    return True
+
+                row = self._conn.execute(
+                    "SELECT 1 FROM cache_entries WHERE cache_key = ? AND expire_at > ?", (key, now)
+                ).fetchone()
+                return row is not None
+
         except Exception as e:
             logger.error(f"检查缓存存在性失败: {e}")
             return False
-    
+
     def get_or_set(self, key: str, callback, ttl: int = None) -> Any:
         """获取缓存，如果不存在则通过回调函数设置"""
         try:
@@ -216,15 +244,22 @@ class CacheManager:
             cached_data = self.get(key)
             if cached_data is not None:
                 return cached_data
-            
-            # 缓存不存在，通过回调函数获取数据
-            data = callback()
-            
-            # 设置缓存
-            self.set(key, data, ttl)
-            
-            return data
-            
+
+            def load():
+                # 等待期间其他线程可能已写入缓存
+                cached = self.get(key)
+                if cached is not None:
+                    return cached
+
+                # 缓存不存在，通过回调函数获取数据
+                data = callback()
+
+                # 设置缓存
+                self.set(key, data, ttl)
+                return data
+
+            return self.single_flight.do(key, load)
+
         except Exception as e:
             logger.error(f"获取或设置缓存失败: {e}")
             # 如果缓存操作失败，直接调用回调函数
@@ -233,50 +268,132 @@ class CacheManager:
             except Exception as callback_error:
                 logger.error(f"回调函数执行失败: {callback_error}")
                 return None
-    
-    def _is_valid(self, cache_item: Dict[str, Any]) -> bool:
-        """检查缓存项是否有效"""
-        try:
-            expire_time = cache_item.get("expire_time")
-            if expire_time is None:
-                return False
-            
-            return datetime.now() < expire_time
-            
-        except Exception:
-            return False
-    
-    def _get_cache_file(self, key: str) -> str:
-        """获取缓存文件路径"""
-        # 将key转换为安全的文件名
-        safe_key = key.replace('/', '_').replace('\\', '_').replace(':', '_')
-        return os.path.join(self.cache_dir, f"{safe_key}.cache")
-    
+
+    def _remember(self, key: str, data: Any, expire_at: float, size: int):
+        """写入内存LRU，超出条目数或字节上限时淘汰最久未使用的项"""
+        self._forget(key)
+        if size > self.max_memory_bytes:
+            # 单项超过内存上限时只保留在磁盘
+            return
+
+        self.memory_cache[key] = (data, expire_at, size)
+        self.memory_bytes += size
+
+        while (len(self.memory_cache) > self.max_memory_items
+               or self.memory_bytes > self.max_memory_bytes):
+            _, (_, _, evicted_size) = self.memory_cache.popitem(last=False)
+            self.memory_bytes -= evicted_size
+            self.stats["evictions"] += 1
+
+    def _forget(self, key: str):
+        """从内存LRU移除"""
+        item = self.memory_cache.pop(key, None)
+        if item is not None:
+            self.memory_bytes -= item[2]
+
     def set_default_ttl(self, ttl: int):
         """设置默认TTL"""
         self.default_ttl = ttl
-    
+
     def get_keys(self, pattern: str = None) -> list:
-        """获取所有缓存键"""
+        """获取所有有效的缓存键（键按原样存储，无需从文件名还原）"""
         try:
-            keys = []
-            
-            # 内存缓存键
-            for key in self.memory_cache.keys():
-                if pattern is None or pattern in key:
-                    keys.append(key)
-            
-            # 磁盘缓存键
-            for filename in os.listdir(self.cache_dir):
-                if filename.endswith('.cache'):
-                    key = filename[:-6]  # 移除.cache后缀
-                    key = key.replace('_', '/')  # 恢复原始key格式
-                    if pattern is None or pattern in key:
-                        if key not in keys:  # 避免重复
-                            keys.append(key)
-            
+            now = time.time()
+            with self._lock:
+                keys = [key for key, item in self.memory_cache.items()
+                        if item[1] > now and (pattern is None or pattern in key)]
+
+                if pattern is None:
+                    rows = self._conn.execute(
+                        "SELECT cache_key FROM cache_entries WHERE expire_at > ?", (now,)
+                    ).fetchall()
+                else:
+                    escaped = pattern.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                    rows = self._conn.execute(
+                        "SELECT cache_key FROM cache_entries WHERE expire_at > ? AND cache_key LIKE ? ESCAPE '\\'",
+                        (now, f"%{escaped}%")
+                    ).fetchall()
+
+            seen = set(keys)
+            keys.extend(row[0] for row in rows if row[0] not in seen)
             return keys
-            
+
         except Exception as e:
             logger.error(f"获取缓存键失败: {e}")
             return []
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            try:
+                self._conn.close()
+            except Exception as e:
+                logger.error(f"关闭缓存数据库失败: {e}")
+
+
+def migrate_pickle_cache(cache_dir: str = "./data/cache", delete_source: bool = False,
+                         cache_manager: Optional[CacheManager] = None) -> Dict[str, Any]:
+    """
+    将旧版每键一个pickle文件的缓存目录迁移到SQLite缓存
+
+    旧版文件名对 '/'、'\\'、':' 做了有损替换，原始键无法还原，
+    迁移后以文件名（去掉后缀）作为键。已过期的条目直接跳过。
+
+    Args:
+        cache_dir: 旧缓存目录
+        delete_source: 迁移成功后是否删除旧文件
+        cache_manager: 目标缓存，默认在同一目录下创建
+
+    Returns:
+        迁移统计
+    """
+    manager = cache_manager or CacheManager(cache_dir)
+    result = {"migrated": 0, "expired": 0, "failed": 0, "deleted": 0}
+
+    try:
+        filenames = [f for f in os.listdir(cache_dir) if f.endswith(LEGACY_CACHE_SUFFIX)]
+    except FileNotFoundError:
+        return {"status": "error", "message": f"缓存目录不存在: {cache_dir}", **result}
+
+    now = datetime.now()
+    for filename in filenames:
+        file_path = os.path.join(cache_dir, filename)
+        key = filename[:-len(LEGACY_CACHE_SUFFIX)]
+        try:
+            with open(file_path, 'rb') as f:
+                cache_item = pickle.load(f)
+
+            expire_time = cache_item.get("expire_time")
+            if not isinstance(expire_time, datetime) or expire_time <= now:
+                result["expired"] += 1
+            else:
+                ttl = max(int((expire_time - now).total_seconds()), 1)
+                if manager.set(key, cache_item.get("data"), ttl):
+                    result["migrated"] += 1
+                else:
+                    result["failed"] += 1
+                    continue
+
+            if delete_source:
+                os.remove(file_path)
+                result["deleted"] += 1
+
+        except Exception as e:
+            logger.error(f"迁移缓存文件失败 {filename}: {e}")
+            result["failed"] += 1
+
+    logger.info(f"缓存迁移完成: {json.dumps(result, ensure_ascii=False)}")
+    return {"status": "success", "message": f"已迁移 {result['migrated']} 个缓存项", **result}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="将旧版pickle缓存目录迁移到SQLite缓存")
+    parser.add_argument("cache_dir", nargs="?", default="./data/cache", help="旧缓存目录")
+    parser.add_argument("--delete", action="store_true", help="迁移后删除旧的.cache文件")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    print(json.dumps(migrate_pickle_cache(args.cache_dir, delete_source=args.delete),
+                     ensure_ascii=False, indent=2))
@@ -4,6 +4,8 @@
 
 import logging
 import asyncio
+import os
+import sys
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 
@@ -15,6 +17,18 @@ except ImportError:
     AkShareClient = None
 from .cache_manager import CacheManager
 
+# 添加项目根目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+try:
+    from core.technical_indicators import TechnicalIndicatorEngine
+    from core.batch_indicators import BatchIndicatorScanner
+    INDICATOR_ENGINE_AVAILABLE = True
+except ImportError:
+    INDICATOR_ENGINE_AVAILABLE = False
+    TechnicalIndicatorEngine = None
+    BatchIndicatorScanner = None
+
 logger = logging.getLogger(__name__)
 
 class DataInterface:
@@ -34,6 +48,9 @@ class DataInterface:
             self.cache_manager = CacheManager()
         except:
             self.cache_manager = None
+
+        self.indicator_engine = TechnicalIndicatorEngine() if INDICATOR_ENGINE_AVAILABLE else None
+        self.batch_scanner = BatchIndicatorScanner() if INDICATOR_ENGINE_AVAILABLE else None
     
     async def get_comprehensive_data(self, symbol: str) -> Dict[str, Any]:
         """获取股票的综合数据"""
@@ -94,14 +111,14 @@ class DataInterface:
     async def get_technical_indicators(self, symbol: str) -> Dict[str, Any]:
         """获取技术指标"""
         try:
-            # 获取价格数据用于计算技术指标
-            price_data = await self.akshare_client.get_stock_daily_data(symbol)
+            # 获取日线历史用于计算技术指标（与价格数据共用同一次下载）
+            history = await self.akshare_client.get_stock_history(symbol)
             
-            if "error" in price_data:
-                return price_data
+            if "error" in history:
+                return history
             
             # 计算技术指标
-            indicators = self._calculate_technical_indicators(price_data)
+            indicators = self._calculate_technical_indicators(history)
             return indicators
             
         except Exception as e:
@@ -140,10 +157,26 @@ class DataInterface:
             
             # 计算市场情绪
             market_sentiment = self._calculate_market_sentiment(hot_stocks)
+
+            # 热门股票的技术指标一次横截面计算
+            technical_overview = await self.scan_stocks_indicators(
+                [stock["symbol"] for stock in hot_stocks if stock.get("symbol")]
+            )
+            for stock in hot_stocks:
+                scanned = technical_overview.get(stock.get("symbol"))
+                if scanned:
+                    stock["technical"] = {
+                        "rsi": scanned["rsi"],
+                        "macd_dif": scanned["macd_dif"],
+                        "macd_dea": scanned["macd_dea"],
+                        "ma20": scanned["ma20"],
+                        "signals": scanned["signals"]
+                    }
             
             return {
                 "hot_stocks": hot_stocks,
                 "market_sentiment": market_sentiment,
+                "technical_signals": self._summarize_signals(technical_overview),
                 "timestamp": datetime.now().isoformat()
             }
             
@@ -151,6 +184,48 @@ class DataInterface:
             logger.error(f"获取市场概览失败: {e}")
             return {"error": str(e)}
     
+    async def scan_stocks_indicators(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        批量计算多只股票的技术指标（并发获取日线，横截面一次计算）
+
+        Returns:
+            股票代码 -> 最新指标值和命中的选股信号
+        """
+        try:
+            if not symbols or self.batch_scanner is None:
+                return {}
+
+            histories = await asyncio.gather(
+                *(self.akshare_client.get_stock_history(symbol) for symbol in symbols),
+                return_exceptions=True
+            )
+
+            columns_by_symbol = {}
+            for symbol, history in zip(symbols, histories):
+                if isinstance(history, Exception) or not history.get("close"):
+                    continue
+                columns_by_symbol[symbol] = {
+                    "date": history["dates"],
+                    "high": history["high"],
+                    "low": history["low"],
+                    "close": history["close"],
+                    "volume": history["volume"]
+                }
+
+            return self.batch_scanner.scan_histories(columns_by_symbol)
+
+        except Exception as e:
+            logger.error(f"批量计算技术指标失败: {e}")
+            return {}
+
+    def _summarize_signals(self, scanned: Dict[str, Dict[str, Any]]) -> Dict[str, List[str]]:
+        """按选股信号汇总股票代码"""
+        summary: Dict[str, List[str]] = {}
+        for symbol, values in scanned.items():
+            for signal in values.get("signals", []):
+                summary.setdefault(signal, []).append(symbol)
+        return summary
+
     async def search_stocks(self, keyword: str, limit: int = 10) -> List[Dict[str, Any]]:
         """搜索股票"""
         try:
@@ -172,24 +247,43 @@ class DataInterface:
             logger.error(f"搜索股票失败: {e}")
             return [{"error": str(e)}]
     
-    def _calculate_technical_indicators(self, price_data: Dict[str, Any]) -> Dict[str, Any]:
-        """计算技术指标"""
+    def _calculate_technical_indicators(self, history: Dict[str, Any]) -> Dict[str, Any]:
+        """根据日线历史计算技术指标"""
         try:
-            current_price = price_data.get("current_price", 0)
-            
-            # 简化的技术指标计算
+            if not history.get("close"):
+                return {"symbol": history.get("symbol", ""), "error": "缺少历史数据"}
+            if self.indicator_engine is None:
+                return {"symbol": history.get("symbol", ""), "error": "技术指标引擎不可用"}
+
+            latest = self.indicator_engine.compute_latest(
+                history["high"], history["low"], history["close"], history["volume"]
+            )
+
             indicators = {
-                "symbol": price_data.get("symbol", ""),
-                "rsi": self._calculate_rsi(current_price),
-                "macd": self._calculate_macd(current_price),
-                "ma5": current_price * 0.98,
-                "ma10": current_price * 0.96,
-                "ma20": current_price * 0.94,
-                "ma60": current_price * 0.90,
-                "bollinger_upper": current_price * 1.05,
-                "bollinger_middle": current_price,
-                "bollinger_lower": current_price * 0.95,
-                "volume_ma": price_data.get("volume", 0),
+                "symbol": history.get("symbol", ""),
+                "rsi": latest["rsi"],
+                "macd": {
+                    "dif": latest["macd_dif"],
+                    "dea": latest["macd_dea"],
+                    "macd": latest["macd_hist"]
+                },
+                "kdj": {
+                    "k": latest["kdj_k"],
+                    "d": latest["kdj_d"],
+                    "j": latest["kdj_j"]
+                },
+                "ma5": latest["ma5"],
+                "ma10": latest["ma10"],
+                "ma20": latest["ma20"],
+                "ma60": latest["ma60"],
+                "bollinger_upper": latest["bollinger_upper"],
+                "bollinger_middle": latest["bollinger_middle"],
+                "bollinger_lower": latest["bollinger_lower"],
+                "atr": latest["atr"],
+                "obv": latest["obv"],
+                "volume_ma": latest["volume_ma5"],
+                "volume_ma10": latest["volume_ma10"],
+                "data_points": len(history["close"]),
                 "timestamp": datetime.now().isoformat()
             }
             
@@ -199,22 +293,6 @@ class DataInterface:
             logger.error(f"计算技术指标失败: {e}")
             return {"error": str(e)}
     
-    def _calculate_rsi(self, price: float) -> float:
-        """计算RSI指标"""
-        # 简化的RSI计算
-        import random
-        return round(random.uniform(30, 70), 2)
-    
-    def _calculate_macd(self, price: float) -> Dict[str, float]:
-        """计算MACD指标"""
-        # 简化的MACD计算
-        import random
-        return {
-            "dif": round(random.uniform(-2, 2), 3),
-            "dea": round(random.uniform(-1.5, 1.5), 3),
-            "macd": round(random.uniform(-1, 1), 3)
-        }
-    
     def _calculate_market_sentiment(self, hot_stocks: List[Dict[str, Any]]) -> Dict[str, Any]:
         """计算市场情绪"""
         try:
@@ -0,0 +1,164 @@
+"""
+单飞请求合并 - 相同键的并发请求共享同一次执行结果
+"""
+
+import asyncio
+import functools
+from abc import ABC, abstractmethod
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class _FlightStats(ABC):
+    """合并统计"""
+
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self.stats = {"calls": 0, "executions": 0, "coalesced": 0}
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取合并统计"""
+        with self._stats_lock:
+            calls = self.stats["calls"]
+            return {
+                **self.stats,
+                "coalesce_rate": round(self.stats["coalesced"] / calls, 3) if calls else 0.0,
+                "in_flight": self._in_flight_count()
+            }
+
+    @abstractmethod
+    def _in_flight_count(self) -> int:
+        """正在执行的调用数"""
+
+
+class SingleFlight(_FlightStats):
+    """线程版单飞：同一键同时只执行一次，其余线程等待并复用结果"""
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Dict[str, Any]] = {}
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """
+        执行或加入对应键的调用
+
+        Args:
+            key: 请求键
+            func: 实际执行的无参函数
+
+        Returns:
+            func的返回值；func抛出的异常会传播给所有等待者
+        """
+        self._count("calls")
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"event": threading.Event(), "result": None, "error": None}
+                self._calls[key] = call
+
+        if not leader:
+            self._count("coalesced")
+            call["event"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        self._count("executions")
+        try:
+            call["result"] = func()
+            return call["result"]
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call["event"].set()
+
+    def _in_flight_count(self) -> int:
+        return len(self._calls)
+
+
+class AsyncSingleFlight(_FlightStats):
+    """协程版单飞：相同键的并发请求共享同一个进行中的任务
+
+    共享的执行运行在独立的Task中，所有调用方（包括发起者）都通过shield等待，
+    某个调用方被取消不会影响其他调用方；只有全部调用方都取消时才取消任务。
+    Task绑定在事件循环上，因此按 (事件循环, 键) 区分。
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._flights: Dict[tuple, Dict[str, Any]] = {}
+
+    async def do(self, key: Hashable, coro_func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行或加入对应键的协程调用
+
+        Args:
+            key: 请求键
+            coro_func: 返回协程的无参函数
+
+        Returns:
+            协程结果；异常会传播给所有等待者
+        """
+        self._count("calls")
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+
+        flight = self._flights.get(flight_key)
+        if flight is None:
+            self._count("executions")
+            flight = {"task": loop.create_task(coro_func()), "waiters": 0}
+            self._flights[flight_key] = flight
+            flight["task"].add_done_callback(lambda task: self._finish(flight_key, flight))
+        else:
+            self._count("coalesced")
+
+        task = flight["task"]
+        flight["waiters"] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if flight["waiters"] == 1 and not task.done():
+                # 最后一个等待者也被取消，不再需要结果
+                task.cancel()
+                self._finish(flight_key, flight)
+            raise
+        finally:
+            flight["waiters"] -= 1
+
+    def _finish(self, flight_key: tuple, flight: Dict[str, Any]):
+        """移除已结束（或已取消）的执行，之后的相同请求重新执行"""
+        if self._flights.get(flight_key) is flight:
+            del self._flights[flight_key]
+        task = flight["task"]
+        if task.done() and not task.cancelled():
+            # 没有其他等待者时避免 "exception was never retrieved" 警告
+            task.exception()
+
+    def _in_flight_count(self) -> int:
+        return len(self._flights)
+
+
+def coalesce_calls(method: Callable[..., Awaitable[Any]]):
+    """
+    异步方法装饰器：以 (方法名, 参数) 为键合并并发的相同调用
+
+    实例需要提供 single_flight 属性（AsyncSingleFlight）。
+    """
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        return await self.single_flight.do(key, lambda: method(self, *args, **kwargs))
+
+    return wrapper
@@ -5,9 +5,11 @@
 from .trading_graph import TradingGraph
 from .signal_processing import SignalProcessor
 from .reflection import ReflectionEngine
+from .dag_executor import DAGExecutor
 
 __all__ = [
     'TradingGraph',
     'SignalProcessor',
-    'ReflectionEngine'
+    'ReflectionEngine',
+    'DAGExecutor'
 ]
@@ -0,0 +1,245 @@
+"""
+依赖图执行器 - 以有向无环图声明智能体任务（节点为任务，边为数据依赖），
+每个节点的输入全部就绪后立即启动，支持单节点超时、重试和关键路径耗时统计
+"""
+
+import logging
+import asyncio
+import time
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Iterable
+
+logger = logging.getLogger(__name__)
+
+# 节点函数：接收 {依赖节点名: 依赖节点结果}，返回本节点结果
+NodeFunc = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class DAGNode:
+    """图节点"""
+
+    def __init__(self, name: str, func: NodeFunc, deps: Iterable[str] = (),
+                 timeout: Optional[float] = None, retries: int = 0,
+                 retry_delay: float = 1.0, required: bool = True):
+        """
+        Args:
+            name: 节点名
+            func: 节点协程函数
+            deps: 依赖的节点名
+            timeout: 单次尝试的超时秒数，None表示不限
+            retries: 失败或超时后的重试次数
+            retry_delay: 重试前等待的秒数（按尝试次数线性递增）
+            required: 必需节点失败时依赖它的节点全部跳过、整次运行失败；
+                      非必需节点失败时以 {"error": ...} 作为结果，下游照常执行
+        """
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.required = required
+
+
+class DAGExecutor:
+    """异步依赖图调度器"""
+
+    def __init__(self, default_timeout: Optional[float] = None, default_retries: int = 0,
+                 max_concurrency: Optional[int] = None):
+        """
+        Args:
+            default_timeout: 未单独设置时的节点超时秒数
+            default_retries: 未单独设置时的节点重试次数
+            max_concurrency: 同时运行的节点上限，None表示不限
+        """
+        self.default_timeout = default_timeout
+        self.default_retries = default_retries
+        self.max_concurrency = max_concurrency
+        self.nodes: Dict[str, DAGNode] = {}
+
+    def add_node(self, name: str, func: NodeFunc, deps: Iterable[str] = (),
+                 timeout: Optional[float] = None, retries: Optional[int] = None,
+                 retry_delay: float = 1.0, required: bool = True) -> "DAGExecutor":
+        """添加节点（可链式调用）"""
+        if name in self.nodes:
+            raise ValueError(f"节点重复: {name}")
+        self.nodes[name] = DAGNode(
+            name, func, deps,
+            timeout=self.default_timeout if timeout is None else timeout,
+            retries=self.default_retries if retries is None else retries,
+            retry_delay=retry_delay,
+            required=required
+        )
+        return self
+
+    def topological_order(self) -> List[str]:
+        """返回拓扑序，依赖缺失或存在环时抛出ValueError"""
+        for node in self.nodes.values():
+            missing = [dep for dep in node.deps if dep not in self.nodes]
+            if missing:
+                raise ValueError(f"节点 {node.name} 依赖不存在的节点: {', '.join(missing)}")
+
+        indegree = {name: len(node.deps) for name, node in self.nodes.items()}
+        dependents = self._dependents()
+        ready = [name for name, degree in indegree.items() if degree == 0]
+        order = []
+        while ready:
+            name = ready.pop(0)
+            order.append(name)
+            for child in dependents[name]:
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    ready.append(child)
+
+        if len(order) != len(self.nodes):
+            cycle = sorted(name for name, degree in indegree.items() if degree > 0)
+            raise ValueError(f"依赖图存在环: {', '.join(cycle)}")
+        return order
+
+    def _dependents(self) -> Dict[str, List[str]]:
+        dependents = {name: [] for name in self.nodes}
+        for node in self.nodes.values():
+            for dep in node.deps:
+                dependents[dep].append(node.name)
+        return dependents
+
+    async def _run_node(self, node: DAGNode, inputs: Dict[str, Any],
+                        record: Dict[str, Any], origin: float,
+                        semaphore: Optional[asyncio.Semaphore]) -> Any:
+        """执行单个节点（含超时和重试），记录起止时间"""
+        if semaphore is not None:
+            await semaphore.acquire()
+        record["start"] = time.monotonic() - origin
+        try:
+            last_error = None
+            for attempt in range(node.retries + 1):
+                record["attempts"] = attempt + 1
+                try:
+                    if node.timeout:
+                        return await asyncio.wait_for(node.func(inputs), timeout=node.timeout)
+                    return await node.func(inputs)
+                except asyncio.TimeoutError:
+                    last_error = TimeoutError(f"节点 {node.name} 超时（{node.timeout}s）")
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    last_error = e
+
+                if attempt < node.retries:
+                    logger.warning(f"节点 {node.name} 第{attempt + 1}次尝试失败: {last_error}，准备重试")
+                    await asyncio.sleep(node.retry_delay * (attempt + 1))
+            raise last_error
+        finally:
+            record["end"] = time.monotonic() - origin
+            record["duration"] = round(record["end"] - record["start"], 3)
+            if semaphore is not None:
+                semaphore.release()
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        执行整个依赖图
+
+        Returns:
+            {"status", "results": {节点名: 结果}, "timing": {...}}
+            status 为 "completed"，或有必需节点失败时为 "failed"
+        """
+        self.topological_order()
+        dependents = self._dependents()
+        semaphore = asyncio.Semaphore(self.max_concurrency) if self.max_concurrency else None
+
+        origin = time.monotonic()
+        results: Dict[str, Any] = {}
+        records: Dict[str, Dict[str, Any]] = {
+            name: {"status": "pending", "start": None, "end": None, "duration": None, "attempts": 0}
+            for name in self.nodes
+        }
+        remaining = {name: len(node.deps) for name, node in self.nodes.items()}
+        running: Dict[asyncio.Task, str] = {}
+
+        def start(name: str):
+            node = self.nodes[name]
+            inputs = {dep: results[dep] for dep in node.deps}
+            records[name]["status"] = "running"
+            task = asyncio.create_task(self._run_node(node, inputs, records[name], origin, semaphore))
+            running[task] = name
+
+        def skip(name: str, reason: str):
+            """跳过节点及其全部下游"""
+            if records[name]["status"] != "pending":
+                return
+            records[name]["status"] = "skipped"
+            records[name]["error"] = reason
+            for child in dependents[name]:
+                skip(child, reason)
+
+        for name in self.topological_order():
+            if remaining[name] == 0:
+                start(name)
+
+        try:
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = running.pop(task)
+                    node = self.nodes[name]
+                    record = records[name]
+                    try:
+                        results[name] = task.result()
+                        record["status"] = "completed"
+                    except Exception as e:
+                        record["status"] = "failed"
+                        record["error"] = str(e)
+                        logger.error(f"节点 {name} 失败: {e}")
+                        if node.required:
+                            for child in dependents[name]:
+                                skip(child, f"依赖节点 {name} 失败")
+                            continue
+                        results[name] = {"error": str(e)}
+
+                    for child in dependents[name]:
+                        remaining[child] -= 1
+                        if remaining[child] == 0 and records[child]["status"] == "pending":
+                            start(child)
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+        failed = [name for name, record in records.items()
+                  if record["status"] in ("failed", "skipped") and self.nodes[name].required]
+        return {
+            "status": "failed" if failed else "completed",
+            "failed_nodes": failed,
+            "results": results,
+            "timing": self._timing_report(records, time.monotonic() - origin)
+        }
+
+    def _timing_report(self, records: Dict[str, Dict[str, Any]], wall_seconds: float) -> Dict[str, Any]:
+        """
+        关键路径：从最晚结束的节点开始，每一步回溯到最晚结束的依赖节点，
+        这条链上任一节点变快都会直接缩短整次运行的耗时
+        """
+        finished = {name: record for name, record in records.items() if record["end"] is not None}
+        path = []
+        if finished:
+            current = max(finished, key=lambda name: finished[name]["end"])
+            while current is not None:
+                path.append(current)
+                deps = [dep for dep in self.nodes[current].deps if dep in finished]
+                current = max(deps, key=lambda dep: finished[dep]["end"]) if deps else None
+            path.reverse()
+
+        busy_seconds = sum(record["duration"] for record in finished.values())
+        return {
+            "wall_seconds": round(wall_seconds, 3),
+            "busy_seconds": round(busy_seconds, 3),
+            "parallelism": round(busy_seconds / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+            "critical_path": path,
+            "critical_path_seconds": round(sum(finished[name]["duration"] for name in path), 3),
+            "nodes": {
+                name: {**record,
+                       "start": None if record["start"] is None else round(record["start"], 3),
+                       "end": None if record["end"] is None else round(record["end"], 3)}
+                for name, record in records.items()
+            }
+        }
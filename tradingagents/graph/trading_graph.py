@@ -4,6 +4,9 @@
 
 import logging
 import asyncio
+import os
+import sys
+import time
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 from enum import Enum
@@ -22,6 +25,8 @@ from ..agents.risk_mgmt.neutral_debator import NeutralDebator
 from ..agents.managers.risk_manager import RiskManager
 from ..agents.utils.memory import MemoryManager
 from ..dataflows.interface import DataInterface
+from .dag_executor import DAGExecutor
+from .reflection import ReflectionEngine
 try:
     from ..config.default_config import WORKFLOW_CONFIG
 except ImportError:
@@ -31,8 +36,19 @@ except ImportError:
     sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
     from core.config_adapter import WORKFLOW_CONFIG
 
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+try:
+    from core.batch_scheduler import BatchAnalysisScheduler, make_batch_id
+    BATCH_SCHEDULER_AVAILABLE = True
+except ImportError:
+    BATCH_SCHEDULER_AVAILABLE = False
+    BatchAnalysisScheduler = None
+
 logger = logging.getLogger(__name__)
 
+DEFAULT_NODE_TIMEOUT = 180      # 单个智能体节点单次尝试的超时秒数
+DEFAULT_NODE_RETRIES = 1
+
 class AnalysisDepth(Enum):
     """分析深度枚举"""
     SHALLOW = "shallow"
@@ -45,6 +61,8 @@ class TradingGraph:
     def __init__(self, llm_client=None, data_interface=None):
         self.llm_client = llm_client
         self.memory_manager = MemoryManager()
+        # 嵌入模型在后台加载，首次分析不必等待
+        self.memory_manager.preload()
         self.data_interface = data_interface or DataInterface()
         self.workflow_config = WORKFLOW_CONFIG
         
@@ -54,6 +72,12 @@ class TradingGraph:
         # 工作流状态
         self.current_analysis = None
         self.analysis_history = []
+
+        # 反思引擎（依赖图的最后一个节点）
+        self.reflection_engine = ReflectionEngine(self.memory_manager)
+
+        # 自选股批量分析调度器
+        self.batch_scheduler = BatchAnalysisScheduler() if BATCH_SCHEDULER_AVAILABLE else None
     
     def _initialize_agents(self):
         """初始化所有智能体"""
@@ -79,16 +103,20 @@ class TradingGraph:
         
         logger.info("所有智能体初始化完成")
     
-    async def analyze_stock(self, symbol: str, depth: AnalysisDepth = AnalysisDepth.MEDIUM) -> Dict[str, Any]:
+    async def analyze_stock(self, symbol: str, depth: AnalysisDepth = AnalysisDepth.MEDIUM,
+                            market_overview: Dict[str, Any] = None) -> Dict[str, Any]:
         """
         执行完整的股票分析流程
         
+        各智能体按数据依赖组成依赖图，输入就绪即启动（见 _build_analysis_graph）。
+        
         Args:
             symbol: 股票代码
             depth: 分析深度
+            market_overview: 已获取的市场概览（批量分析时共享），为None时重新获取
             
         Returns:
-            完整的分析结果
+            完整的分析结果，"execution" 中为各节点耗时和关键路径
         """
         try:
             logger.info(f"开始分析股票 {symbol}，深度: {depth.value}")
@@ -106,34 +134,28 @@ class TradingGraph:
             }
             self.current_analysis = analysis_session
             
-            # 第一阶段：数据收集
-            logger.info("第一阶段：数据收集")
-            market_data = await self._collect_market_data(symbol)
-            analysis_session["results"]["market_data"] = market_data
-            
-            # 第二阶段：分析师团队分析
-            logger.info("第二阶段：分析师团队分析")
-            analyst_reports = await self._run_analyst_team(symbol, market_data)
-            analysis_session["results"]["analyst_reports"] = analyst_reports
-            
-            # 第三阶段：研究团队辩论
-            logger.info("第三阶段：研究团队辩论")
-            research_results = await self._run_research_debate(symbol, analyst_reports, depth)
-            analysis_session["results"]["research_results"] = research_results
+            graph = self._build_analysis_graph(symbol, depth, market_overview)
+            try:
+                execution = await graph.run()
+            finally:
+                # 节点失败或被跳过时预取的记忆不会被消费，本次分析结束后一律丢弃
+                self._clear_prefetched_memories(symbol)
+            
+            analysis_session["results"] = self._assemble_results(symbol, depth, execution["results"])
+            if "reflection" in execution["results"]:
+                analysis_session["results"]["reflection"] = execution["results"]["reflection"]
+            analysis_session["execution"] = execution["timing"]
+            analysis_session["end_time"] = datetime.now().isoformat()
             
-            # 第四阶段：交易策略制定
-            logger.info("第四阶段：交易策略制定")
-            trading_strategy = await self._develop_trading_strategy(symbol, research_results, market_data)
-            analysis_session["results"]["trading_strategy"] = trading_strategy
+            timing = execution["timing"]
+            logger.info(f"关键路径 {timing['critical_path_seconds']}s（{' -> '.join(timing['critical_path'])}），"
+                        f"总耗时 {timing['wall_seconds']}s，并行度 {timing['parallelism']}")
             
-            # 第五阶段：风险管理评估
-            logger.info("第五阶段：风险管理评估")
-            final_decision = await self._risk_management_evaluation(symbol, trading_strategy, research_results)
-            analysis_session["results"]["final_decision"] = final_decision
+            if execution["status"] != "completed":
+                raise RuntimeError(f"必需节点失败: {', '.join(execution['failed_nodes'])}")
             
             # 完成分析
             analysis_session["status"] = "completed"
-            analysis_session["end_time"] = datetime.now().isoformat()
             
             # 保存到历史记录
             self.analysis_history.append(analysis_session)
@@ -152,33 +174,206 @@ class TradingGraph:
                 "symbol": symbol,
                 "status": "failed",
                 "error": str(e),
+                "execution": self.current_analysis.get("execution") if self.current_analysis else None,
                 "timestamp": datetime.now().isoformat()
             }
     
-    async def _collect_market_data(self, symbol: str) -> Dict[str, Any]:
-        """收集市场数据"""
-        try:
-            # 获取综合数据
-            comprehensive_data = await self.data_interface.get_stock_data(symbol)
-            
-            # 获取市场概览
-            market_overview = await self.data_interface.get_market_overview()
-            
-            return {
+    async def analyze_watchlist(self, symbols: List[str], depth: AnalysisDepth = AnalysisDepth.MEDIUM,
+                                max_workers: int = None, batch_id: str = None, resume: bool = True):
+        """
+        批量分析自选股（异步生成器，按完成顺序产出每只股票的结果）
+
+        市场概览只获取一次，所有股票共享；已完成的股票写入检查点，中断后可续跑。
+
+        Args:
+            symbols: 股票代码列表
+            depth: 分析深度
+            max_workers: 同时分析的股票数
+            batch_id: 批次ID，默认由股票列表和深度生成
+            resume: 是否跳过检查点中已完成的股票
+        """
+        if self.batch_scheduler is None:
+            raise RuntimeError("批量分析调度器不可用")
+
+        await self.memory_manager.initialize()
+        market_overview = await self.data_interface.get_market_overview()
+
+        async def analyze(symbol: str) -> Dict[str, Any]:
+            return await self.analyze_stock(symbol, depth, market_overview=market_overview)
+
+        batch_id = batch_id or make_batch_id(symbols, depth.value)
+        async for event in self.batch_scheduler.run(symbols, analyze, batch_id=batch_id, resume=resume,
+                                                    max_workers=max_workers):
+            yield event
+
+    def _build_analysis_graph(self, symbol: str, depth: AnalysisDepth,
+                              market_overview: Dict[str, Any] = None) -> DAGExecutor:
+        """
+        构建分析依赖图
+        
+        stock_data -> 四位分析师 -> 多头/空头研究 -> 辩论 -> 研究经理 -> 交易员
+        -> 激进/保守/中性风险分析师 -> 风险经理 -> 反思
+        
+        市场概览只被最终结果引用，与分析师并行获取；三位风险分析师互不依赖，同时运行。
+        并行阶段各智能体的记忆在行情获取期间一次批量检索（memory_prefetch）。
+        除行情数据外，单个智能体失败时以 {"error": ...} 作为其结果，下游照常执行。
+        """
+        config = self.workflow_config
+        graph = DAGExecutor(
+            default_timeout=config.get("node_timeout_seconds", DEFAULT_NODE_TIMEOUT),
+            default_retries=config.get("node_retries", DEFAULT_NODE_RETRIES)
+        )
+        
+        async def stock_data(inputs):
+            return await self.data_interface.get_stock_data(symbol)
+        
+        async def overview(inputs):
+            if market_overview is not None:
+                return market_overview
+            return await self.data_interface.get_market_overview()
+        
+        graph.add_node("stock_data", stock_data)
+        graph.add_node("market_overview", overview, required=False)
+        
+        # 记忆预取：失败时各智能体自行检索
+        analyst_deps = ["stock_data"]
+        if config.get("batch_memory_prefetch", True) and self.memory_manager:
+            async def memory_prefetch(inputs):
+                return await self._prefetch_memories(symbol)
+            
+            graph.add_node("memory_prefetch", memory_prefetch, retries=0, required=False)
+            analyst_deps.append("memory_prefetch")
+        
+        # 分析师团队：单个分析师失败时以错误结果继续
+        for name, (agent, analysis_type) in self._analyst_agents().items():
+            graph.add_node(name, self._analyst_node(symbol, agent, analysis_type),
+                           deps=analyst_deps, required=False)
+        
+        # 研究团队
+        async def bull_research(inputs):
+            return await self.bull_researcher.process_with_memory(
+                self._prepare_research_input(symbol, inputs), {"position": "bull"})
+        
+        async def bear_research(inputs):
+            return await self.bear_researcher.process_with_memory(
+                self._prepare_research_input(symbol, inputs), {"position": "bear"})
+        
+        async def debate(inputs):
+            return await self._run_debate_rounds(symbol, inputs["bull_research"], inputs["bear_research"], depth)
+        
+        async def research_manager(inputs):
+            manager_input = {
                 "symbol": symbol,
-                "comprehensive_data": comprehensive_data,
-                "market_overview": market_overview,
-                "timestamp": datetime.now().isoformat()
+                "bull_research": inputs["bull_research"].get("content", {}),
+                "bear_research": inputs["bear_research"].get("content", {}),
+                "debate_results": inputs["debate"]
             }
-            
-        except Exception as e:
-            logger.error(f"数据收集失败: {e}")
-            return {"error": str(e)}
+            return await self.research_manager.process_with_memory(
+                manager_input, {"analysis_type": "investment_recommendation"})
+        
+        analyst_nodes = list(self._analyst_agents())
+        graph.add_node("bull_research", bull_research, deps=analyst_nodes, required=False)
+        graph.add_node("bear_research", bear_research, deps=analyst_nodes, required=False)
+        graph.add_node("debate", debate, deps=["bull_research", "bear_research"], required=False)
+        graph.add_node("research_manager", research_manager,
+                       deps=["bull_research", "bear_research", "debate"], required=False)
+        
+        # 交易员
+        async def trader(inputs):
+            trader_input = {
+                "symbol": symbol,
+                "research_recommendation": inputs["research_manager"].get("content", {}),
+                "market_data": inputs["stock_data"].get("price_data", {}),
+                "portfolio_context": {
+                    "available_cash": "1000000",  # 可配置
+                    "current_positions": {},
+                    "risk_exposure": "medium",
+                    "concentration": "low"
+                }
+            }
+            return await self.trader.process_with_memory(trader_input, {"analysis_type": "trading_strategy"})
+        
+        graph.add_node("trader", trader, deps=["research_manager", "stock_data"], required=False)
+        
+        # 风险管理团队
+        for name, (agent, stance) in self._risk_agents().items():
+            graph.add_node(name, self._risk_debator_node(symbol, agent, stance), deps=["trader"], required=False)
+        
+        async def risk_manager(inputs):
+            risk_manager_input = {
+                "symbol": symbol,
+                "trading_strategy": inputs["trader"].get("content", {}),
+                "aggressive_analysis": inputs["aggressive_analysis"].get("content", {}),
+                "conservative_analysis": inputs["conservative_analysis"].get("content", {}),
+                "neutral_analysis": inputs["neutral_analysis"].get("content", {}),
+                "research_recommendation": inputs["research_manager"].get("content", {})
+            }
+            return await self.risk_manager.process_with_memory(
+                risk_manager_input, {"analysis_type": "final_decision"})
+        
+        graph.add_node("risk_manager", risk_manager,
+                       deps=[*self._risk_agents(), "trader", "research_manager"], required=False)
+        
+        # 反思（记录各阶段表现并写入记忆，失败不影响分析结果）
+        if config.get("enable_reflection", True):
+            async def reflection(inputs):
+                session = {"symbol": symbol, "results": self._assemble_results(symbol, depth, inputs)}
+                return await self.reflection_engine.reflect_on_analysis(session)
+            
+            graph.add_node("reflection", reflection,
+                           deps=list(graph.nodes), retries=0, required=False)
+        
+        return graph
     
-    async def _run_analyst_team(self, symbol: str, market_data: Dict[str, Any]) -> Dict[str, Any]:
-        """运行分析师团队"""
-        try:
-            comprehensive_data = market_data.get("comprehensive_data", {})
+    def _analyst_agents(self) -> Dict[str, tuple]:
+        """分析师节点名 -> (智能体, 分析类型)"""
+        return {
+            "market_analysis": (self.market_analyst, "technical"),
+            "sentiment_analysis": (self.social_media_analyst, "sentiment"),
+            "news_analysis": (self.news_analyst, "news"),
+            "fundamentals_analysis": (self.fundamentals_analyst, "fundamentals")
+        }
+    
+    def _risk_agents(self) -> Dict[str, tuple]:
+        """风险分析师节点名 -> (智能体, 立场)"""
+        return {
+            "aggressive_analysis": (self.aggressive_debator, "aggressive"),
+            "conservative_analysis": (self.conservative_debator, "conservative"),
+            "neutral_analysis": (self.neutral_debator, "neutral")
+        }
+    
+    def _parallel_stage_agents(self) -> List[Any]:
+        """并行阶段的智能体：分析师、多空研究员、风险分析师"""
+        return ([agent for agent, _ in self._analyst_agents().values()]
+                + [self.bull_researcher, self.bear_researcher]
+                + [agent for agent, _ in self._risk_agents().values()])
+    
+    async def _prefetch_memories(self, symbol: str) -> Dict[str, int]:
+        """
+        批量检索并行阶段各智能体的记忆，分发给各智能体
+        
+        这些智能体的记忆查询都只由股票代码决定，一次编码、一次多查询
+        代替各自检索；各智能体只检索自己的记忆，提前检索结果不变。
+        
+        Returns:
+            智能体ID -> 预取的记忆条数
+        """
+        agents = self._parallel_stage_agents()
+        requests = [(agent._extract_query_from_input({"symbol": symbol}), agent.agent_id) for agent in agents]
+        results = await self.memory_manager.search_memories_batch(requests, limit=5)
+        for agent, (query, _), memories in zip(agents, requests, results):
+            agent.prefetch_memories(query, memories)
+        return {agent.agent_id: len(memories) for agent, memories in zip(agents, results)}
+    
+    def _clear_prefetched_memories(self, symbol: str):
+        """清除并行阶段各智能体未使用的预取记忆"""
+        for agent in self._parallel_stage_agents():
+            agent.clear_prefetched_memories(agent._extract_query_from_input({"symbol": symbol}))
+    
+    def _analyst_node(self, symbol: str, agent, analysis_type: str):
+        """生成分析师节点函数"""
+        async def run(inputs):
+            comprehensive_data = inputs["stock_data"]
             
             # 准备分析师输入数据
             analyst_input = {
@@ -191,135 +386,15 @@ class TradingGraph:
                 "social_data": comprehensive_data.get("sentiment_data", {}),
                 "macro_events": []  # 可以扩展添加宏观事件
             }
-            
-            # 并行运行所有分析师
-            tasks = [
-                self.market_analyst.process_with_memory(analyst_input, {"analysis_type": "technical"}),
-                self.social_media_analyst.process_with_memory(analyst_input, {"analysis_type": "sentiment"}),
-                self.news_analyst.process_with_memory(analyst_input, {"analysis_type": "news"}),
-                self.fundamentals_analyst.process_with_memory(analyst_input, {"analysis_type": "fundamentals"})
-            ]
-            
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            return {
-                "market_analysis": results[0] if not isinstance(results[0], Exception) else {"error": str(results[0])},
-                "sentiment_analysis": results[1] if not isinstance(results[1], Exception) else {"error": str(results[1])},
-                "news_analysis": results[2] if not isinstance(results[2], Exception) else {"error": str(results[2])},
-                "fundamentals_analysis": results[3] if not isinstance(results[3], Exception) else {"error": str(results[3])},
-                "timestamp": datetime.now().isoformat()
-            }
-            
-        except Exception as e:
-            logger.error(f"分析师团队运行失败: {e}")
-            return {"error": str(e)}
+            return await agent.process_with_memory(analyst_input, {"analysis_type": analysis_type})
+        return run
     
-    async def _run_research_debate(self, symbol: str, analyst_reports: Dict[str, Any], depth: AnalysisDepth) -> Dict[str, Any]:
-        """运行研究团队辩论"""
-        try:
-            # 准备研究输入数据
-            research_input = {
-                "symbol": symbol,
-                "analyst_reports": [
-                    analyst_reports.get("market_analysis", {}),
-                    analyst_reports.get("sentiment_analysis", {}),
-                    analyst_reports.get("news_analysis", {}),
-                    analyst_reports.get("fundamentals_analysis", {})
-                ],
-                "market_data": {}  # 可以添加额外的市场数据
-            }
-            
-            # 初始研究
-            bull_research_task = self.bull_researcher.process_with_memory(research_input, {"position": "bull"})
-            bear_research_task = self.bear_researcher.process_with_memory(research_input, {"position": "bear"})
-            
-            bull_research, bear_research = await asyncio.gather(bull_research_task, bear_research_task)
-            
-            # 根据深度进行辩论
-            debate_rounds = self.workflow_config["debate_rounds"][depth.value]
-            debate_results = []
-            
-            for round_num in range(debate_rounds):
-                logger.info(f"辩论第 {round_num + 1} 轮")
-                
-                # 多头反驳空头
-                bull_response = await self.bull_researcher.participate_debate(
-                    round_num + 1,
-                    bear_research.get("content", {}).get("key_risks", []),
-                    {"symbol": symbol}
-                )
-                
-                # 空头反驳多头
-                bear_response = await self.bear_researcher.participate_debate(
-                    round_num + 1,
-                    bull_research.get("content", {}).get("key_arguments", []),
-                    {"symbol": symbol}
-                )
-                
-                debate_results.append({
-                    "round": round_num + 1,
-                    "bull_response": bull_response,
-                    "bear_response": bear_response
-                })
-            
-            # 研究经理做出投资建议
-            manager_input = {
-                "symbol": symbol,
-                "bull_research": bull_research.get("content", {}),
-                "bear_research": bear_research.get("content", {}),
-                "debate_results": debate_results
-            }
-            
-            investment_recommendation = await self.research_manager.process_with_memory(
-                manager_input, {"analysis_type": "investment_recommendation"}
-            )
-            
-            return {
-                "bull_research": bull_research,
-                "bear_research": bear_research,
-                "debate_results": debate_results,
-                "investment_recommendation": investment_recommendation,
-                "debate_rounds": debate_rounds,
-                "timestamp": datetime.now().isoformat()
-            }
-            
-        except Exception as e:
-            logger.error(f"研究辩论失败: {e}")
-            return {"error": str(e)}
-    
-    async def _develop_trading_strategy(self, symbol: str, research_results: Dict[str, Any], market_data: Dict[str, Any]) -> Dict[str, Any]:
-        """制定交易策略"""
-        try:
-            # 准备交易员输入数据
-            trader_input = {
-                "symbol": symbol,
-                "research_recommendation": research_results.get("investment_recommendation", {}).get("content", {}),
-                "market_data": market_data.get("comprehensive_data", {}).get("price_data", {}),
-                "portfolio_context": {
-                    "available_cash": "1000000",  # 可配置
-                    "current_positions": {},
-                    "risk_exposure": "medium",
-                    "concentration": "low"
-                }
-            }
-            
-            trading_strategy = await self.trader.process_with_memory(
-                trader_input, {"analysis_type": "trading_strategy"}
-            )
-            
-            return trading_strategy
-            
-        except Exception as e:
-            logger.error(f"交易策略制定失败: {e}")
-            return {"error": str(e)}
-    
-    async def _risk_management_evaluation(self, symbol: str, trading_strategy: Dict[str, Any], research_results: Dict[str, Any]) -> Dict[str, Any]:
-        """风险管理评估"""
-        try:
-            # 准备风险分析输入数据
+    def _risk_debator_node(self, symbol: str, agent, stance: str):
+        """生成风险分析师节点函数"""
+        async def run(inputs):
             risk_input = {
                 "symbol": symbol,
-                "trading_strategy": trading_strategy.get("content", {}),
+                "trading_strategy": inputs["trader"].get("content", {}),
                 "market_conditions": {
                     "market_trend": "neutral",
                     "volatility": "medium",
@@ -327,41 +402,102 @@ class TradingGraph:
                     "sentiment": "neutral"
                 }
             }
-            
-            # 并行运行三个风险分析师
-            aggressive_task = self.aggressive_debator.process_with_memory(risk_input, {"stance": "aggressive"})
-            conservative_task = self.conservative_debator.process_with_memory(risk_input, {"stance": "conservative"})
-            neutral_task = self.neutral_debator.process_with_memory(risk_input, {"stance": "neutral"})
-            
-            aggressive_analysis, conservative_analysis, neutral_analysis = await asyncio.gather(
-                aggressive_task, conservative_task, neutral_task
+            return await agent.process_with_memory(risk_input, {"stance": stance})
+        return run
+    
+    def _prepare_research_input(self, symbol: str, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """准备研究输入数据"""
+        return {
+            "symbol": symbol,
+            "analyst_reports": [inputs.get(name, {}) for name in self._analyst_agents()],
+            "market_data": {}  # 可以添加额外的市场数据
+        }
+    
+    async def _run_debate_rounds(self, symbol: str, bull_research: Dict[str, Any],
+                                 bear_research: Dict[str, Any], depth: AnalysisDepth) -> List[Dict[str, Any]]:
+        """
+        根据深度进行多轮辩论
+        
+        workflow_config["debate_mode"]：
+            "sequential" 多头发言后空头再发言；
+            "parallel" 双方的反驳互不依赖（都针对对方的研究论据），同时发言
+        """
+        debate_rounds = self.workflow_config["debate_rounds"][depth.value]
+        parallel = self.workflow_config.get("debate_mode", "sequential") == "parallel"
+        debate_results = []
+        
+        for round_num in range(debate_rounds):
+            logger.info(f"辩论第 {round_num + 1} 轮")
+            round_start = time.time()
+            
+            # 多头反驳空头
+            bull_task = self.bull_researcher.participate_debate(
+                round_num + 1,
+                bear_research.get("content", {}).get("key_risks", []),
+                {"symbol": symbol}
             )
             
-            # 风险经理做出最终决策
-            risk_manager_input = {
-                "symbol": symbol,
-                "trading_strategy": trading_strategy.get("content", {}),
-                "aggressive_analysis": aggressive_analysis.get("content", {}),
-                "conservative_analysis": conservative_analysis.get("content", {}),
-                "neutral_analysis": neutral_analysis.get("content", {}),
-                "research_recommendation": research_results.get("investment_recommendation", {}).get("content", {})
-            }
-            
-            final_decision = await self.risk_manager.process_with_memory(
-                risk_manager_input, {"analysis_type": "final_decision"}
+            # 空头反驳多头
+            bear_task = self.bear_researcher.participate_debate(
+                round_num + 1,
+                bull_research.get("content", {}).get("key_arguments", []),
+                {"symbol": symbol}
             )
             
-            return {
-                "aggressive_analysis": aggressive_analysis,
-                "conservative_analysis": conservative_analysis,
-                "neutral_analysis": neutral_analysis,
-                "final_decision": final_decision,
-                "timestamp": datetime.now().isoformat()
+            if parallel:
+                bull_response, bear_response = await asyncio.gather(bull_task, bear_task)
+            else:
+                bull_response = await bull_task
+                bear_response = await bear_task
+            
+            debate_results.append({
+                "round": round_num + 1,
+                "bull_response": bull_response,
+                "bear_response": bear_response,
+                "elapsed": round(time.time() - round_start, 3)
+            })
+        
+        return debate_results
+    
+    def _assemble_results(self, symbol: str, depth: AnalysisDepth, results: Dict[str, Any]) -> Dict[str, Any]:
+        """把各节点结果整理为按阶段组织的分析结果"""
+        timestamp = datetime.now().isoformat()
+        
+        def get(name):
+            return results.get(name, {"error": "未执行"})
+        
+        debate_results = results.get("debate")
+        if not isinstance(debate_results, list):
+            debate_results = []
+        
+        return {
+            "market_data": {
+                "symbol": symbol,
+                "comprehensive_data": results.get("stock_data", {}),
+                "market_overview": results.get("market_overview", {}),
+                "timestamp": timestamp
+            },
+            "analyst_reports": {
+                **{name: get(name) for name in self._analyst_agents()},
+                "timestamp": timestamp
+            },
+            "research_results": {
+                "bull_research": get("bull_research"),
+                "bear_research": get("bear_research"),
+                "debate_results": debate_results,
+                "investment_recommendation": get("research_manager"),
+                "debate_rounds": self.workflow_config["debate_rounds"][depth.value],
+                "debate_mode": self.workflow_config.get("debate_mode", "sequential"),
+                "round_latencies": [r.get("elapsed") for r in debate_results],
+                "timestamp": timestamp
+            },
+            "trading_strategy": get("trader"),
+            "final_decision": {
+                **{name: get(name) for name in self._risk_agents()},
+                "final_decision": get("risk_manager"),
+                "timestamp": timestamp
             }
-            
-        except Exception as e:
-            logger.error(f"风险管理评估失败: {e}")
-            return {"error": str(e)}
+        }
     
     def get_analysis_status(self) -> Dict[str, Any]:
         """获取当前分析状态"""
@@ -382,6 +518,11 @@ class TradingGraph:
         """获取分析历史"""
         return self.analysis_history[-limit:] if self.analysis_history else []
     
+    async def close(self):
+        """写完待写入的记忆并释放共享的嵌入模型和ChromaDB客户端引用"""
+        if self.memory_manager:
+            await self.memory_manager.close()
+
     async def cleanup(self):
         """清理资源"""
         try: